@@ -11,6 +11,12 @@ import os
 
 from django.core.asgi import get_asgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'CategoryTree.settings')
+# No persistent database connections under ASGI, see asgi_settings.py.
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'CategoryTree.asgi_settings')
 
 application = get_asgi_application()
+
+# Only the server processes refresh the analytics in the background.
+from category.analytics import refresher  # noqa: E402
+
+refresher.start()
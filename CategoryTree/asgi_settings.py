@@ -0,0 +1,8 @@
+# Settings of the ASGI server, asgi.py picks them.
+from .settings import *  # noqa: F401, F403
+from .settings import DATABASES
+
+# No persistent database connections: the queries of a request don't run in
+# the thread that closes old connections at its end, so they would be left
+# open.
+DATABASES['default']['CONN_MAX_AGE'] = 0
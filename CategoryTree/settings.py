@@ -47,6 +47,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'category.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -84,9 +85,32 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Keep connections open between requests instead of opening a new
+        # one for every request. asgi_settings.py turns it off under ASGI.
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Take the write lock when a transaction starts. A transaction
+            # that reads first and then has to upgrade its lock fails with
+            # "database is locked" without waiting for the busy timeout.
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
+# Aliases in DATABASES with read-only copies of 'default'. Read-only API
+# requests and analyze_similarity read from them, see category/routers.py.
+DATABASE_REPLICAS = []
+DATABASE_ROUTERS = ['category.routers.ReplicaRouter']
+# After writing, a client reads from 'default' for this many seconds, so it
+# sees its own changes while the replicas catch up.
+REPLICA_STICKY_SECONDS = 10
+
+# Pragmas for every SQLite connection, see category/sqlite.py. 'performance'
+# turns on WAL, so readers and the writer don't block each other.
+SQLITE_PROFILE = 'performance'
+SQLITE_PRAGMAS = {}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -132,6 +156,19 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Where reset_db --snapshot keeps its snapshots.
+RESET_DB_SNAPSHOT_DIR = os.path.join(BASE_DIR, 'snapshots')
+
+# Uploads are stored once per distinct content, named by their hash.
+STORAGES = {
+    'default': {
+        'BACKEND': 'category.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
@@ -141,3 +178,34 @@ REST_FRAMEWORK = {
 SPECTACULAR_SETTINGS = {
     "SERVE_INCLUDE_SCHEMA": False,
 }
+
+# Written by the build_schema command and served by /api/schema/ when DEBUG
+# is off.
+OPENAPI_SCHEMA_DIR = os.path.join(BASE_DIR, 'schema')
+
+# Per-request query count, SQL/serializer time and response size, reported
+# through Server-Timing headers and aggregated under /api/metrics/.
+REQUEST_METRICS_ENABLED = False
+
+# Resized WebP copies of uploaded category images, made by background
+# worker threads. With 0 workers jobs stay queued until drained.
+IMAGE_PIPELINE = {
+    'WORKERS': 2,
+    'FORMAT': 'WEBP',
+    'VARIANTS': {
+        'thumbnail': (64, 64),
+        'medium': (256, 256),
+    },
+}
+
+# Similarity graph analytics are refreshed by a background thread after
+# writes, see category/analytics.py.
+ANALYTICS_REFRESH_IN_BACKGROUND = True
+
+# Identical tree builds that run at the same time are computed once. Set
+# CACHE to the alias of a cache shared by all workers to coalesce them
+# across processes as well.
+SINGLE_FLIGHT = {
+    'CACHE': None,
+    'TIMEOUT': 30,
+}
@@ -0,0 +1,31 @@
+# Settings of the test suite, manage.py picks them for the test command.
+import atexit
+import os
+import shutil
+import tempfile
+
+from .settings import *  # noqa: F401, F403
+from .settings import BASE_DIR, DATABASES
+
+# Stands in for a replica in the router tests, which copy the test database
+# into it. The runner only sets up its test database for tests that use the
+# alias.
+DATABASES['replica'] = {
+    'ENGINE': 'django.db.backends.sqlite3',
+    'NAME': BASE_DIR / 'replica.sqlite3',
+}
+
+# Tests refresh the analytics themselves with analytics.refresher.drain().
+ANALYTICS_REFRESH_IN_BACKGROUND = False
+
+# The in-memory test database shares its cache between threads and its table
+# locks fail at once instead of waiting for the busy timeout, so the tests
+# with concurrent writers need a file. It goes into a fresh directory, which
+# is removed when the run ends, unless TEST_DATABASE_FILE points elsewhere.
+if os.environ.get('TEST_DATABASE_FILE'):
+    TEST_DATABASE_FILE = os.environ['TEST_DATABASE_FILE']
+else:
+    TEST_DATABASE_DIR = tempfile.mkdtemp(prefix='categorytree-test-')
+    atexit.register(shutil.rmtree, TEST_DATABASE_DIR, ignore_errors=True)
+    TEST_DATABASE_FILE = os.path.join(TEST_DATABASE_DIR, 'test.sqlite3')
+DATABASES['default']['TEST'] = {'NAME': TEST_DATABASE_FILE}
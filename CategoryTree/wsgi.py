@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'CategoryTree.settings')
 
 application = get_wsgi_application()
+
+# Only the server processes refresh the analytics in the background.
+from category.analytics import refresher  # noqa: E402
+
+refresher.start()
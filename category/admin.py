@@ -1,14 +1,120 @@
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.db.models import Exists, OuterRef
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils.functional import cached_property
 
 from .models import Category, Similarity
 
+# Below this many rows the changelist counts them exactly.
+EXACT_COUNT_LIMIT = 10000
 
-class CategoryAdmin(admin.ModelAdmin):
+
+# The row count of a whole table without scanning it, from the statistics
+# of the database: reltuples on PostgreSQL, sqlite_stat1 on SQLite once
+# ANALYZE (or PRAGMA optimize) ran. None when there are no statistics, the
+# rows are counted then.
+def estimate_rows(model, using):
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples FROM pg_class WHERE relname = %s',
+                           [table])
+            row = cursor.fetchone()
+            return int(row[0]) if row and row[0] >= 0 else None
+        if connection.vendor != 'sqlite':
+            return None
+        cursor.execute("SELECT 1 FROM sqlite_master "
+                       "WHERE type = 'table' AND name = 'sqlite_stat1'")
+        if cursor.fetchone() is None:
+            return None
+        # The first number of every row of a table is its row count.
+        cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1',
+                       [table])
+        row = cursor.fetchone()
+    return int(row[0].split()[0]) if row else None
+
+
+# COUNT(*) reads the whole table on SQLite and PostgreSQL, which is the slow
+# part of an unfiltered changelist on a large table. A search or a filter
+# narrows it down, so those are still counted exactly.
+class EstimatedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if queryset.query.has_filters() or queryset.query.distinct:
+            return super().count
+        estimate = estimate_rows(queryset.model, queryset.db)
+        if estimate is None or estimate < EXACT_COUNT_LIMIT:
+            return super().count
+        return estimate
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    # Skips the second COUNT(*) of the whole table for "x of y selected".
+    show_full_result_count = False
+
+
+class CategoryAdmin(LargeTableAdmin):
     list_display = ('name', 'description', 'parent')
+    list_select_related = ('parent',)
+    search_fields = ('name',)
+    # The parent is picked by searching instead of a <select> with every
+    # category in it.
+    autocomplete_fields = ('parent',)
+    change_list_template = 'admin/category/category/change_list.html'
+
+    def get_urls(self):
+        return [
+            path('tree/', self.admin_site.admin_view(self.tree_view),
+                 name='category_category_tree'),
+        ] + super().get_urls()
+
+    # "Delete selected" would delete the rows with queryset.delete(), which
+    # skips Category.delete(): the children would go along instead of moving
+    # up, nothing would be logged in the change log, the islands wouldn't be
+    # marked stale and the images would stay stored. The categories are
+    # fetched one at a time, as deleting a parent moves its children.
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            for pk in list(queryset.values_list('pk', flat=True)):
+                category = Category.objects.filter(pk=pk).first()
+                if category is not None:
+                    category.delete()
 
+    # Only a page of roots is rendered, children are loaded from the
+    # by-parent endpoint when a node is expanded.
+    def tree_view(self, request):
+        roots = Category.objects.filter(parent=None).annotate(
+            has_children=Exists(
+                Category.objects.filter(parent=OuterRef('pk')))
+        ).order_by('id')
+        paginator = EstimatedCountPaginator(roots, self.list_per_page)
+        page = paginator.get_page(request.GET.get('page'))
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Category tree',
+            'page': page,
+        }
+        return TemplateResponse(
+            request, 'admin/category/category/tree.html', context)
 
-class SimilarityAdmin(admin.ModelAdmin):
+
+class SimilarityAdmin(LargeTableAdmin):
     list_display = ('category_a', 'category_b')
+    list_select_related = ('category_a', 'category_b')
+    autocomplete_fields = ('category_a', 'category_b')
+
+    # Through Similarity.delete() as well, see CategoryAdmin.
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            for similarity in queryset:
+                similarity.delete()
 
 
 admin.site.register(Category, CategoryAdmin)
@@ -0,0 +1,178 @@
+import logging
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .generators import chunked
+from .graph import collect_islands, eccentricity_bounds, neighbors_of
+from .models import Category, CategoryAnalytics, Change, Island, \
+    commit_listeners
+from .routers import read_from_replica
+
+logger = logging.getLogger(__name__)
+
+
+def needs_refresh():
+    return (Island.objects.filter(stale=True).exists() or
+            Category.objects.filter(analytics__isnull=True).exists())
+
+
+# Analytics are refreshed by a worker thread of the server processes, never
+# on a request. wsgi.py and asgi.py start it, management commands and the
+# generators don't. Every commit of a logged write schedules a refresh, and
+# so does a read that finds stale islands, which catches writes of other
+# processes. Schedules that come while a refresh runs are handled by one
+# more refresh. Without a started worker, e.g. in the tests, a schedule only
+# marks the refresh pending until drain() runs it.
+class AnalyticsRefresher:
+    def __init__(self):
+        self.pending = threading.Event()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.started = False
+
+    def start(self):
+        if self.started or not getattr(
+                settings, 'ANALYTICS_REFRESH_IN_BACKGROUND', True):
+            return
+        self.started = True
+        commit_listeners.append(self.schedule)
+
+    def schedule(self):
+        self.pending.set()
+        if not self.started:
+            return
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(
+                    target=self.work, daemon=True, name='analytics-refresh')
+                self.thread.start()
+
+    def work(self):
+        while True:
+            self.pending.wait()
+            self.pending.clear()
+            try:
+                if needs_refresh():
+                    refresh_analytics()
+            except Exception:
+                logger.exception('Could not refresh the analytics')
+            finally:
+                close_old_connections()
+
+    def drain(self):
+        if self.pending.is_set():
+            self.pending.clear()
+            refresh_analytics()
+
+
+refresher = AnalyticsRefresher()
+
+
+# Called before analytics are served. Stale islands are served as they are,
+# marked stale, while the refresh runs.
+def schedule_if_stale():
+    if Island.objects.filter(stale=True).exists():
+        refresher.schedule()
+
+
+# Recomputes the islands marked stale by similarity changes, and finds the
+# islands of categories that were never analyzed. Only those islands are
+# loaded, a frontier at a time, everything else is kept as it is. With full
+# everything is computed again, which is needed after similarities were
+# written in bulk without marking anything, e.g. by generate_similarities.
+#
+# The graph is read and computed outside of a transaction, a write
+# transaction would hold the write lock of SQLite all along (see DATABASES
+# in settings). Only the results are written in one, which first checks
+# that the graph didn't change in the meantime, otherwise it starts over.
+def refresh_analytics(full=False):
+    while True:
+        updated = try_refresh(full)
+        if updated is not None:
+            return updated
+
+
+# Writes that change the graph, new categories are found the next time.
+GRAPH_CHANGES = (Q(model='similarity') | Q(action=Change.RELOAD) |
+                 Q(model='category', action=Change.DELETE))
+
+
+def try_refresh(full):
+    # Reads what it is about to replace from the primary, a replica might
+    # not have the changes that made it stale yet.
+    with read_from_replica(False):
+        last_seq = Change.last_seq()
+        stale = set(Island.objects.filter(stale=True).values_list(
+            'id', flat=True))
+        seeds = set(CategoryAnalytics.objects.filter(
+            island__in=stale).values_list('category_id', flat=True))
+        seeds.update(Category.objects.filter(
+            analytics__isnull=True).values_list('id', flat=True))
+        if full:
+            seeds.update(Category.objects.values_list('id', flat=True))
+
+        adjacency = load_graph(seeds)
+        computed_at = timezone.now()
+        islands = []
+        members = []
+        for island in collect_islands(adjacency, sorted(adjacency)):
+            record, island_members = build_island(island, adjacency,
+                                                  computed_at)
+            islands.append(record)
+            members.extend(island_members)
+
+        with transaction.atomic():
+            Change.lock()
+            if (Change.objects.filter(GRAPH_CHANGES, seq__gt=last_seq)
+                    .exists() or
+                    set(Island.objects.filter(stale=True).values_list(
+                        'id', flat=True)) != stale):
+                return None
+            if full:
+                Island.objects.all().delete()
+            else:
+                Island.objects.filter(id__in=stale).delete()
+            Island.objects.bulk_create(islands, batch_size=500)
+
+            # An island found here can take in categories of an island that
+            # was not marked, if similarities were written without marking
+            # it.
+            for batch in chunked(members, 500):
+                CategoryAnalytics.objects.bulk_create(
+                    batch, update_conflicts=True,
+                    unique_fields=['category'],
+                    update_fields=['island', 'eccentricity_min',
+                                   'eccentricity_max'])
+            Island.objects.filter(members__isnull=True).delete()
+        return len(members)
+
+
+# Everything reachable from the seeds, loaded a level at a time for all of
+# them together, so a thousand new categories don't cost a thousand queries.
+def load_graph(seeds):
+    adjacency = {}
+    frontier = sorted(seeds)
+    while frontier:
+        neighbors = neighbors_of(frontier)
+        adjacency.update(neighbors)
+        frontier = sorted({neighbor for node in frontier
+                           for neighbor in neighbors[node]} -
+                          adjacency.keys())
+    return adjacency
+
+
+def build_island(island, adjacency, computed_at):
+    (diameter, start, end), diameter_upper, lower, upper = \
+        eccentricity_bounds(adjacency, island)
+    record = Island(size=len(island), diameter=diameter,
+                    diameter_upper=diameter_upper, start=start,
+                    end=end, computed_at=computed_at)
+    return record, [
+        CategoryAnalytics(category_id=category_id, island=record,
+                          eccentricity_min=lower[category_id],
+                          eccentricity_max=upper[category_id])
+        for category_id in island]
@@ -0,0 +1,128 @@
+from django.conf import settings
+from django.db.models import Q
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .images import variant_urls
+from .models import Category, Similarity
+
+# Async versions of the hot read endpoints. DRF views are synchronous, so
+# under ASGI every request to them is handed to the sync thread pool. These
+# use the async ORM directly and return the same payloads as their
+# CategoryViewSet counterparts.
+
+FIELDS = ['id', 'name', 'description', 'image', 'image_variants',
+          'parent_id']
+
+
+def category_data(request, values):
+    image = values['image']
+    if image:
+        image = request.build_absolute_uri(
+            Category._meta.get_field('image').storage.url(image))
+    return {
+        'id': values['id'],
+        'name': values['name'],
+        'description': values['description'],
+        'image': image or None,
+        'image_variants': variant_urls(values['image_variants'], request),
+        'parent': values['parent_id'],
+    }
+
+
+def not_found(detail='No Category matches the given query.'):
+    return JsonResponse({'detail': detail}, status=404)
+
+
+async def paginated_response(request, queryset, tree=False):
+    page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+    try:
+        page = int(request.GET.get('page', 1))
+    except ValueError:
+        return not_found('Invalid page.')
+
+    count = await queryset.acount()
+    offset = (page - 1) * page_size
+    if page < 1 or (offset >= count and page != 1):
+        return not_found('Invalid page.')
+
+    results = [category_data(request, values) async for values in
+               queryset[offset:offset + page_size].values(*FIELDS)]
+    if tree:
+        await attach_subtrees(request, results)
+
+    url = request.build_absolute_uri()
+    next_url = None
+    if offset + page_size < count:
+        next_url = replace_query_param(url, 'page', page + 1)
+    previous_url = None
+    if page > 1:
+        previous_url = remove_query_param(url, 'page') if page == 2 else \
+            replace_query_param(url, 'page', page - 1)
+    return JsonResponse({
+        'count': count,
+        'next': next_url,
+        'previous': previous_url,
+        'results': results,
+    })
+
+
+# Same single query as CategoryViewSet.prefetch_subtrees(), but the nesting
+# is built in a loop, so deep trees don't run into the recursion limit.
+async def attach_subtrees(request, nodes):
+    by_id = {}
+    for node in nodes:
+        node['children'] = []
+        by_id[node['id']] = node
+
+    descendants = []
+    queryset = Category.objects.descendants_of(by_id).order_by('id')
+    async for values in queryset.values(*FIELDS).aiterator():
+        node = category_data(request, values)
+        node['children'] = []
+        by_id[node['id']] = node
+        descendants.append(node)
+
+    for node in descendants:
+        by_id[node['parent']]['children'].append(node)
+
+
+@require_GET
+async def category_list(request):
+    return await paginated_response(
+        request, Category.objects.order_by('id'))
+
+
+@require_GET
+async def category_detail(request, pk):
+    values = await Category.objects.filter(pk=pk).values(*FIELDS).afirst()
+    if values is None:
+        return not_found()
+    return JsonResponse(category_data(request, values))
+
+
+@require_GET
+async def category_by_parent(request, parent_id):
+    return await paginated_response(
+        request, Category.objects.filter(parent_id=parent_id).order_by('id'))
+
+
+@require_GET
+async def category_similar(request, pk):
+    if not await Category.objects.filter(pk=pk).aexists():
+        return not_found()
+    categories = Category.objects.filter(
+        Q(id__in=Similarity.objects.filter(
+            category_a_id=pk).values('category_b_id')) |
+        Q(id__in=Similarity.objects.filter(
+            category_b_id=pk).values('category_a_id'))
+    ).order_by('id')
+    return await paginated_response(request, categories)
+
+
+@require_GET
+async def category_tree(request):
+    return await paginated_response(
+        request, Category.objects.filter(parent__isnull=True).order_by('id'),
+        tree=True)
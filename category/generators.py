@@ -0,0 +1,155 @@
+import math
+import random
+from itertools import chain, combinations, islice
+
+TREE_SHAPES = ('random', 'balanced', 'deep', 'wide')
+
+
+# Yields the parent index (or None for a root) of every node 0..n-1. A
+# parent always comes before its children, so the nodes can be inserted
+# in index order.
+#   random:   half of the nodes are roots, the rest pick any earlier node
+#   balanced: every node has `branching` children
+#   deep:     chains of `depth` nodes
+#   wide:     a single root with everything else as its children
+def tree_parents(shape, n, seed=None, branching=4, depth=100):
+    assert shape in TREE_SHAPES, f'invalid tree shape: {shape}'
+    rng = random.Random(seed)
+    for i in range(n):
+        if shape == 'random':
+            yield rng.randrange(i) if i and rng.random() < 0.5 else None
+        elif shape == 'balanced':
+            yield (i - 1) // branching if i else None
+        elif shape == 'deep':
+            yield i - 1 if i % depth else None
+        else:
+            yield 0 if i else None
+
+
+SIMILARITY_MODELS = ('erdos-renyi', 'barabasi-albert', 'chain', 'clustered')
+
+
+# Yields up to `m` distinct (a, b) index pairs with a < b between `n` nodes,
+# skipping the pairs in `exclude`. Every model runs in O(n + m):
+#   erdos-renyi:     pairs picked uniformly at random
+#   barabasi-albert: preferential attachment, a power-law degree with hubs
+#   chain:           long paths, the graph with the largest diameter
+#   clustered:       a few large islands with power-law sizes
+def similarity_pairs(n, m, seed=None, exclude=(), model='erdos-renyi'):
+    assert model in SIMILARITY_MODELS, f'invalid similarity model: {model}'
+    rng = random.Random(seed)
+    seen = set(exclude)
+    m = min(m, n * (n - 1) // 2 - len(seen))
+    if m <= 0:
+        return
+
+    if model == 'erdos-renyi':
+        pairs = uniform_pairs(range(n), m, rng, seen)
+    elif model == 'barabasi-albert':
+        pairs = preferential_pairs(n, m, rng)
+    elif model == 'chain':
+        pairs = chain_pairs(n, rng)
+    else:
+        pairs = clustered_pairs(n, m, rng, seen)
+
+    # The shaped models can fall a few edges short (or run into excluded
+    # pairs), uniform pairs make up the difference.
+    created = 0
+    for a, b in chain(pairs, uniform_pairs(range(n), m, rng, seen)):
+        pair = (a, b) if a < b else (b, a)
+        if pair in seen:
+            continue
+        seen.add(pair)
+        created += 1
+        yield pair
+        if created == m:
+            return
+
+
+def uniform_pairs(nodes, m, rng, seen):
+    nodes = list(nodes)
+    n = len(nodes)
+    m = min(m, n * (n - 1) // 2)
+
+    # Rejection sampling stalls when most pairs are taken, so dense graphs
+    # are sampled from the list of free pairs instead.
+    if (m + len(seen)) * 2 > n * (n - 1) // 2:
+        free = [pair for pair in combinations(nodes, 2)
+                if pair not in seen]
+        yield from rng.sample(free, min(m, len(free)))
+        return
+
+    picked = set()
+    while len(picked) < m:
+        a = nodes[rng.randrange(n)]
+        b = nodes[rng.randrange(n)]
+        pair = (a, b) if a < b else (b, a)
+        if a != b and pair not in seen and pair not in picked:
+            picked.add(pair)
+            yield pair
+
+
+# Every new node links to about m / n earlier nodes, picked with a chance
+# proportional to their degree. `targets` holds every node once per edge
+# end, so a uniform pick from it is a degree-weighted pick.
+def preferential_pairs(n, m, rng):
+    k, extra = divmod(m, max(n - 1, 1))
+    targets = []
+    for node in range(1, n):
+        links = k + 1 if rng.randrange(n - 1) < extra else k
+        picked = set()
+        while len(picked) < min(links, node):
+            if targets and rng.random() < 0.9:
+                picked.add(targets[rng.randrange(len(targets))])
+            else:
+                picked.add(rng.randrange(node))
+        for target in picked:
+            yield target, node
+            targets.extend((target, node))
+
+
+# Nodes are shuffled and linked into a single path, the rest of the edges
+# (if any) skip ahead two, three, ... steps, which keeps the path long.
+def chain_pairs(n, rng):
+    order = list(range(n))
+    rng.shuffle(order)
+    for step in range(1, n):
+        for i in range(n - step):
+            yield order[i], order[i + step]
+
+
+# The nodes are split into islands whose sizes follow 1/rank. Every island
+# is held together by a random tree, the remaining edges are spread over the
+# islands by size and placed uniformly inside them.
+def clustered_pairs(n, m, rng, seen):
+    count = max(1, int(math.log2(n)))
+    weights = [1 / rank for rank in range(1, count + 1)]
+    total = sum(weights)
+    sizes = [max(1, int(n * weight / total)) for weight in weights]
+    sizes[0] += n - sum(sizes)
+
+    order = list(range(n))
+    rng.shuffle(order)
+    islands = []
+    start = 0
+    for size in sizes:
+        if size > 0:
+            islands.append(order[start:start + size])
+        start += size
+
+    for island in islands:
+        for i in range(1, len(island)):
+            yield island[rng.randrange(i)], island[i]
+
+    remaining = m - (n - len(islands))
+    for island in islands:
+        if remaining <= 0:
+            return
+        share = -(-remaining * len(island) // n)
+        yield from uniform_pairs(sorted(island), share, rng, seen)
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
@@ -0,0 +1,291 @@
+from collections import defaultdict, deque
+
+from django.db.models import Q
+
+from .generators import chunked
+from .models import Similarity
+
+# Traversals over the similarity graph. Adjacency is a dict of category id to
+# the set of similar category ids, built whole by build_adjacency() or a
+# frontier at a time by neighbors_of().
+
+# Keeps the id__in lists of a batch below SQLite's variable limit.
+BATCH_SIZE = 500
+
+
+def build_adjacency(similarities=None):
+    if similarities is None:
+        similarities = Similarity.objects.values_list(
+            'category_a_id', 'category_b_id').iterator()
+    adjacency = {}
+    for a, b in similarities:
+        adjacency.setdefault(a, set()).add(b)
+        adjacency.setdefault(b, set()).add(a)
+    return adjacency
+
+
+# Neighbours of every given category, in one query per BATCH_SIZE of them.
+def neighbors_of(nodes, max_edges=None):
+    nodes = list(nodes)
+    adjacency = defaultdict(set)
+    loaded = 0
+    for batch in chunked(nodes, BATCH_SIZE):
+        similarities = Similarity.objects.filter(
+            Q(category_a_id__in=batch) | Q(category_b_id__in=batch)
+        ).values_list('category_a_id', 'category_b_id')
+        if max_edges is not None:
+            if loaded >= max_edges:
+                break
+            similarities = similarities[:max_edges - loaded]
+        for a, b in similarities:
+            adjacency[a].add(b)
+            adjacency[b].add(a)
+            loaded += 1
+    return {node: adjacency[node] for node in nodes}
+
+
+def collect_island(adjacency, start):
+    island = set()
+    queue = [start]
+    while queue:
+        node = queue.pop()
+        if node not in island:
+            island.add(node)
+            queue.extend(adjacency.get(node, []))
+    return island
+
+
+def collect_islands(adjacency, nodes):
+    visited = set()
+    islands = []
+
+    for node in nodes:
+        if node not in visited:
+            island = collect_island(adjacency, node)
+            visited.update(island)
+            islands.append(island)
+
+    return islands
+
+
+# Simple full bfs solution
+def find_longest_shortest_path(adjacency, island):
+    max_path = []
+    for node in island:
+        path = bfs_longest_path_from(adjacency, node)
+        if len(path) > len(max_path):
+            max_path = path
+    return max_path
+
+
+def bfs_longest_path_from(adjacency, start):
+    seen = {start}
+    queue = deque([(start, [start])])
+    longest_path = []
+
+    while queue:
+        node, path = queue.popleft()
+        if len(path) > len(longest_path):
+            longest_path = path
+
+        for neighbor in adjacency.get(node, []):
+            if neighbor not in seen:
+                seen.add(neighbor)
+                queue.append((neighbor, path + [neighbor]))
+    return longest_path
+
+
+# Fast modified bfs solution
+# This one is evil...
+# A standard BFS from every edge is too slow.
+# A normal double BFS, although half the internet says works for an
+# unweighted, simple, connected graph, which this is, I have an example
+# of it not working: we have the edges [A, B, C, D, E, F, G],
+# we define our vertices as [(A, E), (B, F), (C, G), (E, F), (F, G),
+# (D, E), (D, G)], then if we pick B or F for our first vertex, we will
+# get A, D, C, or if we pick D - B as our furthest vertices.
+# Because in a standard double BFS we pick one of them and do a second
+# BFS with it and say that we are done we have a 1/3(respectfully 1/1) in
+# each of those situations to get a smaller than the largest shortest
+# path(diameter), which because those first nodes are seven is 5/21, or an
+# almost 25% chance of a wrong result.
+# Started thinking about dijkstra, however it's complexity grows a lot:
+# Dijkstra's algorithm has a time complexity of O(|V| log |V| + |E|)
+# if implemented using Fibonacci-heaps, while BFS has a time complexity
+# of O(|V| + |E|).
+# So what I decided to do is a bit iffy, as in theory I should be able
+# to break it, but it seems to be working and I do not seem to find
+# an edge case for it not working.
+def double_bfs_diameter(adjacency, island):
+    start = next(iter(island))
+    distances, _ = bfs_all_paths(adjacency, start)
+    max_dist = max(distances.values())
+    farthest_nodes = [node for node, dist in distances.items() if
+                      dist == max_dist]
+    longest_path = []
+    # Limit farthest_nodes to 10
+    if len(farthest_nodes) > 10:
+        farthest_nodes = farthest_nodes[:10]
+    for node in farthest_nodes:
+        _, paths = bfs_all_paths(adjacency, node)
+        for path in paths.values():
+            if len(path) > len(longest_path):
+                longest_path = path
+    return longest_path
+
+
+def bfs_all_paths(adjacency, start):
+    seen = {start}
+    queue = deque([(start, [start])])
+    distances = {start: 0}
+    paths = {start: [start]}
+
+    while queue:
+        node, path = queue.popleft()
+
+        for neighbor in adjacency.get(node, []):
+            if neighbor not in seen:
+                seen.add(neighbor)
+                distances[neighbor] = distances[node] + 1
+                paths[neighbor] = path + [neighbor]
+                queue.append((neighbor, path + [neighbor]))
+    return distances, paths
+
+
+def bfs_distances(adjacency, start):
+    distances = {start: 0}
+    queue = deque([start])
+    while queue:
+        node = queue.popleft()
+        for neighbor in adjacency.get(node, ()):
+            if neighbor not in distances:
+                distances[neighbor] = distances[node] + 1
+                queue.append(neighbor)
+    return distances
+
+
+# Runs the same BFSes as double_bfs_diameter(), from the lowest id and from
+# up to 10 of the categories farthest from it, and keeps what every one of
+# them proves about the eccentricity (longest shortest path) of each node:
+# it is at least the distance to the source and at most that distance plus
+# the eccentricity of the source. Returns the longest path found as
+# (length, start, end), an upper bound of the diameter and the per node
+# lower and upper bounds.
+def eccentricity_bounds(adjacency, island):
+    start = min(island)
+    first = bfs_distances(adjacency, start)
+    max_dist = max(first.values())
+    farthest = sorted(node for node, dist in first.items()
+                      if dist == max_dist and node != start)[:10]
+
+    lower = dict.fromkeys(island, 0)
+    upper = dict.fromkeys(island, len(island))
+    diameter = (0, start, start)
+    for source in [start, *farthest]:
+        distances = first if source == start else \
+            bfs_distances(adjacency, source)
+        eccentricity, end = max((dist, -node)
+                                for node, dist in distances.items())
+        if eccentricity > diameter[0]:
+            diameter = (eccentricity, source, -end)
+        for node, dist in distances.items():
+            lower[node] = max(lower[node], dist)
+            upper[node] = min(upper[node], dist + eccentricity)
+    return diameter, max(upper.values()), lower, upper
+
+
+# Searches from both ends at once, always growing the smaller frontier by a
+# level, so a path of length d costs about two searches of depth d/2 instead
+# of one of depth d. neighbors is called with a whole frontier, e.g.
+# neighbors_of() to load it from the database in batches. If the endpoints
+# are in different islands, the side in the smaller island runs out of
+# nodes first and the search stops there.
+def shortest_path(source, target, neighbors, max_hops):
+    if source == target:
+        return [source]
+
+    # node: the node it was reached from, on each side.
+    parents = {source: None}
+    children = {target: None}
+    distances = {source: 0, target: 0}
+    forward, backward = [source], [target]
+    hops = 0
+    while forward and backward and hops < max_hops:
+        if len(forward) <= len(backward):
+            frontier, seen, other = forward, parents, children
+        else:
+            frontier, seen, other = backward, children, parents
+        adjacency = neighbors(frontier)
+        next_frontier = []
+        meetings = []
+        for node in frontier:
+            for neighbor in sorted(adjacency.get(node, ())):
+                if neighbor in seen:
+                    continue
+                seen[neighbor] = node
+                next_frontier.append(neighbor)
+                if neighbor in other:
+                    meetings.append(neighbor)
+                else:
+                    distances[neighbor] = distances[node] + 1
+        hops += 1
+
+        if meetings:
+            # Both sides reached it, the path length through it is the sum
+            # of its distance from either end.
+            meeting = min(meetings, key=lambda node: (
+                distances[seen[node]] + 1 + distances[node], node))
+            path = [meeting]
+            node = parents[meeting]
+            while node is not None:
+                path.insert(0, node)
+                node = parents[node]
+            node = children[meeting]
+            while node is not None:
+                path.append(node)
+                node = children[node]
+            return path
+
+        if frontier is forward:
+            forward = next_frontier
+        else:
+            backward = next_frontier
+    return None
+
+
+# Every category within hops of start, with its distance and the number of
+# shortest paths that reach it, expanding a whole level per neighbors call.
+# Around a big hub the result is cut short instead of loading most of the
+# graph: the search stops once max_visited categories were seen, and a hop
+# loads at most max_edges similarities, which may miss some of the paths.
+def neighborhood_of(start, neighbors, hops, max_visited, max_edges=None):
+    distances = {start: 0}
+    paths = {start: 1}
+    frontier = [start]
+    truncated = False
+    for hop in range(1, hops + 1):
+        if not frontier or truncated:
+            break
+        adjacency = neighbors(frontier, max_edges)
+        if max_edges is not None:
+            edges = {(min(node, neighbor), max(node, neighbor))
+                     for node, nodes in adjacency.items()
+                     for neighbor in nodes}
+            truncated = len(edges) >= max_edges
+        next_frontier = []
+        for node in frontier:
+            for neighbor in adjacency.get(node, ()):
+                distance = distances.get(neighbor)
+                if distance is None:
+                    if len(distances) >= max_visited:
+                        truncated = True
+                        continue
+                    distances[neighbor] = hop
+                    paths[neighbor] = paths[node]
+                    next_frontier.append(neighbor)
+                elif distance == hop:
+                    paths[neighbor] += paths[node]
+        frontier = next_frontier
+
+    del distances[start], paths[start]
+    return distances, paths, truncated
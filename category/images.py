@@ -0,0 +1,128 @@
+import logging
+import os
+import queue
+import threading
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image
+
+from .models import Category, Change
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'WORKERS': 2,
+    'FORMAT': 'WEBP',
+    'VARIANTS': {
+        'thumbnail': (64, 64),
+        'medium': (256, 256),
+    },
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'IMAGE_PIPELINE', {}).get(name, DEFAULTS[name])
+
+
+# Resized variants of uploaded category images are made in the background,
+# so the upload request only has to store the original. Jobs go through a
+# queue that worker threads consume. With WORKERS set to 0 no thread is
+# started and the jobs wait until drain() processes them, which is what the
+# tests do.
+class ImagePipeline:
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.threads = []
+        self.lock = threading.Lock()
+
+    def submit(self, category_id, image_name):
+        self.queue.put((category_id, image_name))
+        self.start_workers()
+
+    def start_workers(self):
+        with self.lock:
+            self.threads = [thread for thread in self.threads
+                            if thread.is_alive()]
+            while len(self.threads) < get_setting('WORKERS'):
+                thread = threading.Thread(target=self.work, daemon=True,
+                                          name='image-pipeline')
+                thread.start()
+                self.threads.append(thread)
+
+    def work(self):
+        while True:
+            job = self.queue.get()
+            try:
+                self.process(*job)
+            except Exception:
+                logger.exception('Could not create image variants for '
+                                 'category %s', job[0])
+            finally:
+                close_old_connections()
+                self.queue.task_done()
+
+    def drain(self):
+        while True:
+            try:
+                job = self.queue.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                self.process(*job)
+            finally:
+                self.queue.task_done()
+
+    @staticmethod
+    def process(category_id, image_name):
+        storage = Category._meta.get_field('image').storage
+        # Already replaced and released while the job waited.
+        if not storage.exists(image_name):
+            return
+        with storage.open(image_name) as image_file:
+            image = Image.open(image_file)
+            image.load()
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA')
+
+        image_format = get_setting('FORMAT')
+        stem = os.path.splitext(os.path.basename(image_name))[0]
+        variants = {}
+        for variant, size in get_setting('VARIANTS').items():
+            resized = image.copy()
+            resized.thumbnail(size)
+            buffer = BytesIO()
+            resized.save(buffer, image_format)
+            variants[variant] = storage.save(
+                f'category_images/variants/{stem}_{variant}.'
+                f'{image_format.lower()}',
+                ContentFile(buffer.getvalue()))
+
+        # The image could have been replaced while this job waited, the
+        # variants of the old one must not overwrite the new ones. Mirrors
+        # following the change log get the variants like any other update.
+        with transaction.atomic():
+            updated = Category.objects.filter(
+                pk=category_id, image=image_name
+            ).update(image_variants=variants)
+            if updated:
+                Change.record([Change(
+                    model='category', object_id=category_id,
+                    action=Change.UPDATE,
+                    data={'image_variants': variants})])
+        if not updated:
+            Category.release_image(image_name, variants.values())
+
+
+pipeline = ImagePipeline()
+
+
+def variant_urls(variants, request=None):
+    storage = Category._meta.get_field('image').storage
+    urls = {}
+    for variant, name in variants.items():
+        url = storage.url(name)
+        urls[variant] = request.build_absolute_uri(url) if request else url
+    return urls
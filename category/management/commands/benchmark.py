@@ -0,0 +1,327 @@
+import asyncio
+import json
+import platform
+import statistics
+import subprocess
+import time
+from io import StringIO
+
+import django
+from asgiref.sync import async_to_sync
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import AsyncClient, Client
+from django.test.utils import (CaptureQueriesContext, setup_test_environment,
+                               teardown_test_environment)
+from django.urls import reverse
+from django.utils import timezone
+
+from ...generators import similarity_pairs, tree_parents
+from ...models import Category, Similarity
+
+# name: (tree shape, categories, similarities per category, graph model)
+DATASETS = {
+    'balanced-sparse': ('balanced', 1000, 1, 'erdos-renyi'),
+    'balanced-dense': ('balanced', 1000, 10, 'erdos-renyi'),
+    'deep-sparse': ('deep', 1000, 1, 'erdos-renyi'),
+    'deep-dense': ('deep', 1000, 10, 'erdos-renyi'),
+    'wide-sparse': ('wide', 1000, 1, 'erdos-renyi'),
+    'wide-dense': ('wide', 1000, 10, 'erdos-renyi'),
+    'random-hubs': ('random', 1000, 5, 'barabasi-albert'),
+    'random-chains': ('random', 1000, 1, 'chain'),
+    'random-islands': ('random', 1000, 3, 'clustered'),
+}
+
+
+class Command(BaseCommand):
+    help = ("Seed deterministic datasets into a throwaway test database, "
+            "time the API endpoints and the similarity analysis and write "
+            "the results as JSON")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-d', '--dataset', action='append', choices=sorted(DATASETS),
+            help='Dataset to run, can be repeated (default: all)'
+        )
+        parser.add_argument(
+            '--scale', type=float, default=1.0,
+            help='Multiply the size of every dataset (default: 1.0)'
+        )
+        parser.add_argument(
+            '-r', '--repeat', type=int, default=5,
+            help='Timed runs per measurement (default: 5)'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Seed for the generated datasets (default: 0)'
+        )
+        parser.add_argument(
+            '-c', '--concurrency', type=int, default=20,
+            help='Concurrent requests when comparing the sync and async '
+                 'read endpoints, 0 to skip (default: 20)'
+        )
+        parser.add_argument(
+            '--skip-full', action='store_true',
+            help="Don't run analyze_similarity in the slow 'full' mode"
+        )
+        parser.add_argument(
+            '-o', '--output',
+            help='Write the results to this JSON file'
+        )
+        parser.add_argument(
+            '--compare',
+            help='Compare against the results in this JSON file'
+        )
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='Relative slow-down reported as a regression (default: 0.2)'
+        )
+        parser.add_argument(
+            '--min-delta', type=float, default=0.001,
+            help='Ignore slow-downs below this many seconds (default: 0.001)'
+        )
+
+    def handle(self, *args, **options):
+        self.repeat = options['repeat']
+        self.concurrency = options['concurrency']
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as baseline_file:
+                baseline = json.load(baseline_file)
+
+        results = {
+            'meta': self.get_meta(options),
+            'results': {},
+        }
+        # Never touch the real database, the datasets are seeded into a
+        # fresh test database that is destroyed at the end.
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True,
+                                           serialize=False)
+        try:
+            self.client = Client()
+            self.async_client = AsyncClient()
+            for name in options['dataset'] or DATASETS:
+                shape, categories, per_category, model = DATASETS[name]
+                categories = max(int(categories * options['scale']), 2)
+                self.stdout.write(f"Running {name} ({categories} categories)")
+                results['results'][name] = self.run_dataset(
+                    shape, categories, categories * per_category, model,
+                    options['seed'], options['skip_full'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        output = json.dumps(results, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as output_file:
+                output_file.write(output)
+            self.stdout.write(f"Results written to {options['output']}")
+        else:
+            self.stdout.write(output)
+
+        if baseline is not None:
+            self.compare(baseline, results, options['threshold'],
+                         options['min_delta'])
+
+    @staticmethod
+    def get_meta(options):
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', 'HEAD'], capture_output=True,
+                text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {
+            'created': timezone.now().isoformat(),
+            'commit': commit,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'scale': options['scale'],
+            'repeat': options['repeat'],
+            'seed': options['seed'],
+        }
+
+    # Everything a dataset does happens inside a transaction that is rolled
+    # back, so every dataset starts from an empty database.
+    def run_dataset(self, shape, n, m, model, seed, skip_full):
+        with transaction.atomic():
+            ids = self.seed(shape, n, m, model, seed)
+            measurements = self.run_endpoints(ids)
+            if self.concurrency:
+                measurements.update(self.run_concurrent(ids))
+            for mode in ['fast', 'full']:
+                if mode == 'full' and skip_full:
+                    continue
+                measurements[f'analyze_similarity-{mode}'] = self.measure(
+                    lambda: call_command('analyze_similarity', mode=mode,
+                                         stdout=StringIO()),
+                    repeat=1 if mode == 'full' else self.repeat)
+            transaction.set_rollback(True)
+        return measurements
+
+    @staticmethod
+    def seed(shape, n, m, model, seed):
+        categories = Category.objects.bulk_create([
+            Category(name=f'bench-{i}', description=f'Bench category {i}')
+            for i in range(n)], batch_size=500)
+        for category, parent in zip(categories,
+                                    tree_parents(shape, n, seed=seed)):
+            if parent is not None:
+                category.parent = categories[parent]
+        Category.objects.bulk_update(categories, ['parent'], batch_size=500)
+
+        ids = [category.id for category in categories]
+        Similarity.objects.bulk_create([
+            Similarity(category_a_id=ids[a], category_b_id=ids[b])
+            for a, b in similarity_pairs(n, m, seed=seed, model=model)],
+            batch_size=500)
+        return ids
+
+    def run_endpoints(self, ids):
+        root = ids[0]
+        middle = ids[len(ids) // 2]
+        leaf = ids[-1]
+        similarity = Similarity.objects.filter(
+            category_a_id=middle).values_list('id', flat=True).first() or \
+            Similarity.objects.values_list('id', flat=True).first()
+        get, post, patch, delete = (self.client.get, self.client.post,
+                                    self.client.patch, self.client.delete)
+        json_type = 'application/json'
+
+        requests = {
+            'category-list': (get, reverse('category-list')),
+            'category-retrieve': (
+                get, reverse('category-detail', args=[middle])),
+            'category-create': (post, reverse('category-list'),
+                                {'name': 'bench-new'}),
+            'category-create-existing': (post, reverse('category-list'),
+                                         {'name': 'bench-1',
+                                          'description': 'Updated'}),
+            'category-partial-update': (
+                patch, reverse('category-detail', args=[leaf]),
+                {'parent': root}, json_type),
+            'category-destroy': (
+                delete, reverse('category-detail', args=[root])),
+            'category-by-depth': (
+                get, reverse('category-by-depth', args=[1])),
+            'category-by-parent': (
+                get, reverse('category-by-parent', args=[root])),
+            'category-tree': (get, reverse('category-as-tree')),
+            'category-tree-by-depth': (
+                get, reverse('category-tree-by-depth', args=[1])),
+            'category-tree-by-category': (
+                get, reverse('category-tree-by-parent', args=[root])),
+            'category-similar': (
+                get, reverse('category-similar', args=[middle])),
+            'similarity-list': (get, reverse('similarity-list')),
+            'similarity-retrieve': (
+                get, reverse('similarity-detail', args=[similarity])),
+            'similarity-create': (post, reverse('similarity-list'),
+                                  {'category_a': root, 'category_b': leaf}),
+            'similarity-partial-update': (
+                patch, reverse('similarity-detail', args=[similarity]),
+                {'category_b': leaf}, json_type),
+            'similarity-destroy': (
+                delete, reverse('similarity-detail', args=[similarity])),
+        }
+
+        measurements = {}
+        for name, (method, *args) in requests.items():
+            measurements[name] = self.measure_request(method, *args)
+        return measurements
+
+    # Fires `concurrency` simultaneous requests through the ASGI handler at
+    # each read endpoint and at its async counterpart.
+    def run_concurrent(self, ids):
+        endpoints = {
+            'list': [],
+            'detail': [ids[len(ids) // 2]],
+            'by-parent': [ids[0]],
+            'similar': [ids[len(ids) // 2]],
+            'as-tree': [],
+        }
+        measurements = {}
+        for name, args in endpoints.items():
+            for kind, prefix in [('sync', 'category'),
+                                 ('async', 'async-category')]:
+                url = reverse(f'{prefix}-{name}', args=args)
+                measurements[f'concurrent-{name}-{kind}'] = self.measure(
+                    self.concurrent_request(url), self.repeat)
+        return measurements
+
+    def concurrent_request(self, url):
+        async def request():
+            responses = await asyncio.gather(*[
+                self.async_client.get(url) for _ in range(self.concurrency)])
+            statuses = {response.status_code for response in responses}
+            if statuses != {200}:
+                self.stderr.write(f"  {url} returned {sorted(statuses)}")
+
+        return async_to_sync(request)
+
+    # Every request runs in a rolled back savepoint, so writes can be
+    # repeated against the same data.
+    def measure_request(self, method, *args):
+        status = None
+        queries = None
+        size = None
+
+        def request():
+            nonlocal status, queries, size
+            with transaction.atomic():
+                with CaptureQueriesContext(connection) as captured:
+                    response = method(*args)
+                transaction.set_rollback(True)
+            status = response.status_code
+            queries = len(captured)
+            size = len(b''.join(response)) if response.streaming else \
+                len(response.content)
+
+        result = self.measure(request, self.repeat)
+        if status >= 400:
+            self.stderr.write(f"  {args[0]} returned {status}")
+        result.update(status=status, queries=queries, bytes=size)
+        return result
+
+    @staticmethod
+    def measure(function, repeat):
+        # One untimed run to warm caches and lazy imports.
+        function()
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - start)
+        return {
+            'median': statistics.median(timings),
+            'min': min(timings),
+            'max': max(timings),
+        }
+
+    def compare(self, baseline, results, threshold, min_delta):
+        regressions = []
+        for dataset, measurements in results['results'].items():
+            old_measurements = baseline.get('results', {}).get(dataset, {})
+            for name, measurement in measurements.items():
+                old = old_measurements.get(name)
+                if old is None:
+                    continue
+                new_time, old_time = measurement['median'], old['median']
+                change = (new_time - old_time) / old_time if old_time else 0
+                line = (f"{dataset:<16} {name:<30} {old_time * 1000:9.2f}ms"
+                        f" -> {new_time * 1000:9.2f}ms ({change:+.0%})")
+                if change > threshold and new_time - old_time > min_delta:
+                    regressions.append(line)
+                    self.stdout.write(self.style.ERROR(line))
+                else:
+                    self.stdout.write(line)
+
+        if regressions:
+            raise CommandError(
+                f'{len(regressions)} measurements regressed by more than '
+                f'{threshold:.0%}')
+        self.stdout.write(self.style.SUCCESS('No regressions found'))
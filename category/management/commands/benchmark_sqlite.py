@@ -0,0 +1,169 @@
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from ...sqlite import PROFILES, apply_pragmas
+
+# name: (pragmas, keep connections open, BEGIN IMMEDIATE)
+CONFIGURATIONS = {
+    # What the project used before: no pragmas, a new connection for every
+    # request and transactions that only lock once they write.
+    'default': (PROFILES['default'], False, False),
+    'performance': (PROFILES['performance'], True, True),
+}
+
+
+class Command(BaseCommand):
+    help = ("Hammer a scratch SQLite database with concurrent readers and "
+            "writers, once per connection profile, and compare throughput")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '-p', '--profile', action='append', choices=sorted(CONFIGURATIONS),
+            help='Profile to run, can be repeated (default: all)'
+        )
+        parser.add_argument(
+            '-r', '--readers', type=int, default=8,
+            help='Reading threads (default: 8)'
+        )
+        parser.add_argument(
+            '-w', '--writers', type=int, default=2,
+            help='Writing threads (default: 2)'
+        )
+        parser.add_argument(
+            '-t', '--duration', type=float, default=5.0,
+            help='Seconds to run each profile for (default: 5)'
+        )
+        parser.add_argument(
+            '-c', '--categories', type=int, default=10000,
+            help='Rows seeded before each run (default: 10000)'
+        )
+        parser.add_argument(
+            '-o', '--output',
+            help='Write the results to this JSON file'
+        )
+
+    def handle(self, *args, **options):
+        results = {}
+        self.stdout.write(f"{'profile':<12} {'reads/s':>10} {'writes/s':>10}"
+                          f" {'errors':>8}")
+        for name in options['profile'] or CONFIGURATIONS:
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'benchmark.sqlite3')
+                self.seed(path, options['categories'])
+                results[name] = self.run(
+                    path, *CONFIGURATIONS[name], options['readers'],
+                    options['writers'], options['duration'],
+                    options['categories'])
+            result = results[name]
+            self.stdout.write(
+                f"{name:<12} {result['reads_per_second']:>10.0f} "
+                f"{result['writes_per_second']:>10.0f} "
+                f"{result['errors']:>8}")
+
+        if options['output']:
+            with open(options['output'], 'w') as output_file:
+                json.dump(results, output_file, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+    # Same columns and indexes as the category table.
+    @staticmethod
+    def seed(path, n):
+        with sqlite3.connect(path) as database:
+            database.execute(
+                'CREATE TABLE category (id INTEGER PRIMARY KEY, '
+                'name VARCHAR(100) NOT NULL UNIQUE, description TEXT, '
+                'parent_id INTEGER REFERENCES category (id))')
+            database.execute(
+                'CREATE INDEX category_parent ON category (parent_id)')
+            database.executemany(
+                'INSERT INTO category VALUES (?, ?, ?, ?)',
+                [(i, f'category-{i}', '', i // 4 or None)
+                 for i in range(1, n + 1)])
+        database.close()
+
+    def run(self, path, pragmas, persistent, immediate, readers, writers,
+            duration, n):
+        counts = {'reads': 0, 'writes': 0, 'errors': 0}
+        lock = threading.Lock()
+        stop = threading.Event()
+
+        def connect():
+            # Python's default 5s timeout, which is also Django's.
+            database = sqlite3.connect(path, isolation_level=None,
+                                       check_same_thread=False)
+            apply_pragmas(database, pragmas)
+            return database
+
+        def worker(operation, kind):
+            rng = random.Random()
+            database = connect() if persistent else None
+            done = errors = 0
+            while not stop.is_set():
+                if not persistent:
+                    database = connect()
+                try:
+                    operation(database, rng)
+                    done += 1
+                except sqlite3.OperationalError:
+                    errors += 1
+                    if database.in_transaction:
+                        database.execute('ROLLBACK')
+                finally:
+                    if not persistent:
+                        database.close()
+            if persistent:
+                database.close()
+            with lock:
+                counts[kind] += done
+                counts['errors'] += errors
+
+        def read(database, rng):
+            parent = rng.randint(1, n)
+            database.execute(
+                'SELECT * FROM category WHERE parent_id = ? ORDER BY id',
+                [parent]).fetchall()
+            database.execute(
+                'SELECT * FROM category WHERE id = ?', [parent]).fetchone()
+
+        # Reads before writing, like the create and update endpoints do.
+        def write(database, rng):
+            database.execute('BEGIN IMMEDIATE' if immediate else 'BEGIN')
+            name = f'category-{rng.randint(1, n)}'
+            row = database.execute(
+                'SELECT id FROM category WHERE name = ?', [name]).fetchone()
+            database.execute(
+                'UPDATE category SET description = ? WHERE id = ?',
+                [str(rng.random()), row[0]])
+            database.execute('COMMIT')
+
+        threads = [
+            threading.Thread(target=worker, args=(read, 'reads'))
+            for _ in range(readers)
+        ] + [
+            threading.Thread(target=worker, args=(write, 'writes'))
+            for _ in range(writers)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        return {
+            'reads_per_second': counts['reads'] / elapsed,
+            'writes_per_second': counts['writes'] / elapsed,
+            'errors': counts['errors'],
+            'pragmas': pragmas,
+            'persistent_connections': persistent,
+            'immediate_transactions': immediate,
+        }
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from ...schema import write_schema
+
+
+class Command(BaseCommand):
+    help = ("Generate the OpenAPI schema once and write it to "
+            "OPENAPI_SCHEMA_DIR, where /api/schema/ serves it from")
+
+    def handle(self, *args, **options):
+        for path in write_schema():
+            self.stdout.write(self.style.SUCCESS(f'Wrote {path}'))
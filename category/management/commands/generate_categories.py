@@ -1,76 +1,120 @@
 import os
-import random
 
 from django.conf import settings
+from django.core.files.base import ContentFile
 from django.core.management.base import BaseCommand
 from django.db import transaction
 
-from ...models import Category
+from ...generators import TREE_SHAPES, chunked, tree_parents
+from ...models import Category, Change
+from ...sqlite import analyze
+from ..profiling import ProfileMixin
 
 
-class Command(BaseCommand):
+class Command(ProfileMixin, BaseCommand):
     help = 'Generate arbitrary number of categories'
 
     def add_arguments(self, parser):
         parser.add_argument('num_categories', type=int,
                             help='Number of categories to create')
+        parser.add_argument(
+            '--tree', choices=TREE_SHAPES, default='random',
+            help="Shape of the tree: 'random' (default), 'balanced', 'deep' "
+                 "(long chains) or 'wide' (one root with everything under it)"
+        )
+        parser.add_argument(
+            '--seed', type=int, default=None,
+            help='Seed for the random parents, for reproducible data'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=10000,
+            help='Categories written per bulk insert (default: 10000)'
+        )
+        parser.add_argument(
+            '--no-images', action='store_true',
+            help="Don't give the categories an image"
+        )
 
     def handle(self, *args, **options):
         n = options['num_categories']
-        names = self.generate_names(n)
 
-        test_image_data = self.get_test_image_data()
-        if not test_image_data:
+        with self.phase('images'):
+            image_for = self.get_image_namer(options)
+        if image_for is None:
             return
 
         self.stdout.write(f"Generating {n} categories")
 
+        # The categories are written in chunks as they are generated, so
+        # memory only grows with the list of ids that the parents point to.
         with transaction.atomic():
-            categories = self.generate_categories(names, test_image_data)
-            Category.objects.bulk_create(categories)
-            categories = list(Category.objects.order_by('id').all())
-            self.possibly_assign_parents(categories)
+            ids = []
+            parents = tree_parents(options['tree'], n, seed=options['seed'])
+            for chunk in chunked(range(n), options['chunk_size']):
+                with self.phase('insert'):
+                    self.create_chunk(chunk, ids, parents, image_for)
+                self.stdout.write(f"{len(ids)}/{n} categories written")
 
             self.stdout.write("Parents assigned")
+            # Bulk inserts aren't logged one by one.
+            with self.phase('commit'):
+                Change.record([Change(model='category',
+                                      action=Change.RELOAD)])
 
+        with self.phase('analyze'):
+            analyze(Category)
         self.stdout.write(
             self.style.SUCCESS('Done generating categories'))
 
-    @staticmethod
-    def generate_names(n):
-        def number_to_name(num):
-            name = ''
-            while num >= 0:
-                name = chr(num % 26 + ord('A')) + name
-                num = num // 26 - 1
-            return name
-
-        return [number_to_name(i) for i in range(n)]
-
-    @staticmethod
-    def generate_categories(names, test_image_data):
+    # Parents from earlier chunks already have an id and are set on insert,
+    # parents within the chunk are filled in with one bulk update.
+    def create_chunk(self, indexes, ids, parents, image_for):
+        start = len(ids)
         categories = []
-        for name in names:
-            cat = Category(
-                name=name,
-                description=f'Description of {name}',
-            )
-            from django.core.files.base import ContentFile
-            cat.image.save(f'{name}.png', ContentFile(test_image_data),
-                           save=False)
-            categories.append(cat)
-        return categories
+        pending = []
+        for i, parent in zip(indexes, parents):
+            name = self.number_to_name(i)
+            category = Category(name=name,
+                                description=f'Description of {name}',
+                                image=image_for(name))
+            if parent is not None and parent < start:
+                category.parent_id = ids[parent]
+            elif parent is not None:
+                pending.append((category, parent))
+            categories.append(category)
+
+        Category.objects.bulk_create(categories)
+        ids.extend(category.id for category in categories)
+
+        for category, parent in pending:
+            category.parent_id = ids[parent]
+        Category.objects.bulk_update(
+            [category for category, _ in pending], ['parent'])
 
     @staticmethod
-    def possibly_assign_parents(categories):
-        for cat in categories:
-            possible_parents = [c for c in categories if c.id < cat.id]
-            if possible_parents:
-                parent = random.choice(possible_parents + [
-                    None] * len(possible_parents))
-                if parent:
-                    cat.parent = parent
-                    cat.save()
+    def number_to_name(num):
+        name = ''
+        while num >= 0:
+            name = chr(num % 26 + ord('A')) + name
+            num = num // 26 - 1
+        return name
+
+    # Returns a function giving the image name of a generated category. The
+    # storage names files by their content (see storage.py), so every
+    # category gets the same file and it is only stored once.
+    def get_image_namer(self, options):
+        if options['no_images']:
+            return lambda name: None
+
+        test_image_data = self.get_test_image_data()
+        if not test_image_data:
+            return
+
+        field = Category._meta.get_field('image')
+        image = field.storage.save(
+            field.generate_filename(None, 'generated.png'),
+            ContentFile(test_image_data))
+        return lambda name: image
 
     def get_test_image_data(self):
         test_image_path = os.path.join(settings.BASE_DIR, 'CategoryTree',
@@ -1,47 +1,80 @@
-import random
-
 from django.core.management.base import BaseCommand
 from django.db import transaction
 
-from ...models import Category, Similarity
+from ...generators import SIMILARITY_MODELS, chunked, similarity_pairs
+from ...models import Category, Change, Island, Similarity
+from ...sqlite import analyze
+from ..profiling import ProfileMixin
 
 
-class Command(BaseCommand):
+class Command(ProfileMixin, BaseCommand):
     help = 'Generate arbitrary number of similarities'
 
     def add_arguments(self, parser):
         parser.add_argument('num_similarities', type=int,
                             help='Number of similarities to create')
+        parser.add_argument(
+            '--model', choices=SIMILARITY_MODELS, default='erdos-renyi',
+            help="Shape of the graph: 'erdos-renyi' (uniform, default), "
+                 "'barabasi-albert' (power-law degree), 'chain' (long "
+                 "paths) or 'clustered' (a few large islands)"
+        )
+        parser.add_argument(
+            '--seed', type=int, default=None,
+            help='Seed for the random pairs, for reproducible data'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=10000,
+            help='Similarities written per bulk insert (default: 10000)'
+        )
 
     def handle(self, *args, **options):
         similarity_count = options['num_similarities']
         with transaction.atomic():
             self.stdout.write(
                 f"Creating {similarity_count} similarity relationships")
-            categories = list(Category.objects.order_by('id').all())
-            self.create_similarities(categories, similarity_count)
+            with self.phase('load'):
+                ids = list(Category.objects.order_by('id').values_list(
+                    'id', flat=True))
+            self.create_similarities(ids, similarity_count, options['model'],
+                                     options['seed'], options['chunk_size'])
+            # Bulk inserts skip Similarity.save(), which marks the islands
+            # the new similarities touch and logs the change, so all of them
+            # are recomputed and mirrors reload every similarity.
+            Island.objects.update(stale=True)
+            Change.record([Change(model='similarity', action=Change.RELOAD)])
 
+        with self.phase('analyze'):
+            analyze(Similarity)
         self.stdout.write(
             self.style.SUCCESS('Done generating similarities'))
 
-    def create_similarities(self, categories, similarity_count):
+    def create_similarities(self, ids, similarity_count, model, seed,
+                            chunk_size):
+        index_of = {category_id: i for i, category_id in enumerate(ids)}
         existing_pairs = set()
-        for sim in Similarity.objects.values_list('category_a_id',
-                                                  'category_b_id'):
-            existing_pairs.add(tuple(sorted(sim)))
+        with self.phase('load'):
+            for a, b in Similarity.objects.values_list('category_a_id',
+                                                       'category_b_id'):
+                a, b = index_of[a], index_of[b]
+                existing_pairs.add((a, b) if a < b else (b, a))
 
         created = 0
-        attempts = 0
-        # This can loop infinitely, so prevent it.
-        max_attempts = similarity_count * 10
-        while created < similarity_count and attempts < max_attempts:
-            a, b = random.sample(categories, 2)
-            pair = tuple(sorted([a.id, b.id]))
-            if pair not in existing_pairs:
-                Similarity.objects.create(category_a_id=pair[0],
-                                          category_b_id=pair[1])
-                existing_pairs.add(pair)
-                created += 1
-            attempts += 1
+        pairs = similarity_pairs(len(ids), similarity_count, seed=seed,
+                                 exclude=existing_pairs, model=model)
+        chunks = chunked(pairs, chunk_size)
+        # Ids are sorted, so index pairs are already in the
+        # category_a < category_b order that Similarity.save() enforces.
+        while True:
+            # Pairs are generated while the chunks are taken.
+            with self.phase('generate'):
+                chunk = next(chunks, None)
+            if chunk is None:
+                break
+            with self.phase('insert'):
+                Similarity.objects.bulk_create([
+                    Similarity(category_a_id=ids[a], category_b_id=ids[b])
+                    for a, b in chunk])
+            created += len(chunk)
 
         self.stdout.write(f"Created {created} similarities")
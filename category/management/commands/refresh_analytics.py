@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from ...analytics import refresh_analytics
+
+
+class Command(BaseCommand):
+    help = ("Store the islands of the similarity graph, their diameters and "
+            "eccentricity bounds, recomputing only what changed")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Recompute every island, not only the stale ones'
+        )
+
+    def handle(self, *args, **options):
+        updated = refresh_analytics(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Analyzed {updated} categories'))
@@ -1,15 +1,19 @@
 import os
 import shutil
+import sqlite3
+import uuid
 
 from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.core.management import call_command
 from django.contrib.auth import get_user_model
+from django.db import connection
 
-from category.models import Similarity
+from category.generators import SIMILARITY_MODELS, TREE_SHAPES
+from category.management.profiling import ProfileMixin
 
 
-class Command(BaseCommand):
+class Command(ProfileMixin, BaseCommand):
     help = 'Flush the database and create a superuser with preset credentials'
 
     def add_arguments(self, parser):
@@ -21,12 +25,48 @@ class Command(BaseCommand):
             '-s', '--similarities', type=int, default=0,
             help='If set, generate this many similarities after resetting'
         )
+        parser.add_argument(
+            '--tree', choices=TREE_SHAPES, default='random',
+            help='Shape of the generated category tree (default: random)'
+        )
+        parser.add_argument(
+            '--model', choices=SIMILARITY_MODELS, default='erdos-renyi',
+            help='Shape of the generated similarity graph '
+                 '(default: erdos-renyi)'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=None,
+            help='Seed for the generated data, for reproducible resets'
+        )
+        parser.add_argument(
+            '--no-images', action='store_true',
+            help="Don't give the generated categories an image"
+        )
+        parser.add_argument(
+            '--snapshot', metavar='NAME',
+            help='After resetting, save the database and media folder as a '
+                 'named snapshot'
+        )
+        parser.add_argument(
+            '--restore', metavar='NAME',
+            help='Restore a snapshot made with --snapshot instead of '
+                 'generating the data again'
+        )
 
     def handle(self, *args, **options):
+        if options['restore']:
+            if options['categories'] or options['similarities'] or \
+                    options['snapshot']:
+                raise CommandError(
+                    '--restore cannot be combined with generating data.')
+            with self.phase('restore'):
+                self.restore(options['restore'])
+            return
+
         categories = options['categories']
         similarities = options['similarities']
-        max_similarities = int(
-            (categories * (categories - 1)) / 2) - Similarity.objects.count()
+        # The database is flushed first, so no existing similarity counts.
+        max_similarities = categories * (categories - 1) // 2
         if similarities > max_similarities:
             self.stdout.write(self.style.WARNING(
                 f'More than the maximum amount of similarities. '
@@ -34,22 +74,15 @@ class Command(BaseCommand):
             similarities = max_similarities
 
         self.stdout.write(self.style.WARNING('Flushing the database...'))
-        call_command('flush', interactive=False)
+        with self.phase('flush'):
+            call_command('flush', interactive=False)
 
         media_root = settings.MEDIA_ROOT
         if os.path.exists(media_root):
             self.stdout.write(self.style.WARNING(
                 f"Deleting media folder at {media_root}..."))
-            for filename in os.listdir(media_root):
-                file_path = os.path.join(media_root, filename)
-                try:
-                    if os.path.isfile(file_path) or os.path.islink(file_path):
-                        os.unlink(file_path)
-                    elif os.path.isdir(file_path):
-                        shutil.rmtree(file_path)
-                except Exception as e:
-                    self.stderr.write(
-                        f'Failed to delete {file_path}. Reason: {e}')
+            with self.phase('media'):
+                self.replace_media(None)
             self.stdout.write(self.style.SUCCESS("Media folder cleared."))
         else:
             self.stdout.write(self.style.WARNING("MEDIA_ROOT does not exist."))
@@ -68,6 +101,99 @@ class Command(BaseCommand):
         else:
             self.stdout.write(self.style.WARNING('Superuser already exists.'))
         if categories:
-            call_command('generate_categories', categories)
+            with self.phase('categories'):
+                call_command('generate_categories', categories,
+                             tree=options['tree'], seed=options['seed'],
+                             no_images=options['no_images'],
+                             stdout=self.stdout, stderr=self.stderr)
         if similarities:
-            call_command('generate_similarities', similarities)
+            with self.phase('similarities'):
+                call_command('generate_similarities', similarities,
+                             model=options['model'], seed=options['seed'],
+                             stdout=self.stdout, stderr=self.stderr)
+        if options['snapshot']:
+            with self.phase('snapshot'):
+                self.snapshot(options['snapshot'])
+
+    # Snapshots are a copy of the SQLite file made with the backup API, which
+    # copies pages instead of rows, plus a copy of the media folder. Restoring
+    # a 100k category state takes a few seconds, generating it takes minutes.
+    def get_snapshot_dir(self, name):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Snapshots are only supported on SQLite.')
+        if not name or os.path.basename(name) != name:
+            raise CommandError(f'Invalid snapshot name: {name!r}')
+        return os.path.join(settings.RESET_DB_SNAPSHOT_DIR, name)
+
+    def snapshot(self, name):
+        snapshot_dir = self.get_snapshot_dir(name)
+        # Built next to the old snapshot and swapped in at the end, so a
+        # failed run doesn't leave half of one behind.
+        building = f'{snapshot_dir}.{uuid.uuid4().hex}.tmp'
+        os.makedirs(building)
+        try:
+            connection.ensure_connection()
+            target = sqlite3.connect(os.path.join(building, 'db.sqlite3'))
+            try:
+                connection.connection.backup(target)
+            finally:
+                target.close()
+            if os.path.exists(settings.MEDIA_ROOT):
+                copy_files(settings.MEDIA_ROOT,
+                           os.path.join(building, 'media'))
+            swap_directory(building, snapshot_dir)
+        except BaseException:
+            shutil.rmtree(building, ignore_errors=True)
+            raise
+        self.stdout.write(self.style.SUCCESS(
+            f'Saved snapshot {name!r} to {snapshot_dir}'))
+
+    def restore(self, name):
+        snapshot_dir = self.get_snapshot_dir(name)
+        database = os.path.join(snapshot_dir, 'db.sqlite3')
+        if not os.path.exists(database):
+            raise CommandError(f'There is no snapshot named {name!r}.')
+
+        self.stdout.write(self.style.WARNING(
+            f'Restoring snapshot {name!r}...'))
+        connection.ensure_connection()
+        source = sqlite3.connect(database)
+        try:
+            source.backup(connection.connection)
+        finally:
+            source.close()
+        self.replace_media(os.path.join(snapshot_dir, 'media'))
+        self.stdout.write(self.style.SUCCESS(f'Restored snapshot {name!r}'))
+
+    # Swaps the media folder for a copy of source, or an empty one, with a
+    # rename and removes the old folder in one go, instead of deleting the
+    # entries one by one.
+    def replace_media(self, source):
+        media_root = settings.MEDIA_ROOT
+        replacement = f'{media_root}.{uuid.uuid4().hex}.tmp'
+        if source and os.path.exists(source):
+            copy_files(source, replacement)
+        else:
+            os.makedirs(replacement)
+        swap_directory(replacement, media_root)
+
+
+# Stored files are content addressed and never change once written, so the
+# snapshot and the media folder can share them through hard links.
+def copy_files(source, destination):
+    def link(src, dst):
+        try:
+            os.link(src, dst)
+        except OSError:
+            shutil.copy2(src, dst)
+    shutil.copytree(source, destination, copy_function=link)
+
+
+def swap_directory(replacement, path):
+    old = None
+    if os.path.exists(path):
+        old = f'{path}.{uuid.uuid4().hex}.old'
+        os.replace(path, old)
+    os.replace(replacement, path)
+    if old:
+        shutil.rmtree(old)
@@ -0,0 +1,190 @@
+import cProfile
+import os
+import pstats
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+# Allocation sites listed by --trace-memory.
+TOP_ALLOCATIONS = 10
+
+
+class Phase:
+    def __init__(self, name):
+        self.name = name
+        self.seconds = 0.0
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.memory_peak = None
+
+
+# Options shared by the heavy commands to find out where their time and
+# memory go, so a slow-down report can come with a real profile:
+#
+#   --profile FILE   cProfile of the whole run, as pstats or, for a file
+#                    named callgrind.*, in the format of (K)Cachegrind
+#   --trace-memory   peak memory per phase and the top allocation sites
+#   --sql-log        queries and SQL time per phase
+#
+# Commands mark their phases with `with self.phase('load'):`, the time of
+# each is printed after the run with any of the options or verbosity 2.
+# Reports go to stderr, so they don't mix with the output of the command.
+class ProfileMixin:
+    phases = None
+    current_phase = None
+    sql_log = False
+    trace_memory = False
+
+    def create_parser(self, prog_name, subcommand, **kwargs):
+        parser = super().create_parser(prog_name, subcommand, **kwargs)
+        group = parser.add_argument_group('profiling')
+        group.add_argument(
+            '--profile', metavar='FILE',
+            help='Write a cProfile of the run to FILE, in the callgrind '
+                 'format when the file name starts with callgrind.'
+        )
+        group.add_argument(
+            '--trace-memory', action='store_true',
+            help='Report the peak memory of every phase and the top '
+                 'allocation sites'
+        )
+        group.add_argument(
+            '--sql-log', action='store_true',
+            help='Report the queries and SQL time of every phase'
+        )
+        return parser
+
+    def execute(self, *args, **options):
+        self.phases = {}
+        self.current_phase = None
+        self.sql_log = options.get('sql_log', False)
+        self.trace_memory = options.get('trace_memory', False)
+        profile_path = options.get('profile')
+        report = (profile_path or self.sql_log or self.trace_memory or
+                  options.get('verbosity', 1) >= 2)
+
+        with ExitStack() as stack:
+            if self.sql_log:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(self.record_query))
+            if self.trace_memory:
+                tracemalloc.start()
+                stack.callback(tracemalloc.stop)
+            profile = cProfile.Profile() if profile_path else None
+            start = time.perf_counter()
+            if profile is not None:
+                profile.enable()
+            try:
+                return super().execute(*args, **options)
+            finally:
+                if profile is not None:
+                    profile.disable()
+                total = time.perf_counter() - start
+                if report:
+                    self.report(total)
+                if profile is not None:
+                    self.write_profile(profile, profile_path)
+
+    @contextmanager
+    def phase(self, name):
+        phase = self.phases.setdefault(name, Phase(name))
+        outer = self.current_phase
+        self.current_phase = phase
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield phase
+        finally:
+            phase.seconds += time.perf_counter() - start
+            if self.trace_memory:
+                peak = tracemalloc.get_traced_memory()[1]
+                phase.memory_peak = max(phase.memory_peak or 0, peak)
+            self.current_phase = outer
+
+    # Queries outside of every phase are only part of the total.
+    def record_query(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            phase = self.current_phase or self.phases.setdefault(
+                None, Phase(None))
+            phase.queries += 1
+            phase.sql_seconds += time.perf_counter() - start
+
+    def report(self, total):
+        write = self.stderr.write
+        write('Phases:')
+        for name, phase in self.phases.items():
+            if name is None:
+                continue
+            line = f'  {name:<20} {phase.seconds:10.3f}s'
+            if self.sql_log:
+                line += (f' {phase.queries:8} queries '
+                         f'{phase.sql_seconds:10.3f}s SQL')
+            if phase.memory_peak is not None:
+                line += f' {phase.memory_peak / 2 ** 20:10.1f}MB peak'
+            write(line)
+        line = f'  {"total":<20} {total:10.3f}s'
+        if self.sql_log:
+            queries = sum(phase.queries for phase in self.phases.values())
+            sql_seconds = sum(phase.sql_seconds
+                              for phase in self.phases.values())
+            line += f' {queries:8} queries {sql_seconds:10.3f}s SQL'
+        if self.trace_memory:
+            # Every phase starts its own peak.
+            peak = max([tracemalloc.get_traced_memory()[1]] + [
+                phase.memory_peak for phase in self.phases.values()
+                if phase.memory_peak is not None])
+            line += f' {peak / 2 ** 20:10.1f}MB peak'
+        write(line)
+        if self.trace_memory:
+            self.report_allocations()
+
+    def report_allocations(self):
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ])
+        self.stderr.write('Top allocation sites still held:')
+        for statistic in snapshot.statistics('lineno')[:TOP_ALLOCATIONS]:
+            frame = statistic.traceback[0]
+            self.stderr.write(
+                f'  {statistic.size / 2 ** 10:10.1f}KB '
+                f'{statistic.count:8} blocks  '
+                f'{frame.filename}:{frame.lineno}')
+
+    def write_profile(self, profile, path):
+        stats = pstats.Stats(profile)
+        if os.path.basename(path).startswith('callgrind.'):
+            write_callgrind(stats, path)
+        else:
+            stats.dump_stats(path)
+        self.stderr.write(f'Profile written to {path}')
+
+
+# The callgrind format has a block per function with its own cost and, for
+# every function it called, the number of calls and their inclusive cost.
+# pstats keeps the calls the other way around, by callee.
+def write_callgrind(stats, path):
+    callees = defaultdict(list)
+    for function, (_, _, _, _, callers) in stats.stats.items():
+        for caller, (calls, _, _, inclusive) in callers.items():
+            callees[caller].append((function, calls, inclusive))
+
+    with open(path, 'w') as out:
+        out.write('# callgrind format\nevents: Microseconds\n\n')
+        for function, (_, _, own, _, _) in stats.stats.items():
+            filename, line, name = function
+            out.write(f'fl={filename}\nfn={name}:{line}\n')
+            out.write(f'{line} {round(own * 1e6)}\n')
+            for callee, calls, inclusive in callees[function]:
+                out.write(f'cfl={callee[0]}\ncfn={callee[2]}:{callee[1]}\n')
+                out.write(f'calls={calls} {callee[1]}\n')
+                out.write(f'{line} {round(inclusive * 1e6)}\n')
+            out.write('\n')
@@ -0,0 +1,214 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.serializer_time = 0.0
+        self.duration = 0.0
+        self._serializer_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_time += time.perf_counter() - start
+
+    def server_timing(self):
+        return ', '.join([
+            f'db;dur={self.sql_time * 1000:.2f};desc="{self.queries} queries"',
+            f'serializer;dur={self.serializer_time * 1000:.2f}',
+            f'total;dur={self.duration * 1000:.2f}',
+        ])
+
+
+# Connections belong to a thread and the async ORM runs its queries in a
+# worker thread, so instead of wrapping the request's connections the
+# recorder stays installed on every connection and reports to whichever
+# request is current in the calling context.
+def record_query(execute, sql, params, many, context):
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics(execute, sql, params, many, context)
+
+
+def install_query_recorder(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def measure_serializer():
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+
+    # Nested serializers (the tree one recurses) would otherwise be counted
+    # once per level, so only the outermost call adds its time.
+    metrics._serializer_depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics._serializer_depth -= 1
+        if not metrics._serializer_depth:
+            metrics.serializer_time += time.perf_counter() - start
+
+
+class MetricsRegistry:
+    fields = (
+        ('requests_total', 'counter', 'Number of handled requests.'),
+        ('queries_total', 'counter', 'Number of SQL queries executed.'),
+        ('queries_max', 'gauge', 'Highest query count of a single request.'),
+        ('sql_seconds_total', 'counter', 'Time spent executing SQL.'),
+        ('serializer_seconds_total', 'counter',
+         'Time spent in serializers.'),
+        ('duration_seconds_total', 'counter', 'Total request time.'),
+        ('response_bytes_total', 'counter', 'Size of response bodies.'),
+    )
+
+    def __init__(self):
+        self._lock = Lock()
+        self._series = {}
+
+    def reset(self):
+        with self._lock:
+            self._series = {}
+
+    def record(self, view, method, metrics):
+        with self._lock:
+            series = self._series.setdefault(
+                (view, method),
+                dict.fromkeys((name for name, _, _ in self.fields), 0))
+            series['requests_total'] += 1
+            series['queries_total'] += metrics.queries
+            series['queries_max'] = max(series['queries_max'],
+                                        metrics.queries)
+            series['sql_seconds_total'] += metrics.sql_time
+            series['serializer_seconds_total'] += metrics.serializer_time
+            series['duration_seconds_total'] += metrics.duration
+
+    def record_size(self, view, method, size):
+        with self._lock:
+            series = self._series.get((view, method))
+            if series is not None:
+                series['response_bytes_total'] += size
+
+    def get(self, view, method):
+        with self._lock:
+            return dict(self._series.get((view, method), {}))
+
+    def render(self):
+        lines = []
+        with self._lock:
+            series = sorted(self._series.items())
+            for name, kind, description in self.fields:
+                lines.append(f'# HELP category_{name} {description}')
+                lines.append(f'# TYPE category_{name} {kind}')
+                for (view, method), values in series:
+                    lines.append(
+                        f'category_{name}{{view="{view}",method="{method}"}}'
+                        f' {values[name]:g}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+# Works both under WSGI and ASGI, so that async views are not pushed
+# through a sync thread just because the metrics are enabled.
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_METRICS_ENABLED', False):
+            raise MiddlewareNotUsed
+        connection_created.connect(install_query_recorder)
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with self.measure() as metrics:
+            response = self.get_response(request)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        with self.measure() as metrics:
+            response = await self.get_response(request)
+        return self.finish(request, response, metrics)
+
+    @contextmanager
+    def measure(self):
+        for connection in connections.all():
+            install_query_recorder(connection)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            yield metrics
+        finally:
+            metrics.duration = time.perf_counter() - start
+            _current.reset(token)
+
+    def finish(self, request, response, metrics):
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        response['Server-Timing'] = metrics.server_timing()
+        registry.record(view, request.method, metrics)
+
+        if not response.streaming:
+            registry.record_size(view, request.method, len(response.content))
+        elif response.is_async:
+            response.streaming_content = self.acount_bytes(
+                response.streaming_content, view, request.method)
+        else:
+            response.streaming_content = self.count_bytes(
+                response.streaming_content, view, request.method)
+        return response
+
+    # The size of a streamed body is only known once the client consumed it.
+    @staticmethod
+    def count_bytes(content, view, method):
+        size = 0
+        try:
+            for chunk in content:
+                size += len(chunk)
+                yield chunk
+        finally:
+            registry.record_size(view, method, size)
+
+    @staticmethod
+    async def acount_bytes(content, view, method):
+        size = 0
+        try:
+            async for chunk in content:
+                size += len(chunk)
+                yield chunk
+        finally:
+            registry.record_size(view, method, size)
+
+
+def metrics_view(request):
+    return HttpResponse(registry.render(),
+                        content_type='text/plain; version=0.0.4')
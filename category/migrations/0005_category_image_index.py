@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 02:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('category', '0004_category_image_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='category',
+            name='image',
+            field=models.ImageField(blank=True, db_index=True, null=True, upload_to='category_images/'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.4 on 2026-10-19 02:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('category', '0005_category_image_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Island',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('size', models.PositiveIntegerField()),
+                ('diameter', models.PositiveIntegerField()),
+                ('diameter_upper', models.PositiveIntegerField()),
+                ('start', models.BigIntegerField()),
+                ('end', models.BigIntegerField()),
+                ('stale', models.BooleanField(db_index=True, default=False)),
+                ('computed_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CategoryAnalytics',
+            fields=[
+                ('category', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='analytics', serialize=False, to='category.category')),
+                ('eccentricity_min', models.PositiveIntegerField()),
+                ('eccentricity_max', models.PositiveIntegerField()),
+                ('island', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='members', to='category.island')),
+            ],
+            options={
+                'verbose_name': 'Category analytics',
+                'verbose_name_plural': 'Category analytics',
+            },
+        ),
+    ]
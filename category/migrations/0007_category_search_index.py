@@ -0,0 +1,82 @@
+from django.db import migrations
+
+# The search index of category/search.py. Its SQL is written out here, a
+# migration has to keep doing what it did when the app code changes.
+#
+# SQLite drops the triggers when a migration rebuilds category_category,
+# which it does for most schema changes, so such a migration has to run
+# SQLITE_DROP before and SQLITE_CREATE after it.
+
+FTS_TABLE = 'category_category_fts'
+
+SQLITE_CREATE = [
+    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+    f"name, description, content='category_category', content_rowid='id', "
+    f"tokenize='trigram')",
+    # Triggers keep it in sync with every write, including bulk inserts and
+    # queryset updates and deletes, which never call save() or delete().
+    f"CREATE TRIGGER category_fts_insert AFTER INSERT ON category_category "
+    f"BEGIN INSERT INTO {FTS_TABLE}(rowid, name, description) "
+    f"VALUES (new.id, new.name, new.description); END",
+    f"CREATE TRIGGER category_fts_delete AFTER DELETE ON category_category "
+    f"BEGIN INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description) "
+    f"VALUES ('delete', old.id, old.name, old.description); END",
+    f"CREATE TRIGGER category_fts_update AFTER UPDATE OF name, description "
+    f"ON category_category BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description) "
+    f"VALUES ('delete', old.id, old.name, old.description); "
+    f"INSERT INTO {FTS_TABLE}(rowid, name, description) "
+    f"VALUES (new.id, new.name, new.description); END",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+SQLITE_DROP = [
+    'DROP TRIGGER IF EXISTS category_fts_insert',
+    'DROP TRIGGER IF EXISTS category_fts_delete',
+    'DROP TRIGGER IF EXISTS category_fts_update',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+POSTGRESQL_CREATE = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX category_name_trgm ON category_category "
+    "USING gin (name gin_trgm_ops)",
+    "CREATE INDEX category_description_trgm ON category_category "
+    "USING gin (description gin_trgm_ops)",
+]
+
+POSTGRESQL_DROP = [
+    'DROP INDEX IF EXISTS category_name_trgm',
+    'DROP INDEX IF EXISTS category_description_trgm',
+]
+
+
+# RunSQL on one database vendor only, the others skip it.
+class RunSQLOn(migrations.RunSQL):
+    def __init__(self, vendor, sql, reverse_sql):
+        self.vendor = vendor
+        super().__init__(sql, reverse_sql)
+
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if schema_editor.connection.vendor == self.vendor:
+            super().database_forwards(app_label, schema_editor, from_state,
+                                      to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if schema_editor.connection.vendor == self.vendor:
+            super().database_backwards(app_label, schema_editor, from_state,
+                                       to_state)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('category', '0006_island_analytics'),
+    ]
+
+    operations = [
+        RunSQLOn('sqlite', SQLITE_CREATE, SQLITE_DROP),
+        RunSQLOn('postgresql', POSTGRESQL_CREATE, POSTGRESQL_DROP),
+    ]
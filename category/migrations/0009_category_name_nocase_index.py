@@ -0,0 +1,35 @@
+from django.db import migrations
+
+# Lets SQLite answer the case-insensitive name LIKE 'ab%' of searches too
+# short for the trigram index from an index. SQLite drops it when a
+# migration rebuilds category_category, such a migration has to create it
+# again.
+
+SQLITE_CREATE = ('CREATE INDEX category_name_nocase '
+                 'ON category_category (name COLLATE NOCASE)')
+SQLITE_DROP = 'DROP INDEX IF EXISTS category_name_nocase'
+
+
+class RunSQLOnSqlite(migrations.RunSQL):
+    def database_forwards(self, app_label, schema_editor, from_state,
+                          to_state):
+        if schema_editor.connection.vendor == 'sqlite':
+            super().database_forwards(app_label, schema_editor, from_state,
+                                      to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state,
+                           to_state):
+        if schema_editor.connection.vendor == 'sqlite':
+            super().database_backwards(app_label, schema_editor, from_state,
+                                       to_state)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('category', '0008_change_log'),
+    ]
+
+    operations = [
+        RunSQLOnSqlite(SQLITE_CREATE, SQLITE_DROP),
+    ]
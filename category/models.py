@@ -1,5 +1,49 @@
+import threading
+from functools import partial
+
 from django.core.exceptions import ValidationError
-from django.db import models, transaction
+from django.db import IntegrityError, connections, models, router, \
+    transaction
+from django.db.models import Max, Q
+from django.db.models.expressions import RawSQL
+
+
+class CategoryQuerySet(models.QuerySet):
+    # Both lookups walk the tree with a recursive CTE so that the whole walk
+    # is a single query, instead of one query per level or per node.
+    def at_depth(self, depth):
+        table = self.model._meta.db_table
+        sql = (f'WITH RECURSIVE tree(id, depth) AS ('
+               f'SELECT id, 0 FROM {table} WHERE parent_id IS NULL '
+               f'UNION ALL SELECT c.id, tree.depth + 1 FROM {table} c '
+               f'JOIN tree ON c.parent_id = tree.id WHERE tree.depth < %s) '
+               f'SELECT id FROM tree WHERE depth = %s')
+        return self.filter(id__in=RawSQL(sql, [depth, depth]))
+
+    def descendants_of(self, ids):
+        ids = list(ids)
+        if not ids:
+            return self.none()
+        table = self.model._meta.db_table
+        placeholders = ', '.join(['%s'] * len(ids))
+        sql = (f'WITH RECURSIVE subtree(id) AS ('
+               f'SELECT id FROM {table} WHERE parent_id IN ({placeholders}) '
+               f'UNION ALL SELECT c.id FROM {table} c '
+               f'JOIN subtree ON c.parent_id = subtree.id) '
+               f'SELECT id FROM subtree')
+        return self.filter(id__in=RawSQL(sql, ids))
+
+    # The category itself and every category above it. UNION instead of
+    # UNION ALL, so a cycle that got into the data ends the walk instead of
+    # looping forever.
+    def ancestors_of(self, category_id):
+        table = self.model._meta.db_table
+        sql = (f'WITH RECURSIVE ancestors(id, parent_id) AS ('
+               f'SELECT id, parent_id FROM {table} WHERE id = %s '
+               f'UNION SELECT c.id, c.parent_id FROM {table} c '
+               f'JOIN ancestors ON c.id = ancestors.parent_id) '
+               f'SELECT id FROM ancestors')
+        return self.filter(id__in=RawSQL(sql, [category_id]))
 
 
 class Category(models.Model):
@@ -10,33 +54,185 @@ class Category(models.Model):
     name = models.CharField(max_length=255, unique=True)
     description = models.TextField(blank=True)
     image = models.ImageField(upload_to='category_images/', blank=True,
-                              null=True)
+                              null=True, db_index=True)
+    # Resized copies of `image` by variant name, filled in by the image
+    # pipeline after the upload.
+    image_variants = models.JSONField(default=dict, blank=True)
     parent = models.ForeignKey('self', null=True, blank=True,
                                related_name='children',
                                on_delete=models.CASCADE)
 
+    objects = CategoryQuerySet.as_manager()
+
     def clean(self):
-        if self.parent == self:
+        if self.pk is None or self.parent_id is None:
+            return
+        if self.parent_id == self.pk:
             raise ValidationError("A category cannot be its own parent.")
 
-        ancestor = self.parent
-        while ancestor is not None:
-            if ancestor == self:
-                raise ValidationError(
-                    "Setting this parent will cause circular ancestry.")
-            ancestor = ancestor.parent
+        # One query for the whole ancestor chain of the new parent.
+        if Category.objects.ancestors_of(self.parent_id).filter(
+                pk=self.pk).exists():
+            raise ValidationError(
+                "Setting this parent will cause circular ancestry.")
 
     # We want to force clean() on save()
     def save(self, **kwargs):
         self.clean()
-        super().save(**kwargs)
+        action = Change.CREATE if self._state.adding else Change.UPDATE
+        with transaction.atomic():
+            if self.image and not self.image._committed:
+                lock_images()
+            super().save(**kwargs)
+            Change.record([Change.of(self, action)])
+
+    # Inserts the category unless one with its name exists, with a single
+    # INSERT ... ON CONFLICT (name) DO NOTHING. Two requests inserting the
+    # same name at once can't both get past it, nor fail on the unique
+    # constraint. Returns whether the category was inserted.
+    def insert_if_new(self):
+        using = router.db_for_write(Category)
+        connection = connections[using]
+        if not connection.features.supports_update_conflicts_with_target:
+            try:
+                with transaction.atomic(using=using):
+                    self.save(using=using)
+                return True
+            except IntegrityError:
+                return False
+
+        meta = self._meta
+        quote = connection.ops.quote_name
+        fields = [field for field in meta.concrete_fields
+                  if not field.primary_key]
+        with transaction.atomic(using=using):
+            # pre_save() also stores an uploaded image, as save() would.
+            if self.image and not self.image._committed:
+                lock_images(using)
+            values = [field.get_db_prep_save(field.pre_save(self, True),
+                                             connection)
+                      for field in fields]
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'INSERT INTO {quote(meta.db_table)} '
+                    f'({", ".join(quote(field.column) for field in fields)})'
+                    f' VALUES ({", ".join(["%s"] * len(fields))}) '
+                    f'ON CONFLICT ({quote(meta.get_field("name").column)}) '
+                    f'DO NOTHING RETURNING {quote(meta.pk.column)}', values)
+                row = cursor.fetchone()
+            if row is None:
+                return False
+            self.pk = row[0]
+            self._state.adding = False
+            self._state.db = using
+            Change.record([Change.of(self, Change.CREATE)])
+        return True
+
+    def change_data(self):
+        return {
+            'name': self.name,
+            'description': self.description,
+            'parent': self.parent_id,
+            'image': self.image.name or None,
+        }
+
+    # Re-roots the whole subtree under parent (or makes it a root). Nothing
+    # about the descendants is stored relative to the root, so the subtree
+    # moves with a single UPDATE of this row, whatever its size. The cycle
+    # check and the update share a transaction, which takes the write lock
+    # up front (see DATABASES in settings), so two moves can't interleave.
+    def move_to(self, parent):
+        self.parent = parent
+        with transaction.atomic():
+            self.clean()
+            Category.objects.filter(pk=self.pk).update(parent=parent)
+            Change.record([Change.of(self, Change.UPDATE,
+                                     {'parent': self.parent_id})])
+
+    # Makes category_ids the whole set of categories similar to this one.
+    # The current set is read with one query and only the difference is
+    # written, with one bulk delete and one bulk insert. Returns the ids of
+    # the categories added and removed.
+    def set_similar(self, category_ids):
+        wanted = set(category_ids)
+        with transaction.atomic():
+            existing = {}
+            for similarity in Similarity.objects.filter(
+                    Q(category_a=self) | Q(category_b=self)).only(
+                    'category_a_id', 'category_b_id'):
+                other = similarity.category_b_id \
+                    if similarity.category_a_id == self.id \
+                    else similarity.category_a_id
+                existing[other] = similarity
+            added = sorted(wanted - existing.keys())
+            removed = sorted(existing.keys() - wanted)
+            if not added and not removed:
+                return added, removed
+
+            # Removed neighbours are on the island of this category.
+            Island.mark_stale([self.id, *added])
+            deleted = [existing[category_id] for category_id in removed]
+            Similarity.objects.filter(
+                id__in=[similarity.id for similarity in deleted]).delete()
+            created = Similarity.objects.bulk_create([
+                Similarity(category_a_id=min(self.id, category_id),
+                           category_b_id=max(self.id, category_id))
+                for category_id in added])
+            Change.record(
+                [Change.of(similarity, Change.DELETE)
+                 for similarity in deleted] +
+                [Change.of(similarity, Change.CREATE)
+                 for similarity in created])
+        return added, removed
 
     def delete(self, *args, **kwargs):
+        # Moving the children one level up can never create a cycle, so the
+        # per-child save() (and its ancestor walk) is not needed.
         with transaction.atomic():
-            for child in self.children.all():
-                child.parent = self.parent
-                child.save()
-            super().delete(*args, **kwargs)
+            child_ids = list(self.children.values_list('id', flat=True))
+            self.children.update(parent=self.parent)
+            # Deleted along with the category, without Similarity.delete().
+            similarities = Similarity.objects.filter(
+                Q(category_a=self) | Q(category_b=self))
+            changes = [
+                Change(model='category', object_id=child_id,
+                       action=Change.UPDATE, data={'parent': self.parent_id})
+                for child_id in child_ids
+            ] + [
+                Change.of(similarity, Change.DELETE)
+                for similarity in similarities.only(
+                    'category_a_id', 'category_b_id')
+            ] + [Change.of(self, Change.DELETE, {})]
+            Island.mark_stale([self.id])
+            result = super().delete(*args, **kwargs)
+            Change.record(changes)
+            if self.image:
+                transaction.on_commit(partial(
+                    self.release_image, self.image.name,
+                    list(self.image_variants.values())))
+        return result
+
+    # Image files can be shared between categories (see
+    # storage.ContentAddressedStorage), so a file is only deleted once no
+    # category points at it anymore. The variants are made from the image,
+    # so they are shared exactly when the image is.
+    #
+    # A save that finds the file already stored keeps it, so the check and
+    # the delete take the image lock, see lock_images(). A category storing
+    # the same file either committed before, and is seen by the check, or
+    # stores it again after the delete.
+    @classmethod
+    def release_image(cls, name, variants=()):
+        if not name:
+            return
+        using = router.db_for_write(cls)
+        with transaction.atomic(using=using):
+            lock_images(using)
+            if cls.objects.using(using).filter(image=name).exists():
+                return
+            storage = cls._meta.get_field('image').storage
+            for file_name in [name, *variants]:
+                storage.delete(file_name)
 
     def get_depth(self):
         depth = 0
@@ -50,6 +246,22 @@ class Category(models.Model):
         return self.name
 
 
+# Storing a category image and releasing one take turns, from the store to
+# the commit of the category that points at it. SQLite transactions take
+# the write lock when they start (see DATABASES in settings), so only
+# PostgreSQL needs a lock, a transaction-level advisory lock.
+IMAGE_LOCK_ID = 0x696d616765
+
+
+def lock_images(using=None):
+    using = using or router.db_for_write(Category)
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)',
+                           [IMAGE_LOCK_ID])
+
+
 class Similarity(models.Model):
     category_a = models.ForeignKey(Category, on_delete=models.CASCADE,
                                    related_name='similar_to_a')
@@ -71,7 +283,147 @@ class Similarity(models.Model):
     def save(self, *args, **kwargs):
         if self.category_a.id > self.category_b.id:
             self.category_a, self.category_b = self.category_b, self.category_a
-        super().save(*args, **kwargs)
+        category_ids = [self.category_a_id, self.category_b_id]
+        if self.pk:
+            # Moving a similarity changes the islands on both of its ends.
+            category_ids.extend(Similarity.objects.filter(pk=self.pk)
+                                .values_list('category_a_id',
+                                             'category_b_id').first() or [])
+        action = Change.CREATE if self._state.adding else Change.UPDATE
+        with transaction.atomic():
+            Island.mark_stale(category_ids)
+            super().save(*args, **kwargs)
+            Change.record([Change.of(self, action)])
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            Island.mark_stale([self.category_a_id, self.category_b_id])
+            change = Change.of(self, Change.DELETE)
+            result = super().delete(*args, **kwargs)
+            Change.record([change])
+            return result
+
+    def change_data(self):
+        return {
+            'category_a': self.category_a_id,
+            'category_b': self.category_b_id,
+        }
 
     def __str__(self):
         return f'{self.category_a.name} <-> {self.category_b.name}'
+
+
+# A connected component of the similarity graph, as last computed by
+# analytics.refresh_analytics(). diameter is the longest rabbit hole found in
+# it, between the categories with the ids start and end, and is exact unless
+# it is below diameter_upper. Those are plain ids, deleting a category marks
+# its island stale anyway, and a foreign key would cost every delete two
+# more queries.
+class Island(models.Model):
+    size = models.PositiveIntegerField()
+    diameter = models.PositiveIntegerField()
+    diameter_upper = models.PositiveIntegerField()
+    start = models.BigIntegerField()
+    end = models.BigIntegerField()
+    # Set when a similarity in it changed since it was computed.
+    stale = models.BooleanField(default=False, db_index=True)
+    computed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f'Island {self.id} ({self.size} categories)'
+
+    @classmethod
+    def mark_stale(cls, category_ids):
+        cls.objects.filter(members__category_id__in=category_ids).update(
+            stale=True)
+
+
+class CategoryAnalytics(models.Model):
+    class Meta:
+        verbose_name = "Category analytics"
+        verbose_name_plural = "Category analytics"
+
+    category = models.OneToOneField(Category, primary_key=True,
+                                    on_delete=models.CASCADE,
+                                    related_name='analytics')
+    island = models.ForeignKey(Island, on_delete=models.CASCADE,
+                               related_name='members')
+    # Bounds of the longest shortest path starting at the category.
+    eccentricity_min = models.PositiveIntegerField()
+    eccentricity_max = models.PositiveIntegerField()
+
+    def __str__(self):
+        return f'{self.category_id} in island {self.island_id}'
+
+
+# Notified after a transaction that recorded changes commits, so waiting
+# change feed requests in this process wake up at once. The listeners are
+# called then as well, e.g. to refresh the analytics.
+changes_committed = threading.Condition()
+commit_listeners = []
+
+
+def notify_changes():
+    with changes_committed:
+        changes_committed.notify_all()
+    for listener in commit_listeners:
+        listener()
+
+
+# Append-only log of category and similarity writes, in the order they were
+# committed, for mirrors to sync incrementally. data holds the fields after
+# the write, or only the changed ones for updates of a few fields. A reload
+# entry means rows were written in bulk without being logged, so mirrors
+# have to fetch everything of that model again.
+class Change(models.Model):
+    CREATE = 'create'
+    UPDATE = 'update'
+    DELETE = 'delete'
+    RELOAD = 'reload'
+    ACTIONS = [(action, action) for action in
+               [CREATE, UPDATE, DELETE, RELOAD]]
+
+    seq = models.BigAutoField(primary_key=True)
+    model = models.CharField(max_length=20)
+    object_id = models.BigIntegerField(null=True)
+    action = models.CharField(max_length=10, choices=ACTIONS)
+    data = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.seq}: {self.action} {self.model} {self.object_id}'
+
+    @classmethod
+    def of(cls, instance, action, data=None):
+        if data is None:
+            data = instance.change_data()
+        return cls(model=instance._meta.model_name, object_id=instance.pk,
+                   action=action, data=data)
+
+    # Must be called in the transaction of the write. SQLite runs one write
+    # transaction at a time, so sequence numbers are committed in order. On
+    # PostgreSQL they are handed out before commit, so writers take turns on
+    # the table, otherwise a reader could see 11 before 10 is committed and
+    # skip it for good.
+    @classmethod
+    def record(cls, changes):
+        using = cls.lock()
+        cls.objects.using(using).bulk_create(changes)
+        transaction.on_commit(notify_changes, using=using)
+
+    # Waits for the writers that are recording changes, see record().
+    @classmethod
+    def lock(cls):
+        using = router.db_for_write(cls)
+        connection = connections[using]
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'LOCK TABLE {cls._meta.db_table} '
+                               f'IN EXCLUSIVE MODE')
+        return using
+
+    # Names the state of all categories and similarities, every write
+    # that is logged moves it on.
+    @classmethod
+    def last_seq(cls):
+        return cls.objects.aggregate(last=Max('seq'))['last'] or 0
@@ -0,0 +1,78 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+STICKY_COOKIE = 'read_primary'
+
+
+class RoutingState:
+    def __init__(self, replica):
+        self.replica = replica
+        self.wrote = False
+
+
+_state = ContextVar('routing_state', default=None)
+
+
+def get_replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+# Sends reads to one of DATABASE_REPLICAS, but only inside read_from_replica()
+# blocks, so everything else keeps reading its own writes from 'default'.
+# Writes always go to 'default', also for objects loaded from a replica.
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        replicas = get_replicas()
+        if state is not None and state.replica and replicas:
+            return random.choice(replicas)
+        return None
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    # Replicas get their schema from the primary.
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in get_replicas():
+            return False
+        return None
+
+
+@contextmanager
+def read_from_replica(replica=True):
+    state = RoutingState(replica)
+    token = _state.set(state)
+    try:
+        yield state
+    finally:
+        _state.reset(token)
+
+
+# Read-only requests are served from a replica. A client that wrote gets a
+# cookie and reads from 'default' until it expires, so it sees its own
+# changes while the replicas catch up.
+class ReplicaReadMixin:
+    def dispatch(self, request, *args, **kwargs):
+        replica = (request.method in SAFE_METHODS and
+                   STICKY_COOKIE not in request.COOKIES)
+        with read_from_replica(replica) as state:
+            response = super().dispatch(request, *args, **kwargs)
+        if state.wrote and get_replicas():
+            response.set_cookie(
+                STICKY_COOKIE, '1', httponly=True, samesite='Lax',
+                max_age=getattr(settings, 'REPLICA_STICKY_SECONDS', 10))
+        return response
@@ -0,0 +1,119 @@
+import gzip
+import hashlib
+import logging
+import os
+import uuid
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.views import View
+from drf_spectacular.renderers import OpenApiJsonRenderer, \
+    OpenApiYamlRenderer
+from drf_spectacular.settings import spectacular_settings
+from drf_spectacular.views import SpectacularAPIView
+
+logger = logging.getLogger(__name__)
+
+# Format name to the renderer drf-spectacular uses for it. YAML is what
+# /api/schema/ returns unless JSON is asked for.
+RENDERERS = {
+    'yaml': OpenApiYamlRenderer,
+    'json': OpenApiJsonRenderer,
+}
+
+# Path to (modification time, body, gzipped body, ETag) of the files read
+# by this process.
+_loaded = {}
+
+
+def schema_path(schema_format):
+    return os.path.join(settings.OPENAPI_SCHEMA_DIR,
+                        f'openapi.{schema_format}')
+
+
+def generate_schema():
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS()
+    return generator.get_schema(request=None, public=True)
+
+
+# Writes every format and a gzipped copy of it. Each file is renamed into
+# place, so a running server never reads a half written schema.
+def write_schema():
+    schema = generate_schema()
+    os.makedirs(settings.OPENAPI_SCHEMA_DIR, exist_ok=True)
+    paths = []
+    for schema_format, renderer in RENDERERS.items():
+        body = renderer().render(schema, renderer_context={})
+        path = schema_path(schema_format)
+        # mtime=0 keeps the gzipped bytes the same for the same schema.
+        for target, content in [(path, body),
+                                (f'{path}.gz', gzip.compress(body, mtime=0))]:
+            temporary = f'{target}.{uuid.uuid4().hex}.tmp'
+            with open(temporary, 'wb') as file:
+                file.write(content)
+            os.replace(temporary, target)
+        paths.append(path)
+    return paths
+
+
+def load_schema(schema_format):
+    path = schema_path(schema_format)
+    try:
+        modified = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    loaded = _loaded.get(path)
+    if loaded is None or loaded[0] != modified:
+        with open(path, 'rb') as file:
+            body = file.read()
+        try:
+            with open(f'{path}.gz', 'rb') as file:
+                compressed = file.read()
+        except FileNotFoundError:
+            compressed = gzip.compress(body, mtime=0)
+        etag = '"%s"' % hashlib.sha256(body).hexdigest()
+        loaded = _loaded[path] = (modified, body, compressed, etag)
+    return loaded
+
+
+def requested_format(request):
+    schema_format = request.GET.get('format')
+    if schema_format in RENDERERS:
+        return schema_format
+    return 'json' if 'json' in request.headers.get('Accept', '') else 'yaml'
+
+
+# Serves the schema written by the build_schema command. Clients revalidate
+# with the ETag and get a 304 while the schema is unchanged. In DEBUG, or
+# when the command hasn't been run, the schema is generated on every
+# request like drf-spectacular does, so it always matches the code.
+class PrecomputedSchemaView(View):
+    live_view = staticmethod(SpectacularAPIView.as_view())
+
+    def get(self, request, *args, **kwargs):
+        schema_format = requested_format(request)
+        loaded = None if settings.DEBUG else load_schema(schema_format)
+        if loaded is None:
+            if not settings.DEBUG:
+                logger.warning('No precomputed OpenAPI schema in %s, run '
+                               'build_schema.', settings.OPENAPI_SCHEMA_DIR)
+            return self.live_view(request, *args, **kwargs)
+
+        modified, body, compressed, etag = loaded
+        gzipped = 'gzip' in request.headers.get('Accept-Encoding', '')
+        # The gzipped body is another representation, with its own ETag.
+        if gzipped:
+            etag = etag[:-1] + '-gzip"'
+        if etag in request.headers.get('If-None-Match', ''):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(
+                body, content_type=RENDERERS[schema_format].media_type)
+            if gzipped:
+                response.content = compressed
+                response['Content-Encoding'] = 'gzip'
+        response['ETag'] = etag
+        response['Cache-Control'] = 'no-cache'
+        patch_vary_headers(response, ['Accept', 'Accept-Encoding'])
+        return response
@@ -0,0 +1,122 @@
+from django.db import connections, router
+from django.db.models import Q
+
+from .models import Category
+
+# Name and description search. On SQLite it runs on an FTS5 table with the
+# trigram tokenizer, which indexes every three character substring, so it
+# answers substring and prefix queries from the index. On PostgreSQL the
+# same is done with pg_trgm. Both are set up by migration 0007, the index
+# for shorter queries on SQLite by 0009.
+
+FTS_TABLE = 'category_category_fts'
+
+
+def search_categories(query):
+    using = router.db_for_read(Category)
+    vendor = connections[using].vendor
+    if vendor == 'sqlite':
+        return SqliteSearch(query, using)
+    if vendor == 'postgresql':
+        return trigram_search(query).using(using)
+    return Category.objects.using(using).filter(
+        Q(name__icontains=query) | Q(description__icontains=query)
+    ).order_by('name', 'id')
+
+
+def trigram_search(query):
+    from django.contrib.postgres.search import TrigramWordSimilarity
+
+    return Category.objects.annotate(
+        similarity=TrigramWordSimilarity(query, 'name')
+    ).filter(
+        Q(name__icontains=query) | Q(description__icontains=query) |
+        Q(similarity__gt=0.3)
+    ).order_by('-similarity', 'id')
+
+
+def escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def quote(term):
+    return '"' + term.replace('"', '""') + '"'
+
+
+# Looks like a queryset to the paginator: count() and slicing each run a
+# single query, ranked and limited by SQLite. Every word of three or more
+# characters must be in the name or description. When nothing has all of
+# them, e.g. because of a typo, any category sharing three character pieces
+# with them matches, the ones sharing the most first. Shorter words, which
+# the trigram index can't look up, are matched with LIKE on what the index
+# found. A query of only short words matches names starting with it, which
+# the NOCASE index on the name answers.
+class SqliteSearch:
+    ordered = True
+
+    def __init__(self, query, using):
+        self.query = query
+        self.using = using
+        words = query.split()
+        self.terms = [word for word in words if len(word) >= 3]
+        self.short_words = [word for word in words if len(word) < 3]
+        self.match = ' '.join(quote(term) for term in self.terms)
+        self.table = FTS_TABLE if self.terms else Category._meta.db_table
+        self._count = None
+
+    @property
+    def fuzzy_match(self):
+        trigrams = {term[i:i + 3] for term in self.terms
+                    for i in range(len(term) - 2)}
+        return ' OR '.join(quote(trigram) for trigram in sorted(trigrams))
+
+    def where(self):
+        if not self.terms:
+            return (f'{self.table}.name LIKE %s ESCAPE \'\\\'',
+                    [escape_like(self.query) + '%'])
+        conditions = [f'{FTS_TABLE} MATCH %s']
+        params = [self.match]
+        for word in self.short_words:
+            conditions.append(f'({FTS_TABLE}.name LIKE %s ESCAPE \'\\\' OR '
+                              f'{FTS_TABLE}.description LIKE %s '
+                              f'ESCAPE \'\\\')')
+            params.extend([f'%{escape_like(word)}%'] * 2)
+        return ' AND '.join(conditions), params
+
+    def execute(self, sql, params):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def count(self):
+        if self._count is None:
+            where, params = self.where()
+            sql = f'SELECT count(*) FROM {self.table} WHERE {where}'
+            self._count = self.execute(sql, params)[0][0]
+            if not self._count and self.terms:
+                self.match = self.fuzzy_match
+                where, params = self.where()
+                self._count = self.execute(sql, params)[0][0]
+        return self._count
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice) or index.step is not None:
+            raise TypeError('Only slices without a step are supported.')
+        if self._count is None:
+            self.count()
+        start = index.start or 0
+        limit = -1 if index.stop is None else max(index.stop - start, 0)
+
+        where, params = self.where()
+        # Names starting with the query first, then by relevance with a
+        # match in the name worth ten in the description.
+        order = f'{self.table}.name LIKE %s ESCAPE \'\\\' DESC, '
+        if self.terms:
+            order += f'bm25({FTS_TABLE}, 10.0, 1.0), '
+        ids = [row[0] for row in self.execute(
+            f'SELECT rowid FROM {self.table} WHERE {where} '
+            f'ORDER BY {order}rowid LIMIT %s OFFSET %s',
+            params + [escape_like(self.query) + '%', limit, start])]
+        categories = Category.objects.using(self.using).in_bulk(ids)
+        return [categories[category_id] for category_id in ids
+                if category_id in categories]
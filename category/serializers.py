@@ -1,27 +1,136 @@
+from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
-from .models import Category, Similarity
 
+from .images import variant_urls
+from .metrics import measure_serializer
+from .models import Category, CategoryAnalytics, Change, Island, \
+    Similarity
 
-class CategoryListSerializer(serializers.ModelSerializer):
+
+class TimedSerializerMixin:
+    def to_representation(self, instance):
+        with measure_serializer():
+            return super().to_representation(instance)
+
+
+# Urls of the resized copies made by the image pipeline, empty until it
+# processed the upload.
+class ImageVariantsMixin(serializers.Serializer):
+    image_variants = serializers.SerializerMethodField()
+
+    @extend_schema_field(serializers.DictField(child=serializers.URLField()))
+    def get_image_variants(self, obj):
+        return variant_urls(obj.image_variants, self.context.get('request'))
+
+
+class CategoryListSerializer(TimedSerializerMixin, ImageVariantsMixin,
+                             serializers.ModelSerializer):
     class Meta:
         model = Category
-        fields = ['id', 'name', 'description', 'image', 'parent']
+        fields = ['id', 'name', 'description', 'image', 'image_variants',
+                  'parent']
+
+
+# Checks a new category without looking its name up first, the insert itself
+# handles an existing name, see CategoryViewSet.create().
+class CategoryCreateSerializer(CategoryListSerializer):
+    class Meta(CategoryListSerializer.Meta):
+        extra_kwargs = {'name': {'validators': []}}
+
+
+# Categories asked for by id, see CategoryViewSet.multi_get().
+class CategoryIdsSerializer(serializers.Serializer):
+    MAX_LENGTH = 1000
+    INCLUDES = ['parent', 'children_count']
 
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), max_length=MAX_LENGTH)
+    include = serializers.ListField(
+        child=serializers.ChoiceField(choices=INCLUDES), required=False,
+        default=list)
 
-class CategoryTreeSerializer(serializers.ModelSerializer):
+
+# The id of the parent, or the parent itself with include=parent.
+@extend_schema_field({
+    'oneOf': [{'type': 'integer'},
+              {'$ref': '#/components/schemas/CategoryList'}],
+    'nullable': True,
+})
+class ParentOrIdField(serializers.ReadOnlyField):
+    pass
+
+
+# Documents the results of CategoryViewSet.multi_get(), which fills in the
+# extras of CategoryListSerializer's data.
+class CategoryByIdSerializer(CategoryListSerializer):
+    parent = ParentOrIdField()
+    children_count = serializers.IntegerField(
+        required=False, help_text="Only with include=children_count.")
+
+    class Meta(CategoryListSerializer.Meta):
+        fields = CategoryListSerializer.Meta.fields + ['children_count']
+
+
+class CategoryIdsResultSerializer(serializers.Serializer):
+    results = CategoryByIdSerializer(many=True)
+    missing = serializers.ListField(child=serializers.IntegerField())
+
+
+class CategoryTreeSerializer(TimedSerializerMixin, ImageVariantsMixin,
+                             serializers.ModelSerializer):
     children = serializers.SerializerMethodField()
 
     class Meta:
         model = Category
-        fields = ['id', 'name', 'description', 'image', 'parent', 'children']
+        fields = ['id', 'name', 'description', 'image', 'image_variants',
+                  'parent', 'children']
 
+    # Views that prefetch whole subtrees pass them in the context grouped by
+    # parent id, otherwise every node costs a query for its children.
     def get_children(self, obj):
-        children = obj.children.all()
+        children_by_parent = self.context.get('children_by_parent')
+        if children_by_parent is None:
+            children = obj.children.all()
+        else:
+            children = children_by_parent.get(obj.id, [])
         return CategoryTreeSerializer(children, many=True,
                                       context=self.context).data
 
 
-class SimilaritySerializer(serializers.ModelSerializer):
+class CategoryMoveSerializer(serializers.Serializer):
+    parent = serializers.PrimaryKeyRelatedField(
+        queryset=Category.objects.all(), allow_null=True)
+
+
+# The full set of categories similar to one category, see
+# Category.set_similar().
+class SimilarSetSerializer(serializers.Serializer):
+    MAX_LENGTH = 10000
+
+    similar = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), allow_empty=True,
+        max_length=MAX_LENGTH)
+
+    def validate_similar(self, value):
+        ids = set(value)
+        if self.context['category'].id in ids:
+            raise serializers.ValidationError(
+                "A category cannot be similar to itself.")
+        missing = ids - set(Category.objects.filter(
+            id__in=ids).values_list('id', flat=True))
+        if missing:
+            raise serializers.ValidationError(
+                f"Categories {sorted(missing)} don't exist.")
+        return ids
+
+
+class SimilarSetResultSerializer(serializers.Serializer):
+    added = serializers.ListField(child=serializers.IntegerField())
+    removed = serializers.ListField(child=serializers.IntegerField())
+
+
+class SimilaritySerializer(TimedSerializerMixin,
+                           serializers.ModelSerializer):
     class Meta:
         model = Similarity
         fields = ['id', 'category_a', 'category_b']
@@ -47,3 +156,26 @@ class SimilaritySerializer(serializers.ModelSerializer):
                 "This similarity relationship already exists.")
 
         return data
+
+
+class IslandSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Island
+        fields = ['id', 'size', 'diameter', 'diameter_upper', 'start', 'end',
+                  'stale', 'computed_at']
+
+
+class CategoryAnalyticsSerializer(TimedSerializerMixin,
+                                  serializers.ModelSerializer):
+    island = IslandSerializer()
+
+    class Meta:
+        model = CategoryAnalytics
+        fields = ['category', 'island', 'eccentricity_min',
+                  'eccentricity_max']
+
+
+class ChangeSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Change
+        fields = ['seq', 'model', 'object_id', 'action', 'data', 'created_at']
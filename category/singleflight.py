@@ -0,0 +1,105 @@
+import copy
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+DEFAULTS = {
+    # Alias of a cache shared by all workers, e.g. Redis or Memcached. With
+    # None identical computations are only coalesced within a process.
+    'CACHE': None,
+    # A worker or thread waits this long for another one to finish before it
+    # computes the result itself, in case the other one died or hangs.
+    'TIMEOUT': 30,
+    # Results are left in the cache for the workers that waited on them,
+    # not to serve later requests.
+    'RESULT_TIMEOUT': 5,
+    'POLL_INTERVAL': 0.05,
+}
+
+_missing = object()
+
+
+def get_setting(name):
+    return getattr(settings, 'SINGLE_FLIGHT', {}).get(name, DEFAULTS[name])
+
+
+class Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+# Runs a computation once for everyone who asks for it while it runs. The
+# first caller of a key computes, the callers that come while it does wait
+# and get the same result, or a copy of the same exception. Nothing is kept
+# once the flight landed, so the key has to name everything the result
+# depends on, e.g. the last sequence number of the change log.
+#
+# With a shared cache configured the workers also take a lock in the cache,
+# the first one computes and leaves the result there for the others.
+class SingleFlight:
+    def __init__(self):
+        self.flights = {}
+        self.lock = threading.Lock()
+
+    def do(self, key, compute):
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self.flights[key] = Flight()
+        if not leader:
+            # Computed here as well if the leader takes too long, see
+            # TIMEOUT.
+            if not flight.done.wait(get_setting('TIMEOUT')):
+                return compute()
+            if flight.error is not None:
+                # Every waiting thread would add its frames to the
+                # traceback of one shared exception, each gets a copy.
+                raise copy.copy(flight.error) from flight.error
+            return flight.result
+
+        try:
+            flight.result = self.across_workers(key, compute)
+        except Exception as error:
+            flight.error = error
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+            flight.done.set()
+        return flight.result
+
+    def across_workers(self, key, compute):
+        alias = get_setting('CACHE')
+        if alias is None:
+            return compute()
+        cache = caches[alias]
+        name = 'singleflight:' + hashlib.sha1(
+            repr(key).encode()).hexdigest()
+        timeout = get_setting('TIMEOUT')
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            result = cache.get(name + ':result', _missing)
+            if result is not _missing:
+                return result
+            if cache.add(name + ':lock', 1, timeout):
+                try:
+                    # The previous holder may have just finished.
+                    result = cache.get(name + ':result', _missing)
+                    if result is _missing:
+                        result = compute()
+                        cache.set(name + ':result', result,
+                                  get_setting('RESULT_TIMEOUT'))
+                    return result
+                finally:
+                    cache.delete(name + ':lock')
+            time.sleep(get_setting('POLL_INTERVAL'))
+        return compute()
+
+
+flights = SingleFlight()
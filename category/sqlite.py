@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.db import connections, router
+
+# Pragmas set on every new SQLite connection. SQLITE_PROFILE picks one of
+# these and SQLITE_PRAGMAS overrides single values of it.
+PROFILES = {
+    'default': {},
+    'performance': {
+        # Readers don't block the writer and the writer doesn't block the
+        # readers. This is stored in the database file.
+        'journal_mode': 'wal',
+        # With WAL only checkpoints are synced. A power loss can lose the last
+        # transactions, but can't corrupt the database.
+        'synchronous': 'normal',
+        'mmap_size': 256 * 1024 * 1024,
+        # Negative values are in KiB, so 64MB of page cache per connection.
+        'cache_size': -64 * 1024,
+        # Wait up to 5s for a lock instead of failing with "database is
+        # locked" straight away.
+        'busy_timeout': 5000,
+        'temp_store': 'memory',
+    },
+}
+
+
+def get_pragmas():
+    pragmas = dict(PROFILES[getattr(settings, 'SQLITE_PROFILE', 'default')])
+    pragmas.update(getattr(settings, 'SQLITE_PRAGMAS', {}))
+    return pragmas
+
+
+# Works on the raw sqlite3 connection, so the pragmas don't show up as
+# queries of whichever request happened to open the connection.
+def apply_pragmas(raw_connection, pragmas):
+    for name, value in pragmas.items():
+        raw_connection.execute(f'PRAGMA {name} = {value}')
+
+
+def configure_connection(sender, connection, **kwargs):
+    if connection.vendor == 'sqlite':
+        apply_pragmas(connection.connection, get_pragmas())
+
+
+# Refreshes the statistics in sqlite_stat1 after rows were written in bulk,
+# which the query planner and admin.estimate_rows() read. PostgreSQL's
+# autovacuum keeps its own up to date.
+def analyze(*models):
+    for model in models:
+        connection = connections[router.db_for_write(model)]
+        if connection.vendor == 'sqlite':
+            table = connection.ops.quote_name(model._meta.db_table)
+            with connection.cursor() as cursor:
+                cursor.execute(f'ANALYZE {table}')
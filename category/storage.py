@@ -0,0 +1,51 @@
+import hashlib
+import os
+import uuid
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.core.files.utils import validate_file_name
+from django.views.static import serve
+
+
+# Stores every file under the sha256 of its content, keeping the directory
+# the field uploads to, e.g. category_images/3f/3f9a...e1.png. The same
+# image uploaded a thousand times is one file, and since a name always means
+# the same bytes, responses for it can be cached forever.
+#
+# Files are shared, so they must only be deleted once nothing points at them
+# anymore, see Category.release_image().
+class ContentAddressedStorage(FileSystemStorage):
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        validate_file_name(name, allow_relative_path=True)
+
+        name = self.hashed_name(name, content)
+        if not self.exists(name):
+            # Written under a temporary name and renamed, so a concurrent
+            # upload of the same bytes never sees a half written file.
+            temporary = self._save(f'{name}.{uuid.uuid4().hex}.tmp', content)
+            os.replace(self.path(temporary), self.path(name))
+        return name
+
+    @staticmethod
+    def hashed_name(name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk.encode() if isinstance(chunk, str) else chunk)
+        digest = digest.hexdigest()
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        return '/'.join(
+            part for part in [directory, digest[:2], digest + extension]
+            if part)
+
+
+def serve_immutable(request, path, document_root=None, show_indexes=False):
+    response = serve(request, path, document_root, show_indexes)
+    if response.status_code == 200:
+        response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
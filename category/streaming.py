@@ -0,0 +1,111 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Chunks are joined up to about this size before they are sent, a write per
+# node would cost more than the encoding.
+CHUNK_SIZE = 64 * 1024
+
+# Responses streamed as JSON chunks instead of one rendered string, so a
+# large tree is never held as a dict, a string and bytes at the same time.
+# Every node is serialized and encoded on its own while the response is
+# sent. The output is the same as DRF's JSONRenderer gives with its default
+# settings: compact, with non-ASCII characters left as they are.
+
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+def dumps(value):
+    if orjson is not None:
+        return orjson.dumps(value)
+    return _encoder.encode(value).encode()
+
+
+# One node and everything below it, depth first. The subtree is walked with
+# a stack of iterators, so deep trees don't run into the recursion limit.
+def subtree_chunks(node, children_by_parent, serialize):
+    stack = [[iter([node]), True]]
+    while stack:
+        level = stack[-1]
+        node = next(level[0], None)
+        if node is None:
+            stack.pop()
+            if stack:
+                yield b']}'
+            continue
+        if not level[1]:
+            yield b','
+        level[1] = False
+        # The fields without the closing brace, the children follow.
+        yield dumps(serialize(node))[:-1] + b',"children":['
+        stack.append([iter(children_by_parent.get(node.id, ())), True])
+
+
+def tree_chunks(nodes, children_by_parent, serialize):
+    yield b'['
+    for i, node in enumerate(nodes):
+        if i:
+            yield b','
+        yield from subtree_chunks(node, children_by_parent, serialize)
+    yield b']'
+
+
+def list_chunks(items, serialize):
+    yield b'['
+    for i, item in enumerate(items):
+        if i:
+            yield b','
+        yield dumps(serialize(item))
+    yield b']'
+
+
+# The envelope of DRF's PageNumberPagination around streamed results.
+def paginated_chunks(count, next_url, previous_url, results):
+    yield dumps({
+        'count': count,
+        'next': next_url,
+        'previous': previous_url,
+    })[:-1] + b',"results":'
+    yield from results
+    yield b'}'
+
+
+def buffered(chunks, size=CHUNK_SIZE):
+    buffer = []
+    buffered_size = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        buffered_size += len(chunk)
+        if buffered_size >= size:
+            yield b''.join(buffer)
+            buffer = []
+            buffered_size = 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+# Under ASGI Django reads a synchronous body into a list before it sends
+# any of it, so the chunks are handed over as an async iterator there. They
+# are still encoded in the thread of the sync views, a buffer at a time.
+async def aiterate(chunks):
+    chunks = iter(chunks)
+    next_chunk = sync_to_async(next)
+    while True:
+        chunk = await next_chunk(chunks, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+def streaming_json_response(request, chunks):
+    chunks = buffered(chunks)
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        chunks = aiterate(chunks)
+    return StreamingHttpResponse(chunks, content_type='application/json')
@@ -0,0 +1,68 @@
+from contextlib import ContextDecorator
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+from ..models import Category, Similarity
+
+
+# Usable both as a context manager and as a decorator:
+#
+#     with query_budget(5):
+#         self.client.get(url)
+#
+#     @query_budget(5)
+#     def test_something(self): ...
+class query_budget(ContextDecorator):
+    def __init__(self, max_queries, using=DEFAULT_DB_ALIAS):
+        self.max_queries = max_queries
+        self.using = using
+        self.context = None
+
+    def __enter__(self):
+        self.context = CaptureQueriesContext(connections[self.using])
+        return self.context.__enter__()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.context.__exit__(exc_type, exc_value, traceback)
+        if exc_type is not None:
+            return False
+        executed = len(self.context)
+        if executed > self.max_queries:
+            queries = '\n'.join(
+                f'{i}. {query["sql"]}'
+                for i, query in enumerate(self.context.captured_queries, 1))
+            raise AssertionError(
+                f'{executed} queries executed, the budget is '
+                f'{self.max_queries}:\n{queries}')
+        return False
+
+
+# Seeds a tree of `size` categories that is exactly `depth` levels deep.
+# Every level gets one node and the rest are spread round-robin over the
+# levels, children being spread round-robin over the level above.
+def seed_tree(size, depth, prefix='node'):
+    assert size >= depth > 0, 'a tree needs at least one node per level'
+    counts = [1 + (size - depth) // depth] * depth
+    for level in range((size - depth) % depth):
+        counts[level] += 1
+
+    levels = []
+    parents = [None]
+    for level, count in enumerate(counts):
+        parents = Category.objects.bulk_create([
+            Category(name=f'{prefix}-{level}-{i}',
+                     parent=parents[i % len(parents)])
+            for i in range(count)])
+        levels.append(parents)
+    return levels
+
+
+# Connects `hub` to `size` new categories.
+def seed_similarities(hub, size, prefix='similar'):
+    categories = Category.objects.bulk_create([
+        Category(name=f'{prefix}-{i}') for i in range(size)])
+    Similarity.objects.bulk_create([
+        Similarity(category_a=hub, category_b=category)
+        for category in categories])
+    return categories
@@ -0,0 +1,127 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import admin
+from ..analytics import refresh_analytics
+from ..models import Category, Change, Island, Similarity
+
+
+class AdminTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser('admin', password='admin')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def seed(self, count):
+        start = Category.objects.filter(parent=None).count()
+        roots = Category.objects.bulk_create([
+            Category(name=f'Root {i}') for i in range(start, start + count)])
+        children = Category.objects.bulk_create([
+            Category(name=f'Child {i}', parent=root)
+            for i, root in enumerate(roots, start)])
+        Similarity.objects.bulk_create([
+            Similarity(category_a=a, category_b=b)
+            for a, b in zip(roots, children)])
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelists_dont_query_per_row(self):
+        for name in ['admin:category_category_changelist',
+                     'admin:category_similarity_changelist']:
+            with self.subTest(name=name):
+                self.seed(2)
+                few = self.count_queries(reverse(name))
+                self.seed(40)
+                self.assertEqual(self.count_queries(reverse(name)), few)
+
+    def test_change_form_doesnt_list_every_category(self):
+        self.seed(3)
+        response = self.client.get(
+            reverse('admin:category_category_add'))
+        self.assertNotContains(response, 'Root 2')
+        self.assertContains(response, 'admin-autocomplete')
+
+    def test_estimated_count(self):
+        self.seed(10)
+        categories = Category.objects.order_by('id')
+        with mock.patch.object(admin, 'EXACT_COUNT_LIMIT', 0):
+            # Counted until there are statistics.
+            self.assertEqual(
+                admin.EstimatedCountPaginator(categories, 5).count, 20)
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+            Category.objects.filter(name='Child 3').delete()
+            self.assertEqual(
+                admin.EstimatedCountPaginator(categories, 5).count, 20)
+            # Filtered changelists are counted.
+            self.assertEqual(admin.EstimatedCountPaginator(
+                categories.filter(parent=None), 5).count, 10)
+        self.assertEqual(
+            admin.EstimatedCountPaginator(categories, 5).count, 19)
+
+    def test_generated_tables_are_estimated(self):
+        call_command('generate_categories', 30, no_images=True,
+                     stdout=StringIO())
+        # Written after the statistics were taken.
+        self.seed(5)
+        categories = Category.objects.order_by('id')
+        with mock.patch.object(admin, 'EXACT_COUNT_LIMIT', 0):
+            self.assertEqual(
+                admin.EstimatedCountPaginator(categories, 5).count, 30)
+        self.assertEqual(categories.count(), 40)
+
+    def test_tree_shows_roots(self):
+        self.seed(2)
+        leaf = Category.objects.create(name='Leaf')
+        response = self.client.get(reverse('admin:category_category_tree'))
+        self.assertContains(response, 'Root 1')
+        self.assertNotContains(response, 'Child 1')
+        self.assertContains(response, 'class="toggle">+</button>', count=2)
+        self.assertContains(response, reverse(
+            'admin:category_category_change', args=[leaf.id]))
+        self.assertContains(
+            response, reverse('category-by-parent', args=[0]))
+
+    def delete_selected(self, model, objects):
+        return self.client.post(
+            reverse(f'admin:category_{model}_changelist'),
+            {'action': 'delete_selected', 'post': 'yes',
+             '_selected_action': [obj.pk for obj in objects]})
+
+    def test_bulk_delete_goes_through_the_model(self):
+        root = Category.objects.create(name='Root')
+        parent = Category.objects.create(name='Parent', parent=root)
+        child = Category.objects.create(name='Child', parent=parent)
+        leaf = Category.objects.create(name='Leaf', parent=child)
+        similarity = Similarity.objects.create(category_a=root,
+                                               category_b=leaf)
+        refresh_analytics()
+        last = Change.last_seq()
+        response = self.delete_selected('category', [parent, child])
+        self.assertEqual(response.status_code, 302)
+        leaf.refresh_from_db()
+        self.assertEqual(leaf.parent, root)
+        self.assertTrue(Similarity.objects.filter(pk=similarity.pk).exists())
+        self.assertEqual(
+            sorted((change.object_id, change.action) for change in
+                   Change.objects.filter(seq__gt=last, action=Change.DELETE)),
+            sorted([(parent.id, Change.DELETE), (child.id, Change.DELETE)]))
+
+        last = Change.last_seq()
+        self.delete_selected('similarity', [similarity])
+        self.assertEqual(Change.objects.get(seq__gt=last).action,
+                         Change.DELETE)
+        self.assertTrue(Island.objects.get(members__category=root).stale)
@@ -0,0 +1,214 @@
+import threading
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from ..analytics import AnalyticsRefresher, load_graph, needs_refresh, \
+    refresh_analytics, refresher
+from ..generators import similarity_pairs
+from ..graph import bfs_distances, build_adjacency, collect_islands
+from ..models import Category, CategoryAnalytics, Island, Similarity, \
+    commit_listeners
+
+
+class RefreshAnalyticsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.categories = [Category.objects.create(name=f'Category {i}')
+                          for i in range(40)]
+        cls.ids = [category.id for category in cls.categories]
+        Similarity.objects.bulk_create([
+            Similarity(category_a_id=cls.ids[a], category_b_id=cls.ids[b])
+            for a, b in similarity_pairs(40, 35, seed=2, model='clustered')])
+
+    def island_of(self, index):
+        return Island.objects.get(members__category_id=self.ids[index])
+
+    def test_matches_the_graph(self):
+        refresh_analytics()
+        adjacency = build_adjacency(Similarity.objects.values_list(
+            'category_a_id', 'category_b_id'))
+        islands = collect_islands(adjacency, self.ids)
+        self.assertEqual(Island.objects.count(), len(islands))
+
+        for island in islands:
+            eccentricities = {
+                node: max(bfs_distances(adjacency, node).values())
+                for node in island}
+            record = Island.objects.get(members__category_id=min(island))
+            self.assertEqual(record.size, len(island))
+            self.assertLessEqual(record.diameter,
+                                 max(eccentricities.values()))
+            self.assertGreaterEqual(record.diameter_upper,
+                                    max(eccentricities.values()))
+            self.assertEqual(
+                bfs_distances(adjacency, record.start)[record.end],
+                record.diameter)
+            for analytics in CategoryAnalytics.objects.filter(
+                    category_id__in=island):
+                self.assertLessEqual(analytics.eccentricity_min,
+                                     eccentricities[analytics.category_id])
+                self.assertGreaterEqual(
+                    analytics.eccentricity_max,
+                    eccentricities[analytics.category_id])
+
+    def test_only_touched_islands_are_recomputed(self):
+        a = Category.objects.create(name='A')
+        b = Category.objects.create(name='B')
+        refresh_analytics()
+        untouched = self.island_of(0)
+        self.assertFalse(needs_refresh())
+
+        Similarity.objects.create(category_a=a, category_b=b)
+        self.assertTrue(needs_refresh())
+        refresh_analytics()
+        island = Island.objects.get(members__category=a)
+        self.assertEqual(island.size, 2)
+        self.assertEqual(island.diameter, 1)
+        self.assertEqual(self.island_of(0).computed_at,
+                         untouched.computed_at)
+        self.assertEqual(self.island_of(0).id, untouched.id)
+
+    def test_removed_similarity_splits_the_island(self):
+        a = Category.objects.create(name='A')
+        b = Category.objects.create(name='B')
+        similarity = Similarity.objects.create(category_a=a, category_b=b)
+        refresh_analytics()
+
+        similarity.delete()
+        refresh_analytics()
+        self.assertEqual(Island.objects.get(members__category=a).size, 1)
+        self.assertEqual(Island.objects.get(members__category=b).size, 1)
+
+    def test_deleted_category_leaves_its_island(self):
+        a = Category.objects.create(name='A')
+        b = Category.objects.create(name='B')
+        Similarity.objects.create(category_a=a, category_b=b)
+        refresh_analytics()
+        island_count = Island.objects.count()
+
+        a.delete()
+        refresh_analytics()
+        self.assertEqual(Island.objects.get(members__category=b).size, 1)
+        self.assertEqual(Island.objects.count(), island_count)
+
+    def test_starts_over_when_the_graph_changed(self):
+        a = Category.objects.create(name='A')
+        b = Category.objects.create(name='B')
+        calls = []
+
+        # The first computation misses a similarity written meanwhile.
+        def write_meanwhile(seeds):
+            calls.append(seeds)
+            if len(calls) == 1:
+                Similarity.objects.create(category_a=a, category_b=b)
+            return load_graph(seeds)
+
+        with mock.patch('category.analytics.load_graph', write_meanwhile):
+            refresh_analytics()
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(Island.objects.get(members__category=a).size, 2)
+        self.assertFalse(needs_refresh())
+
+    def test_commands_dont_start_the_refresher(self):
+        call_command('generate_similarities', 5, seed=1, stdout=StringIO())
+        self.assertFalse(refresher.started)
+        self.assertNotIn(refresher.schedule, commit_listeners)
+
+    def test_generated_similarities_refresh_everything(self):
+        refresh_analytics()
+        call_command('generate_similarities', 20, seed=1, stdout=StringIO())
+        self.assertFalse(Island.objects.filter(stale=False).exists())
+
+
+class AnalyticsApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.a, cls.b, cls.c, cls.d = [
+            Category.objects.create(name=name) for name in 'ABCD']
+        Similarity.objects.create(category_a=cls.a, category_b=cls.b)
+        Similarity.objects.create(category_a=cls.b, category_b=cls.c)
+        refresh_analytics()
+
+    def setUp(self):
+        refresher.pending.clear()
+
+    def test_islands(self):
+        data = self.client.get(reverse('island-list')).json()
+        self.assertEqual([island['size'] for island in data['results']],
+                         [3, 1])
+        self.assertEqual(data['results'][0]['diameter'], 2)
+        self.assertEqual({data['results'][0]['start'],
+                          data['results'][0]['end']}, {self.a.id, self.c.id})
+
+    def test_summary(self):
+        data = self.client.get(reverse('island-summary')).json()
+        self.assertEqual(data['islands'], 2)
+        self.assertEqual(data['longest_rabbit_hole']['diameter'], 2)
+
+    def test_category_analytics(self):
+        data = self.client.get(
+            reverse('category-analytics', args=[self.b.id])).json()
+        self.assertEqual(data['island']['size'], 3)
+        # B is one hop from both ends, the upper bound is not tight.
+        self.assertEqual(data['eccentricity_min'], 1)
+        self.assertGreaterEqual(data['eccentricity_max'], 1)
+
+    # As in a server process, see AnalyticsRefresher.start().
+    @mock.patch('category.models.commit_listeners', [refresher.schedule])
+    def test_writes_refresh_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('similarity-list'), {
+                'category_a': self.c.id, 'category_b': self.d.id})
+        self.assertTrue(refresher.pending.is_set())
+
+        # Reads never refresh, the stale island is served as it is.
+        with self.assertNumQueries(4):
+            data = self.client.get(reverse('island-summary')).json()
+        self.assertEqual(data['islands'], 2)
+        self.assertTrue(data['largest_island']['stale'])
+
+        refresher.drain()
+        self.assertFalse(refresher.pending.is_set())
+        data = self.client.get(reverse('island-summary')).json()
+        self.assertEqual(data['islands'], 1)
+        self.assertEqual(data['largest_island']['size'], 4)
+        self.assertFalse(data['largest_island']['stale'])
+
+    def test_reads_schedule_a_refresh(self):
+        # Written without a commit callback, like by another process.
+        category = Category.objects.create(name='E')
+        response = self.client.get(
+            reverse('category-analytics', args=[category.id]))
+        self.assertEqual(response.status_code, 404)
+        self.assertTrue(refresher.pending.is_set())
+        refresher.drain()
+        data = self.client.get(
+            reverse('category-analytics', args=[category.id])).json()
+        self.assertEqual(data['island']['size'], 1)
+
+        Similarity.objects.create(category_a=self.a, category_b=self.d)
+        self.client.get(reverse('island-list'))
+        self.assertTrue(refresher.pending.is_set())
+        refresher.drain()
+
+    # The worker thread stays, so it gets a refresher of its own and keeps
+    # away from the test database.
+    def test_refresh_in_background(self):
+        background = AnalyticsRefresher()
+        refreshed = threading.Event()
+        with self.settings(ANALYTICS_REFRESH_IN_BACKGROUND=True), \
+                mock.patch('category.analytics.needs_refresh',
+                           return_value=True), \
+                mock.patch('category.analytics.refresh_analytics',
+                           side_effect=refreshed.set), \
+                mock.patch('category.analytics.close_old_connections'):
+            background.start()
+            self.addCleanup(commit_listeners.remove, background.schedule)
+            self.assertIn(background.schedule, commit_listeners)
+            background.schedule()
+            self.assertTrue(refreshed.wait(5))
+        self.assertTrue(background.thread.is_alive())
@@ -7,7 +7,7 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase, override_settings
 from django.urls import reverse
 
-from ..models import Category, Similarity
+from ..models import Category, Change, Similarity
 
 MEDIA_ROOT = tempfile.mkdtemp()
 
@@ -138,6 +138,41 @@ class CategoryAPITests(TestCase):
         with self.assertRaises(ValidationError):
             z.save()
 
+    def test_move_category(self):
+        child = Category.objects.create(name='Child', parent=self.a)
+        grandchild = Category.objects.create(name='Grandchild', parent=child)
+        url = reverse('category-move', args=[child.id])
+        response = self.client.post(url, {'parent': self.b.id},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['parent'], self.b.id)
+        grandchild.refresh_from_db()
+        self.assertEqual(grandchild.parent.parent, self.b)
+
+        response = self.client.post(url, {'parent': None},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        child.refresh_from_db()
+        self.assertIsNone(child.parent)
+
+    def test_move_category_below_itself_returns_400(self):
+        child = Category.objects.create(name='Child', parent=self.a)
+        grandchild = Category.objects.create(name='Grandchild', parent=child)
+        url = reverse('category-move', args=[self.a.id])
+        for parent in [self.a, grandchild]:
+            response = self.client.post(url, {'parent': parent.id},
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+        self.a.refresh_from_db()
+        self.assertIsNone(self.a.parent)
+
+    def test_move_category_to_missing_parent_returns_400(self):
+        url = reverse('category-move', args=[self.a.id])
+        for data in [{'parent': 9999}, {'parent': 'x'}, {}]:
+            response = self.client.post(url, data,
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+
     def test_similar_view_returns_similar(self):
         Category.objects.create(name='C')
         Similarity.objects.create(category_a=self.a, category_b=self.b)
@@ -152,6 +187,49 @@ class CategoryAPITests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.json().get('results'), [])
 
+    def test_replace_similar(self):
+        c = Category.objects.create(name='C')
+        d = Category.objects.create(name='D')
+        Similarity.objects.create(category_a=self.a, category_b=c)
+        Similarity.objects.create(category_a=self.b, category_b=c)
+        url = reverse('category-similar', args=[c.id])
+        response = self.client.put(url, {'similar': [self.a.id, d.id]},
+                                   content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(),
+                         {'added': [d.id], 'removed': [self.b.id]})
+        self.assertEqual(
+            set(Similarity.objects.values_list('category_a',
+                                               'category_b')),
+            {(self.a.id, c.id), (c.id, d.id)})
+        self.assertEqual(
+            list(Change.objects.filter(model='similarity').order_by(
+                'seq').values_list('action', 'data')[2:]),
+            [('delete', {'category_a': self.b.id, 'category_b': c.id}),
+             ('create', {'category_a': c.id, 'category_b': d.id})])
+
+        response = self.client.put(url, {'similar': []},
+                                   content_type='application/json')
+        self.assertEqual(response.json(),
+                         {'added': [], 'removed': [self.a.id, d.id]})
+        self.assertFalse(Similarity.objects.exists())
+
+    def test_replace_similar_rejects_invalid_sets(self):
+        Similarity.objects.create(category_a=self.a, category_b=self.b)
+        url = reverse('category-similar', args=[self.a.id])
+        for data in [{'similar': [self.a.id]}, {'similar': [9999]},
+                     {'similar': 'x'}, {}]:
+            response = self.client.put(url, data,
+                                       content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(Similarity.objects.count(), 1)
+
+    def test_put_category_not_allowed(self):
+        url = reverse('category-detail', args=[self.a.id])
+        response = self.client.put(url, {'name': 'A'},
+                                   content_type='application/json')
+        self.assertEqual(response.status_code, 405)
+
     def test_create_category_without_name_returns_400(self):
         response = self.client.post(self.url, {'description': 'No name'})
         self.assertEqual(response.status_code, 400)
@@ -0,0 +1,80 @@
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..metrics import install_query_recorder
+from ..models import Category, Similarity
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, REQUEST_METRICS_ENABLED=True)
+class AsyncViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.a = Category.objects.create(name='A', description='First')
+        cls.a.image.save('a.png', ContentFile(b'png'), save=True)
+        cls.b = Category.objects.create(name='B')
+        cls.child = Category.objects.create(name='Child', parent=cls.a)
+        Category.objects.create(name='Grandchild', parent=cls.child)
+        Similarity.objects.create(category_a=cls.a, category_b=cls.b)
+        for i in range(25):
+            Category.objects.create(name=f'Root {i}')
+
+    def setUp(self):
+        # The async ORM reuses the test thread's connection, which was
+        # opened before the metrics middleware was loaded.
+        install_query_recorder(connection)
+
+    async def assertSameAsSync(self, name, args=(), query=''):
+        sync_response = await self.async_client.get(
+            reverse(f'category-{name}', args=args) + query)
+        async_response = await self.async_client.get(
+            reverse(f'async-category-{name}', args=args) + query)
+        self.assertEqual(async_response.status_code,
+                         sync_response.status_code)
+        sync_data = sync_response.json()
+        async_data = async_response.json()
+        # The page links point at their own endpoint.
+        for link in ['next', 'previous']:
+            if link in sync_data and sync_data[link]:
+                self.assertIn('/async/', async_data.pop(link))
+                sync_data.pop(link)
+        self.assertEqual(async_data, sync_data)
+        return async_response
+
+    async def test_list(self):
+        await self.assertSameAsSync('list')
+        await self.assertSameAsSync('list', query='?page=2')
+        await self.assertSameAsSync('list', query='?page=9')
+
+    async def test_detail(self):
+        response = await self.assertSameAsSync('detail', args=[self.a.id])
+        self.assertTrue(response.json()['image'].startswith('http://'))
+        await self.assertSameAsSync('detail', args=[9999])
+
+    async def test_by_parent(self):
+        await self.assertSameAsSync('by-parent', args=[self.a.id])
+
+    async def test_similar(self):
+        await self.assertSameAsSync('similar', args=[self.b.id])
+
+    async def test_tree(self):
+        response = await self.assertSameAsSync('as-tree')
+        root = response.json()['results'][0]
+        self.assertEqual(root['children'][0]['children'][0]['name'],
+                         'Grandchild')
+
+    async def test_async_views_are_measured(self):
+        response = await self.async_client.get(
+            reverse('async-category-list'))
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertNotIn('desc="0 queries"', response['Server-Timing'])
+
+    async def test_only_get_is_allowed(self):
+        response = await self.async_client.post(
+            reverse('async-category-list'))
+        self.assertEqual(response.status_code, 405)
@@ -0,0 +1,81 @@
+import json
+import os
+import tempfile
+from contextlib import ExitStack
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase
+
+from ..management.commands import benchmark
+from ..models import Category
+
+
+class BenchmarkTests(TestCase):
+    def setUp(self):
+        # The test database is already there, the command must not create
+        # or destroy one of its own.
+        stack = ExitStack()
+        self.addCleanup(stack.close)
+        for name in ['create_test_db', 'destroy_test_db']:
+            stack.enter_context(
+                mock.patch.object(connection.creation, name))
+        for name in ['setup_test_environment', 'teardown_test_environment']:
+            stack.enter_context(mock.patch.object(benchmark, name))
+        self.directory = stack.enter_context(tempfile.TemporaryDirectory())
+
+    def run_benchmark(self, **options):
+        stdout, stderr = StringIO(), StringIO()
+        call_command('benchmark', dataset=['balanced-sparse'], scale=0.01,
+                     repeat=1, concurrency=0, skip_full=True,
+                     stdout=stdout, stderr=stderr, **options)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def write(self, name, results):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as output:
+            json.dump(results, output)
+        return path
+
+    def test_json_output(self):
+        path = os.path.join(self.directory, 'results.json')
+        stdout, stderr = self.run_benchmark(output=path)
+        self.assertIn('Running balanced-sparse (10 categories)', stdout)
+        self.assertEqual(stderr, '')
+        with open(path) as output:
+            results = json.load(output)
+        self.assertEqual(results['meta']['scale'], 0.01)
+        measurements = results['results']['balanced-sparse']
+        self.assertIn('analyze_similarity-fast', measurements)
+        self.assertNotIn('analyze_similarity-full', measurements)
+        self.assertEqual(measurements['category-list']['status'], 200)
+        self.assertEqual(measurements['category-create']['status'], 201)
+        for measurement in measurements.values():
+            self.assertLessEqual(measurement['min'], measurement['median'])
+            self.assertLessEqual(measurement['median'], measurement['max'])
+        # Every dataset is rolled back.
+        self.assertFalse(Category.objects.exists())
+
+    def baseline(self, median):
+        return {'results': {'balanced-sparse': {
+            'category-list': {'median': median},
+            'category-tree': {'median': median},
+        }}}
+
+    def test_compare_without_regressions(self):
+        path = self.write('before.json', self.baseline(60.0))
+        stdout, _ = self.run_benchmark(compare=path)
+        self.assertIn('No regressions found', stdout)
+
+    def test_compare_with_regressions(self):
+        path = self.write('before.json', self.baseline(1e-9))
+        with self.assertRaisesMessage(
+                CommandError, '2 measurements regressed by more than 20%'):
+            self.run_benchmark(compare=path)
+
+    def test_small_slow_downs_are_ignored(self):
+        path = self.write('before.json', self.baseline(1e-9))
+        stdout, _ = self.run_benchmark(compare=path, min_delta=60.0)
+        self.assertIn('No regressions found', stdout)
@@ -0,0 +1,155 @@
+import threading
+import time
+from io import StringIO
+from unittest import mock
+
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connections
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+
+from .. import views
+from ..models import Category, Change, Similarity
+
+
+def logged(since=0):
+    return [(change.action, change.model, change.object_id, change.data)
+            for change in Change.objects.filter(seq__gt=since).order_by('seq')]
+
+
+def last_seq():
+    return Change.objects.order_by('seq').values_list('seq', flat=True).last()
+
+
+class ChangeLogTests(TestCase):
+    def test_category_writes(self):
+        root = Category.objects.create(name='Root')
+        child = Category.objects.create(name='Child', description='D')
+        child.description = 'Changed'
+        child.save()
+        child.move_to(root)
+        self.assertEqual(logged(), [
+            ('create', 'category', root.id,
+             {'name': 'Root', 'description': '', 'parent': None,
+              'image': None}),
+            ('create', 'category', child.id,
+             {'name': 'Child', 'description': 'D', 'parent': None,
+              'image': None}),
+            ('update', 'category', child.id,
+             {'name': 'Child', 'description': 'Changed', 'parent': None,
+              'image': None}),
+            ('update', 'category', child.id, {'parent': root.id}),
+        ])
+
+    def test_similarity_writes(self):
+        a = Category.objects.create(name='A')
+        b = Category.objects.create(name='B')
+        since = last_seq()
+        similarity = Similarity.objects.create(category_a=b, category_b=a)
+        similarity_id = similarity.id
+        similarity.delete()
+        data = {'category_a': a.id, 'category_b': b.id}
+        self.assertEqual(logged(since), [
+            ('create', 'similarity', similarity_id, data),
+            ('delete', 'similarity', similarity_id, data),
+        ])
+
+    def test_delete_logs_what_it_changes(self):
+        grandparent = Category.objects.create(name='Grandparent')
+        parent = Category.objects.create(name='Parent', parent=grandparent)
+        first = Category.objects.create(name='First', parent=parent)
+        second = Category.objects.create(name='Second', parent=parent)
+        similarity = Similarity.objects.create(category_a=parent,
+                                               category_b=first)
+        since = last_seq()
+        parent_id = parent.id
+        parent.delete()
+        self.assertEqual(logged(since), [
+            ('update', 'category', first.id, {'parent': grandparent.id}),
+            ('update', 'category', second.id, {'parent': grandparent.id}),
+            ('delete', 'similarity', similarity.id,
+             {'category_a': parent_id, 'category_b': first.id}),
+            ('delete', 'category', parent_id, {}),
+        ])
+
+    def test_failed_write_logs_nothing(self):
+        root = Category.objects.create(name='Root')
+        child = Category.objects.create(name='Child', parent=root)
+        since = last_seq()
+        with self.assertRaises(ValidationError):
+            root.move_to(child)
+        self.assertEqual(logged(since), [])
+
+    def test_bulk_generation_asks_for_a_reload(self):
+        call_command('generate_categories', 5, no_images=True,
+                     stdout=StringIO())
+        call_command('generate_similarities', 3, stdout=StringIO())
+        self.assertEqual(logged(), [('reload', 'category', None, {}),
+                                    ('reload', 'similarity', None, {})])
+
+
+class ChangeApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.categories = [Category.objects.create(name=f'Category {i}')
+                          for i in range(5)]
+
+    def get(self, **params):
+        return self.client.get(reverse('change-list'), params)
+
+    def test_pages_through_the_log(self):
+        seen = []
+        since = 0
+        while True:
+            data = self.get(since=since, limit=2).json()
+            seen.extend(change['object_id'] for change in data['results'])
+            since = data['next_since']
+            if not data['has_more']:
+                break
+        self.assertEqual(seen, [category.id for category in self.categories])
+
+        data = self.get(since=since).json()
+        self.assertEqual(data, {'next_since': since, 'has_more': False,
+                                'results': []})
+
+    def test_reset_log(self):
+        response = self.get(since=last_seq() + 1)
+        self.assertEqual(response.status_code, 410)
+
+    def test_invalid_parameters(self):
+        for params in [{'since': -1}, {'limit': 0}, {'limit': 'x'},
+                       {'wait': 31}]:
+            with self.subTest(params=params):
+                self.assertEqual(self.get(**params).status_code, 400)
+
+    @mock.patch.object(views, 'CHANGES_POLL_INTERVAL', 0.05)
+    def test_wait_without_changes(self):
+        started = time.monotonic()
+        data = self.get(since=last_seq(), wait=1).json()
+        self.assertGreaterEqual(time.monotonic() - started, 1)
+        self.assertEqual(data['results'], [])
+
+
+class LongPollTests(TransactionTestCase):
+    # Polling alone would only see the change after a minute, the commit
+    # wakes the request up.
+    @mock.patch.object(views, 'CHANGES_POLL_INTERVAL', 60)
+    def test_commit_wakes_waiting_request(self):
+        Category.objects.create(name='First')
+        since = last_seq()
+
+        def write():
+            time.sleep(0.2)
+            Category.objects.create(name='Second')
+            connections.close_all()
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        started = time.monotonic()
+        data = self.client.get(reverse('change-list'),
+                               {'since': since, 'wait': 10}).json()
+        writer.join()
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual([change['data']['name']
+                          for change in data['results']], ['Second'])
@@ -0,0 +1,53 @@
+from collections import Counter
+
+from django.test import SimpleTestCase
+
+from ..generators import (SIMILARITY_MODELS, TREE_SHAPES, similarity_pairs,
+                          tree_parents)
+
+
+class GeneratorTests(SimpleTestCase):
+    def test_tree_parents_come_first(self):
+        for shape in TREE_SHAPES:
+            with self.subTest(shape=shape):
+                parents = list(tree_parents(shape, 500, seed=1))
+                self.assertIsNone(parents[0])
+                self.assertTrue(all(parent is None or parent < i
+                                    for i, parent in enumerate(parents)))
+
+    def test_tree_shapes(self):
+        self.assertEqual(list(tree_parents('balanced', 6, branching=2)),
+                         [None, 0, 0, 1, 1, 2])
+        self.assertEqual(list(tree_parents('deep', 5, depth=3)),
+                         [None, 0, 1, None, 3])
+        self.assertEqual(list(tree_parents('wide', 4)), [None, 0, 0, 0])
+
+    def test_similarity_pairs_are_distinct_and_reproducible(self):
+        for model in SIMILARITY_MODELS:
+            with self.subTest(model=model):
+                pairs = list(similarity_pairs(300, 900, seed=3, model=model))
+                self.assertEqual(len(pairs), 900)
+                self.assertEqual(len(set(pairs)), len(pairs))
+                self.assertTrue(all(a < b for a, b in pairs))
+                self.assertEqual(pairs, list(similarity_pairs(
+                    300, 900, seed=3, model=model)))
+
+    def test_similarity_pairs_skip_excluded(self):
+        exclude = {(0, 1), (1, 2)}
+        for model in SIMILARITY_MODELS:
+            with self.subTest(model=model):
+                pairs = set(similarity_pairs(4, 10, seed=1, model=model,
+                                             exclude=exclude))
+                self.assertFalse(pairs & exclude)
+                self.assertLessEqual(len(pairs), 4)
+
+    def test_barabasi_albert_has_hubs(self):
+        pairs = similarity_pairs(2000, 4000, seed=1, model='barabasi-albert')
+        degrees = Counter(node for pair in pairs for node in pair)
+        self.assertGreater(max(degrees.values()), 50)
+
+    def test_chain_is_a_path(self):
+        pairs = list(similarity_pairs(100, 99, seed=1, model='chain'))
+        degrees = Counter(node for pair in pairs for node in pair)
+        self.assertEqual(sorted(Counter(degrees.values()).items()),
+                         [(1, 2), (2, 98)])
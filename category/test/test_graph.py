@@ -0,0 +1,220 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from .. import views
+from ..generators import similarity_pairs
+from ..graph import (bfs_all_paths, build_adjacency, neighborhood_of,
+                     neighbors_of, shortest_path)
+from ..models import Category, Similarity
+
+
+def dict_neighbors(adjacency):
+    def neighbors(nodes, max_edges=None):
+        edges = sorted({(min(node, neighbor), max(node, neighbor))
+                        for node in nodes
+                        for neighbor in adjacency.get(node, ())})
+        loaded = build_adjacency(edges[:max_edges])
+        return {node: loaded.get(node, set()) for node in nodes}
+    return neighbors
+
+
+class ShortestPathTests(SimpleTestCase):
+    def assertValidPath(self, adjacency, path, source, target):
+        self.assertEqual((path[0], path[-1]), (source, target))
+        for a, b in zip(path, path[1:]):
+            self.assertIn(b, adjacency[a])
+
+    def test_matches_bfs(self):
+        for model in ['erdos-renyi', 'barabasi-albert', 'chain',
+                      'clustered']:
+            adjacency = build_adjacency(
+                similarity_pairs(60, 80, seed=3, model=model))
+            neighbors = dict_neighbors(adjacency)
+            for source in range(0, 60, 7):
+                distances, _ = bfs_all_paths(adjacency, source)
+                for target in range(60):
+                    path = shortest_path(source, target, neighbors, 60)
+                    if target not in distances:
+                        self.assertIsNone(path)
+                        continue
+                    self.assertEqual(len(path) - 1, distances[target],
+                                     (model, source, target))
+                    self.assertValidPath(adjacency, path, source, target)
+
+    def test_max_hops(self):
+        adjacency = build_adjacency([(1, 2), (2, 3), (3, 4)])
+        neighbors = dict_neighbors(adjacency)
+        self.assertIsNone(shortest_path(1, 4, neighbors, 2))
+        self.assertEqual(shortest_path(1, 4, neighbors, 3), [1, 2, 3, 4])
+
+    def test_stops_when_an_island_is_exhausted(self):
+        # 1 - 2 is a small island, the rest is one long chain.
+        adjacency = build_adjacency(
+            [(1, 2)] + [(i, i + 1) for i in range(10, 1000)])
+        expanded = []
+
+        def neighbors(nodes):
+            expanded.append(list(nodes))
+            return dict_neighbors(adjacency)(nodes)
+
+        self.assertIsNone(shortest_path(1, 500, neighbors, 100))
+        self.assertLessEqual(len(expanded), 3)
+
+
+class NeighborhoodTests(SimpleTestCase):
+    def test_distances_and_paths(self):
+        # 1 reaches 4 through 2 and 3, and 5 only through 4.
+        adjacency = build_adjacency([(1, 2), (1, 3), (2, 4), (3, 4), (4, 5),
+                                     (2, 3)])
+        distances, paths, truncated = neighborhood_of(
+            1, dict_neighbors(adjacency), 3, 100)
+        self.assertEqual(distances, {2: 1, 3: 1, 4: 2, 5: 3})
+        self.assertEqual(paths, {2: 1, 3: 1, 4: 2, 5: 2})
+        self.assertFalse(truncated)
+
+    def test_matches_bfs(self):
+        adjacency = build_adjacency(
+            similarity_pairs(80, 200, seed=5, model='barabasi-albert'))
+        bfs_distances, _ = bfs_all_paths(adjacency, 0)
+        distances, _, _ = neighborhood_of(0, dict_neighbors(adjacency), 3,
+                                          1000)
+        self.assertEqual(distances, {
+            node: distance for node, distance in bfs_distances.items()
+            if 0 < distance <= 3})
+
+    def test_visited_cap(self):
+        # A hub with 100 neighbours.
+        adjacency = build_adjacency([(0, i) for i in range(1, 101)])
+        distances, _, truncated = neighborhood_of(
+            0, dict_neighbors(adjacency), 2, 10)
+        self.assertEqual(len(distances), 9)
+        self.assertTrue(truncated)
+
+    def test_stops_at_the_cap(self):
+        # The hub fills the cap, its neighbours are not expanded.
+        adjacency = build_adjacency([(0, i) for i in range(1, 11)] +
+                                    [(i, i + 10) for i in range(1, 11)])
+        expanded = []
+
+        def neighbors(nodes, max_edges=None):
+            expanded.append(list(nodes))
+            return dict_neighbors(adjacency)(nodes, max_edges)
+
+        distances, _, truncated = neighborhood_of(0, neighbors, 3, 5)
+        self.assertEqual(len(distances), 4)
+        self.assertTrue(truncated)
+        self.assertEqual(expanded, [[0]])
+
+    def test_edge_cap(self):
+        adjacency = build_adjacency([(0, i) for i in range(1, 101)])
+        distances, _, truncated = neighborhood_of(
+            0, dict_neighbors(adjacency), 2, 1000, max_edges=20)
+        self.assertEqual(len(distances), 20)
+        self.assertTrue(truncated)
+
+
+class PathToApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.categories = [Category.objects.create(name=f'Category {i}')
+                          for i in range(8)]
+        ids = [category.id for category in cls.categories]
+        # 0 - 1 - 2 - 3 - 4 plus a shortcut 0 - 5 - 4, 6 - 7 is an island.
+        for a, b in [(0, 1), (1, 2), (2, 3), (3, 4), (0, 5), (5, 4),
+                     (6, 7)]:
+            Similarity.objects.create(category_a_id=ids[a],
+                                      category_b_id=ids[b])
+
+    def url(self, a, b, query=''):
+        return reverse('category-path-to', args=[
+            self.categories[a].id, self.categories[b].id]) + query
+
+    def test_shortest_path(self):
+        response = self.client.get(self.url(0, 4))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['hops'], 2)
+        self.assertEqual([category['name'] for category in data['path']],
+                         ['Category 0', 'Category 5', 'Category 4'])
+
+    def test_same_category(self):
+        data = self.client.get(self.url(2, 2)).json()
+        self.assertEqual(data['hops'], 0)
+        self.assertEqual(len(data['path']), 1)
+
+    def test_no_path(self):
+        response = self.client.get(self.url(0, 7))
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(self.url(1, 3, '?max_hops=1'))
+        self.assertEqual(response.status_code, 404)
+
+    def test_invalid_parameters(self):
+        self.assertEqual(
+            self.client.get(self.url(0, 4, '?max_hops=x')).status_code, 400)
+        self.assertEqual(
+            self.client.get(self.url(0, 4, '?max_hops=99')).status_code, 400)
+        response = self.client.get(reverse(
+            'category-path-to', args=[self.categories[0].id, 99999]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_queries_per_hop(self):
+        # The two categories, one query per expanded level and the path.
+        with self.assertNumQueries(2 + 2 + 1):
+            self.client.get(self.url(0, 4))
+
+
+class NeighborhoodApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.categories = [Category.objects.create(name=f'Category {i}')
+                          for i in range(6)]
+        ids = [category.id for category in cls.categories]
+        # 1 and 2 are direct, 3 is reached over both, 4 over one of them
+        # and 5 is three hops away.
+        for a, b in [(0, 1), (0, 2), (1, 3), (2, 3), (2, 4), (4, 5)]:
+            Similarity.objects.create(category_a_id=ids[a],
+                                      category_b_id=ids[b])
+
+    def get(self, query=''):
+        return self.client.get(reverse(
+            'category-neighborhood', args=[self.categories[0].id]) + query)
+
+    def test_ranked_by_hops_and_paths(self):
+        data = self.get().json()
+        self.assertEqual(data['count'], 4)
+        self.assertFalse(data['truncated'])
+        self.assertEqual(
+            [(category['name'], category['hops'], category['paths'])
+             for category in data['results']],
+            [('Category 1', 1, 1), ('Category 2', 1, 1),
+             ('Category 3', 2, 2), ('Category 4', 2, 1)])
+
+    def test_hops_and_limit(self):
+        data = self.get('?hops=3&limit=5').json()
+        self.assertEqual(data['results'][-1]['name'], 'Category 5')
+        data = self.get('?hops=1&limit=1').json()
+        self.assertEqual(data['count'], 2)
+        self.assertEqual(len(data['results']), 1)
+
+    def test_invalid_parameters(self):
+        for query in ['?hops=0', '?hops=9', '?limit=0', '?limit=x']:
+            self.assertEqual(self.get(query).status_code, 400, query)
+
+    def test_queries_per_hop(self):
+        # The category, one query per hop and the results.
+        with self.assertNumQueries(1 + 3 + 1):
+            self.get('?hops=3')
+
+    def test_edges_per_hop(self):
+        ids = [category.id for category in self.categories]
+        with self.assertNumQueries(1):
+            adjacency = neighbors_of(ids[:3], max_edges=2)
+        self.assertEqual(len({frozenset([node, neighbor])
+                              for node, nodes in adjacency.items()
+                              for neighbor in nodes}), 2)
+        with mock.patch.object(views, 'NEIGHBORHOOD_MAX_EDGES', 2):
+            data = self.get().json()
+        self.assertEqual(data['count'], 2)
+        self.assertTrue(data['truncated'])
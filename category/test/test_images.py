@@ -0,0 +1,98 @@
+import os
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from ..images import pipeline
+from ..models import Category, Change
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def uploaded_image():
+    image_path = os.path.join(settings.BASE_DIR, 'CategoryTree',
+                              'test_files', 'test_image.png')
+    with open(image_path, 'rb') as image_file:
+        return SimpleUploadedFile('test.png', image_file.read(),
+                                  content_type='image/png')
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT,
+                   IMAGE_PIPELINE={'WORKERS': 0, 'FORMAT': 'WEBP',
+                                   'VARIANTS': {'thumbnail': (64, 64)}})
+class ImagePipelineTests(TestCase):
+    def tearDown(self):
+        pipeline.drain()
+
+    def upload(self, name='Icon'):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('category-list'), {
+                'name': name,
+                'image': uploaded_image(),
+            })
+        self.assertIn(response.status_code, (200, 201))
+        return response
+
+    def test_upload_does_not_wait_for_variants(self):
+        response = self.upload()
+        self.assertEqual(response.json()['image_variants'], {})
+        self.assertEqual(pipeline.queue.qsize(), 1)
+
+    def test_variants_are_created_and_exposed(self):
+        response = self.upload()
+        pipeline.drain()
+
+        category = Category.objects.get(pk=response.json()['id'])
+        name = category.image_variants['thumbnail']
+        self.assertTrue(name.endswith('.webp'))
+        with default_storage.open(name) as variant:
+            image = Image.open(variant)
+            self.assertEqual(image.format, 'WEBP')
+            self.assertLessEqual(max(image.size), 64)
+
+        for url in [reverse('category-detail', args=[category.id]),
+                    reverse('async-category-detail', args=[category.id])]:
+            data = self.client.get(url).json()
+            self.assertTrue(data['image_variants']['thumbnail'].startswith(
+                'http://testserver/media/'))
+
+    def test_variants_are_logged(self):
+        category_id = self.upload().json()['id']
+        pipeline.drain()
+        change = Change.objects.latest('seq')
+        self.assertEqual((change.model, change.object_id, change.action),
+                         ('category', category_id, Change.UPDATE))
+        self.assertEqual(change.data, {'image_variants': Category.objects.get(
+            pk=category_id).image_variants})
+
+    def test_replaced_image_discards_stale_variants(self):
+        self.upload()
+        small = BytesIO()
+        Image.new('RGB', (10, 20), 'red').save(small, 'PNG')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('category-list'), {
+                'name': 'Icon',
+                'image': SimpleUploadedFile('small.png', small.getvalue(),
+                                            content_type='image/png'),
+            })
+        pipeline.drain()
+
+        category = Category.objects.get(pk=response.json()['id'])
+        with default_storage.open(
+                category.image_variants['thumbnail']) as variant:
+            self.assertEqual(Image.open(variant).size, (10, 20))
+
+    def test_update_without_image_keeps_variants(self):
+        response = self.upload()
+        pipeline.drain()
+        url = reverse('category-detail', args=[response.json()['id']])
+        response = self.client.patch(url, {'description': 'New'},
+                                     content_type='application/json')
+        self.assertIn('thumbnail', response.json()['image_variants'])
+        self.assertEqual(pipeline.queue.qsize(), 0)
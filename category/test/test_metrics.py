@@ -0,0 +1,49 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..metrics import registry
+from ..models import Category
+
+
+@override_settings(REQUEST_METRICS_ENABLED=True)
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        registry.reset()
+        root = Category.objects.create(name='A')
+        Category.objects.create(name='Child', parent=root)
+
+    def test_server_timing_header(self):
+        response = self.client.get(reverse('category-as-tree'))
+        self.assertEqual(response.status_code, 200)
+        timing = response['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertIn('serializer;dur=', timing)
+        self.assertIn('total;dur=', timing)
+
+    def test_requests_are_aggregated_per_view(self):
+        url = reverse('category-list')
+        self.client.get(url)
+        response = self.client.get(url)
+        series = registry.get('category-list', 'GET')
+        self.assertEqual(series['requests_total'], 2)
+        self.assertGreater(series['queries_total'], 0)
+        self.assertGreater(series['serializer_seconds_total'], 0)
+        self.assertEqual(series['response_bytes_total'],
+                         2 * len(response.content))
+
+    def test_metrics_endpoint_prometheus_format(self):
+        self.client.get(reverse('category-list'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertContains(response, '# TYPE category_requests_total '
+                                      'counter')
+        self.assertContains(
+            response,
+            'category_requests_total{view="category-list",method="GET"} 1')
+
+    @override_settings(REQUEST_METRICS_ENABLED=False)
+    def test_disabled_by_default(self):
+        response = self.client.get(reverse('category-list'))
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(registry.get('category-list', 'GET'), {})
@@ -0,0 +1,100 @@
+import json
+
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Category
+
+
+class MultiGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.root = Category.objects.create(name='Root')
+        cls.child = Category.objects.create(name='Child', parent=cls.root)
+        cls.leaf = Category.objects.create(name='Leaf', parent=cls.child)
+        cls.other = Category.objects.create(name='Other', parent=cls.root)
+
+    def get(self, ids, include=None):
+        params = {'ids': ','.join(str(i) for i in ids)}
+        if include:
+            params['include'] = include
+        return self.client.get(reverse('category-by-ids'), params)
+
+    def test_in_requested_order(self):
+        response = self.get([self.leaf.id, self.root.id, 9999,
+                             self.leaf.id, self.child.id])
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([category['id'] for category in data['results']],
+                         [self.leaf.id, self.root.id, self.child.id])
+        self.assertEqual(data['results'][0]['parent'], self.child.id)
+        self.assertEqual(data['missing'], [9999])
+
+    def test_include(self):
+        data = self.get([self.leaf.id, self.child.id, self.root.id],
+                        'parent,children_count').json()['results']
+        leaf, child, root = data
+        self.assertEqual(leaf['parent']['name'], 'Child')
+        # Nested parents keep the id of their own parent.
+        self.assertEqual(leaf['parent']['parent'], self.root.id)
+        self.assertEqual(child['parent']['name'], 'Root')
+        self.assertIsNone(root['parent'])
+        self.assertEqual([category['children_count'] for category in data],
+                         [0, 1, 2])
+
+    def test_post(self):
+        response = self.client.post(
+            reverse('category-by-ids'),
+            {'ids': [self.other.id, self.root.id],
+             'include': ['children_count']},
+            content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(category['name'], category['children_count'])
+             for category in response.json()['results']],
+            [('Other', 0), ('Root', 2)])
+
+    def test_invalid(self):
+        for ids, include in [('1,x', None), ('0', None),
+                             ('1', 'parent,siblings')]:
+            with self.subTest(ids=ids, include=include):
+                params = {'ids': ids}
+                if include:
+                    params['include'] = include
+                response = self.client.get(reverse('category-by-ids'),
+                                           params)
+                self.assertEqual(response.status_code, 400)
+        response = self.client.post(
+            reverse('category-by-ids'), {'ids': list(range(1, 1002))},
+            content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_no_ids(self):
+        self.assertEqual(self.get([]).json(), {'results': [], 'missing': []})
+
+    def test_list_ignores_ids(self):
+        data = self.client.get(reverse('category-list'),
+                               {'ids': self.root.id}).json()
+        self.assertEqual(data['count'], 4)
+
+    def test_schema(self):
+        with self.settings(DEBUG=True):
+            schema = json.loads(self.client.get(
+                reverse('schema'), {'format': 'json'}).content)
+        get = schema['paths']['/api/categories/by-ids/']['get']
+        self.assertEqual(
+            {parameter['name']: parameter.get('required', False)
+             for parameter in get['parameters']},
+            {'ids': True, 'include': False})
+        result = schema['components']['schemas']['CategoryIdsResult']
+        self.assertEqual(result['properties']['results']['items']['$ref'],
+                         '#/components/schemas/CategoryById')
+        category = schema['components']['schemas']['CategoryById']
+        self.assertEqual(
+            category['properties']['parent']['oneOf'][1]['$ref'],
+            '#/components/schemas/CategoryList')
+        self.assertIn('children_count', category['properties'])
+        self.assertNotIn('children_count', category['required'])
+        self.assertNotIn('ids', [
+            parameter['name'] for parameter in
+            schema['paths']['/api/categories/']['get']['parameters']])
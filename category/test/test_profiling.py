@@ -0,0 +1,71 @@
+import os
+import pstats
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import Category, Similarity
+
+
+def run(command, *args, **options):
+    stdout, stderr = StringIO(), StringIO()
+    call_command(command, *args, stdout=stdout, stderr=stderr, **options)
+    return stdout.getvalue(), stderr.getvalue()
+
+
+class ProfilingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        categories = [Category.objects.create(name=f'Category {i}')
+                      for i in range(4)]
+        for a, b in zip(categories, categories[1:]):
+            Similarity.objects.create(category_a=a, category_b=b)
+
+    def test_quiet_by_default(self):
+        stdout, stderr = run('analyze_similarity')
+        self.assertIn('Longest rabbit hole', stdout)
+        self.assertEqual(stderr, '')
+
+    def test_phase_timings(self):
+        stdout, stderr = run('analyze_similarity', verbosity=2)
+        lines = stderr.splitlines()
+        self.assertEqual(lines[0], 'Phases:')
+        self.assertEqual([line.split()[0] for line in lines[1:]],
+                         ['load', 'components', 'diameter', 'total'])
+        self.assertNotIn('queries', stderr)
+        self.assertNotIn('Phases', stdout)
+
+    def test_sql_log(self):
+        _, stderr = run('analyze_similarity', sql_log=True)
+        queries = {line.split()[0]: int(line.split()[2])
+                   for line in stderr.splitlines()[1:]}
+        self.assertGreater(queries['load'], 0)
+        self.assertEqual(queries['components'], 0)
+        self.assertEqual(queries['total'], sum(
+            count for phase, count in queries.items() if phase != 'total'))
+
+    def test_trace_memory(self):
+        _, stderr = run('generate_categories', 50, no_images=True,
+                        trace_memory=True)
+        self.assertIn('MB peak', stderr)
+        self.assertIn('Top allocation sites still held:', stderr)
+        self.assertEqual(Category.objects.count(), 54)
+
+    def test_profile_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'analyze.prof')
+            _, stderr = run('analyze_similarity', profile=path)
+            self.assertIn(f'Profile written to {path}', stderr)
+            stats = pstats.Stats(path)
+            self.assertTrue(any(name == 'collect_islands'
+                                for _, _, name in stats.stats))
+
+            path = os.path.join(directory, 'callgrind.out.analyze')
+            run('analyze_similarity', profile=path)
+            with open(path) as profile:
+                callgrind = profile.read()
+            self.assertTrue(callgrind.startswith('# callgrind format\n'))
+            self.assertIn('\nfn=collect_islands:', callgrind)
+            self.assertIn('\ncfn=collect_islands:', callgrind)
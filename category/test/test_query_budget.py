@@ -0,0 +1,115 @@
+from django.db import transaction
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Category
+from .query_budget import query_budget, seed_similarities, seed_tree
+
+# (size, depth) of the seeded trees, every endpoint must issue the same
+# number of queries on all of them.
+TREE_SHAPES = [(10, 2), (60, 4), (240, 12)]
+
+
+class QueryBudgetTests(TestCase):
+    def assertConstantQueries(self, budget, request, seed=None):
+        counts = []
+        for size, depth in TREE_SHAPES:
+            with self.subTest(size=size, depth=depth), transaction.atomic():
+                levels = seed_tree(size, depth)
+                if seed is not None:
+                    seed(levels, size)
+                with query_budget(budget) as queries:
+                    response = request(levels, size)
+                self.assertLess(response.status_code, 300)
+                counts.append(len(queries))
+                transaction.set_rollback(True)
+        self.assertEqual(len(set(counts)), 1,
+                         f'Query count grows with the tree: {counts}')
+
+    def test_list(self):
+        self.assertConstantQueries(2, lambda levels, size: self.client.get(
+            reverse('category-list')))
+
+    # The tree endpoints also read the last change, see single_flight().
+    def test_tree(self):
+        self.assertConstantQueries(4, lambda levels, size: self.client.get(
+            reverse('category-as-tree')))
+
+    def test_tree_by_depth(self):
+        self.assertConstantQueries(4, lambda levels, size: self.client.get(
+            reverse('category-tree-by-depth', args=[1])))
+
+    def test_tree_by_category(self):
+        self.assertConstantQueries(3, lambda levels, size: self.client.get(
+            reverse('category-tree-by-parent', args=[levels[0][0].id])))
+
+    def test_by_depth(self):
+        self.assertConstantQueries(2, lambda levels, size: self.client.get(
+            reverse('category-by-depth', args=[len(levels) - 1])))
+
+    def test_by_parent(self):
+        self.assertConstantQueries(2, lambda levels, size: self.client.get(
+            reverse('category-by-parent', args=[levels[0][0].id])))
+
+    def test_similar(self):
+        self.assertConstantQueries(
+            3,
+            lambda levels, size: self.client.get(
+                reverse('category-similar', args=[levels[0][0].id])),
+            seed=lambda levels, size: seed_similarities(levels[0][0], size))
+
+    def test_multi_get(self):
+        # Every category of the second level with its parent and children
+        # count: the categories, their parents and the counts.
+        def request(levels, size):
+            ids = [category.id for category in levels[1]]
+            response = self.client.get(reverse('category-by-ids'), {
+                'ids': ','.join(str(category_id) for category_id in ids),
+                'include': 'parent,children_count'})
+            self.assertEqual(
+                [category['id'] for category in response.json()['results']],
+                ids)
+            return response
+
+        self.assertConstantQueries(3, request)
+
+    def test_destroy(self):
+        def request(levels, size):
+            root = levels[0][0]
+            response = self.client.delete(
+                reverse('category-detail', args=[root.id]))
+            self.assertFalse(Category.objects.filter(id=root.id).exists())
+            return response
+
+        # Includes marking its island stale, deleting its analytics and
+        # logging the changes of its children and similarities.
+        self.assertConstantQueries(13, request)
+
+    def test_move(self):
+        # The subtree below the second level moves along at no extra cost.
+        self.assertConstantQueries(7, lambda levels, size: self.client.post(
+            reverse('category-move', args=[levels[1][0].id]),
+            {'parent': levels[0][-1].id}, content_type='application/json'))
+
+    def test_replace_similar(self):
+        neighbours = []
+
+        def seed(levels, size):
+            neighbours[:] = seed_similarities(levels[0][0], size)
+
+        # A hub keeps most of its neighbours, five are swapped for others.
+        def request(levels, size):
+            similar = neighbours[5:] + levels[1][:5]
+            return self.client.put(
+                reverse('category-similar', args=[levels[0][0].id]),
+                {'similar': [category.id for category in similar]},
+                content_type='application/json')
+
+        self.assertConstantQueries(9, request, seed=seed)
+
+    def test_budget_reports_queries(self):
+        with self.assertRaisesMessage(AssertionError,
+                                      '2 queries executed, the budget is 1'):
+            with query_budget(1):
+                list(Category.objects.all())
+                list(Category.objects.all())
@@ -0,0 +1,64 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TransactionTestCase, override_settings
+
+from ..models import Category, Similarity
+
+
+def reset_db(**options):
+    call_command('reset_db', stdout=StringIO(), stderr=StringIO(), **options)
+
+
+# The SQLite backup API can't write into a connection that is inside a
+# transaction, so these can't run in the usual TestCase transaction.
+@override_settings(IMAGE_PIPELINE={'WORKERS': 0})
+class ResetDbTests(TransactionTestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.snapshot_dir = tempfile.mkdtemp()
+        settings = override_settings(MEDIA_ROOT=self.media_root,
+                                     RESET_DB_SNAPSHOT_DIR=self.snapshot_dir)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_reset_clears_media_folder(self):
+        os.makedirs(os.path.join(self.media_root, 'category_images'))
+        with open(os.path.join(self.media_root, 'stale.png'), 'wb') as stale:
+            stale.write(b'png')
+
+        reset_db()
+        self.assertEqual(os.listdir(self.media_root), [])
+
+    def test_restore_snapshot(self):
+        reset_db(categories=20, similarities=10, seed=1, snapshot='small')
+        Category.objects.create(name='Added later')
+        Category.objects.first().image.save('later.png', ContentFile(b'png'))
+
+        reset_db(restore='small')
+        self.assertEqual(Category.objects.count(), 20)
+        self.assertEqual(Similarity.objects.count(), 10)
+        self.assertFalse(Category.objects.filter(name='Added later').exists())
+        for category in Category.objects.exclude(image=''):
+            self.assertTrue(category.image.storage.exists(category.image.name))
+        self.assertEqual(
+            len(os.listdir(os.path.join(self.media_root, 'category_images'))),
+            len(os.listdir(os.path.join(self.snapshot_dir, 'small', 'media',
+                                        'category_images'))))
+
+    def test_generated_categories_share_one_image(self):
+        reset_db(categories=20)
+        self.assertEqual(
+            Category.objects.values('image').distinct().count(), 1)
+        self.assertEqual(len(os.listdir(
+            os.path.join(self.media_root, 'category_images'))), 1)
+
+    def test_restore_unknown_snapshot(self):
+        with self.assertRaisesMessage(CommandError, 'no snapshot'):
+            reset_db(restore='missing')
+        with self.assertRaisesMessage(CommandError, 'Invalid snapshot'):
+            reset_db(restore='../missing')
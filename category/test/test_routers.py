@@ -0,0 +1,81 @@
+import sqlite3
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connections
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+
+from ..models import Category, Similarity
+from ..routers import STICKY_COOKIE
+
+
+@override_settings(DATABASE_REPLICAS=['replica'],
+                   IMAGE_PIPELINE={'WORKERS': 0})
+class ReplicaRouterTests(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Replicated')
+        self.replicate()
+        Category.objects.create(name='Only on primary')
+
+    # The 'replica' alias of the test settings is a copy of the test
+    # database made here, anything written after that is only on the
+    # primary, like on a lagging replica. Both are in memory, the copy is
+    # made into the database the replica connection keeps open.
+    @staticmethod
+    def replicate():
+        primary = connections['default']
+        primary.ensure_connection()
+        connections['replica'].ensure_connection()
+        target = sqlite3.connect(connections['replica'].settings_dict['NAME'],
+                                 uri=True)
+        try:
+            primary.connection.backup(target)
+        finally:
+            target.close()
+
+    def names(self, response):
+        return [category['name'] for category in response.json()['results']]
+
+    def test_reads_go_to_the_replica(self):
+        response = self.client.get(reverse('category-list'))
+        self.assertEqual(self.names(response), ['Replicated'])
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+    def test_client_reads_its_own_writes(self):
+        response = self.client.post(reverse('category-list'),
+                                    {'name': 'Written'})
+        self.assertEqual(response.status_code, 201)
+        self.assertIn(STICKY_COOKIE, response.cookies)
+
+        names = self.names(self.client.get(reverse('category-list')))
+        self.assertIn('Written', names)
+        self.assertIn('Only on primary', names)
+
+        # Other clients keep reading from the replica.
+        other = self.client_class()
+        self.assertEqual(self.names(other.get(reverse('category-list'))),
+                         ['Replicated'])
+
+    def test_writes_go_to_the_primary(self):
+        url = reverse('category-detail', args=[self.category.id])
+        self.client.patch(url, {'description': 'Changed'},
+                          content_type='application/json')
+        self.assertEqual(Category.objects.get(pk=self.category.pk)
+                         .description, 'Changed')
+        self.assertEqual(Category.objects.using('replica').get(
+            pk=self.category.pk).description, '')
+
+    def test_analyze_similarity_reads_from_the_replica(self):
+        other = Category.objects.create(name='Other')
+        Similarity.objects.create(category_a=self.category, category_b=other)
+        output = StringIO()
+        call_command('analyze_similarity', stdout=output)
+        self.assertNotIn('Other', output.getvalue())
+
+        self.replicate()
+        output = StringIO()
+        call_command('analyze_similarity', stdout=output)
+        self.assertIn('Replicated -> Other', output.getvalue())
@@ -0,0 +1,89 @@
+import gzip
+import json
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+
+class PrecomputedSchemaTests(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings = override_settings(OPENAPI_SCHEMA_DIR=directory)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def build(self):
+        call_command('build_schema', stdout=StringIO())
+
+    def test_serves_the_built_schema(self):
+        self.build()
+        with self.settings(DEBUG=True):
+            live = json.loads(self.client.get(
+                reverse('schema'), {'format': 'json'}).content)
+        response = self.client.get(reverse('schema'), {'format': 'json'})
+        self.assertEqual(response['Content-Type'],
+                         'application/vnd.oai.openapi+json')
+        self.assertIn('ETag', response)
+        schema = json.loads(response.content)
+        self.assertEqual(schema['paths'].keys(), live['paths'].keys())
+        self.assertIn('/api/categories/{id}/move/', schema['paths'])
+
+        response = self.client.get(reverse('schema'))
+        self.assertEqual(response['Content-Type'],
+                         'application/vnd.oai.openapi')
+        self.assertTrue(response.content.startswith(b'openapi:'))
+
+    def test_not_modified(self):
+        self.build()
+        etag = self.client.get(reverse('schema'))['ETag']
+        response = self.client.get(reverse('schema'),
+                                   headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_gzip(self):
+        self.build()
+        plain = self.client.get(reverse('schema'))
+        response = self.client.get(reverse('schema'),
+                                   headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(response['ETag'],
+                         plain['ETag'][:-1] + '-gzip"')
+        # A cached plain body doesn't validate the gzipped one.
+        response = self.client.get(reverse('schema'), headers={
+            'Accept-Encoding': 'gzip', 'If-None-Match': plain['ETag']})
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(reverse('schema'), headers={
+            'Accept-Encoding': 'gzip',
+            'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    def test_live_without_a_built_schema(self):
+        with self.assertLogs('category.schema', 'WARNING'):
+            response = self.client.get(reverse('schema'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+
+    @override_settings(DEBUG=True)
+    def test_live_in_debug(self):
+        self.build()
+        response = self.client.get(reverse('schema'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+
+    @override_settings(DEBUG=True)
+    def test_image_variants_are_urls_by_name(self):
+        schema = json.loads(self.client.get(
+            reverse('schema'), {'format': 'json'}).content)
+        variants = (schema['components']['schemas']['CategoryList']
+                    ['properties']['image_variants'])
+        self.assertEqual(variants['type'], 'object')
+        self.assertEqual(variants['additionalProperties'],
+                         {'type': 'string', 'format': 'uri'})
@@ -0,0 +1,81 @@
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Category
+from ..search import SqliteSearch
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Category.objects.bulk_create([
+            Category(name='Electronics', description='Phones and laptops'),
+            Category(name='Electric guitars', description='Loud'),
+            Category(name='Books', description='Paper, some electronic'),
+            Category(name='Garden', description='Plants and tools'),
+            Category(name='Audio 100% quality', description=''),
+        ])
+
+    def search(self, query):
+        response = self.client.get(reverse('category-search'), {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [category['name'] for category in response.json()['results']]
+
+    def test_names_starting_with_the_query_first(self):
+        self.assertEqual(self.search('electr'),
+                         ['Electric guitars', 'Electronics', 'Books'])
+
+    def test_substring_in_description(self):
+        self.assertEqual(self.search('laptop'), ['Electronics'])
+
+    def test_all_words_must_match(self):
+        self.assertEqual(self.search('electronic paper'), ['Books'])
+
+    def test_typo(self):
+        self.assertEqual(self.search('Gardne')[0], 'Garden')
+        self.assertEqual(self.search('elektronics')[0], 'Electronics')
+
+    def test_short_query(self):
+        self.assertEqual(self.search('Bo'), ['Books'])
+        self.assertEqual(self.search('e'), ['Electronics',
+                                            'Electric guitars'])
+
+    def test_short_query_uses_the_name_index(self):
+        search = SqliteSearch('Bo', connection.alias)
+        where, params = search.where()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN SELECT rowid FROM '
+                           f'{search.table} WHERE {where}', params)
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('category_name_nocase', plan)
+
+    def test_like_wildcards_are_literal(self):
+        self.assertEqual(self.search('100%'), ['Audio 100% quality'])
+        self.assertEqual(self.search('%'), [])
+        self.assertEqual(self.search('"'), [])
+
+    def test_index_follows_writes(self):
+        category = Category.objects.get(name='Garden')
+        category.name = 'Orchard'
+        category.save()
+        Category.objects.filter(name='Books').update(description='Novels')
+        Category.objects.get(name='Electronics').delete()
+
+        self.assertEqual(self.search('orchard'), ['Orchard'])
+        self.assertEqual(self.search('novel'), ['Books'])
+        self.assertEqual(self.search('laptops'), [])
+
+    def test_paginated(self):
+        Category.objects.bulk_create([
+            Category(name=f'Electric {i}') for i in range(25)])
+        response = self.client.get(reverse('category-search'),
+                                   {'q': 'electric', 'page': 2})
+        data = response.json()
+        self.assertEqual(data['count'], 26)
+        self.assertEqual(len(data['results']), 6)
+
+    def test_query_is_required(self):
+        for query in [{}, {'q': ' '}, {'q': 'x' * 101}]:
+            response = self.client.get(reverse('category-search'), query)
+            self.assertEqual(response.status_code, 400)
@@ -0,0 +1,119 @@
+import threading
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from .. import views
+from ..models import Category
+from ..singleflight import SingleFlight
+
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'flights': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'flights'},
+}
+
+
+class SingleFlightTests(SimpleTestCase):
+    def setUp(self):
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def compute(self, result='tree'):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    # Every caller runs do() with the same key, the first one while the
+    # others join it, and returns what it got.
+    def run_together(self, callers, result='tree'):
+        outcomes = [None] * len(callers)
+
+        def call(i, flight):
+            try:
+                outcomes[i] = flight.do('key', lambda: self.compute(result))
+            except Exception as error:
+                outcomes[i] = error
+
+        threads = [threading.Thread(target=call, args=[i, flight])
+                   for i, flight in enumerate(callers)]
+        threads[0].start()
+        self.started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        # Give the others time to join the flight before it lands.
+        time.sleep(0.2)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        return outcomes
+
+    def test_concurrent_calls_compute_once(self):
+        flight = SingleFlight()
+        self.assertEqual(self.run_together([flight] * 6), ['tree'] * 6)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(flight.flights, {})
+
+    def test_error_is_shared(self):
+        error = ValueError('broken')
+        flight = SingleFlight()
+        outcomes = self.run_together([flight] * 3, error)
+        self.assertIs(outcomes[0], error)
+        for outcome in outcomes[1:]:
+            self.assertIsNot(outcome, error)
+            self.assertIsInstance(outcome, ValueError)
+            self.assertEqual(outcome.args, error.args)
+            self.assertIs(outcome.__cause__, error)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(flight.flights, {})
+
+    @override_settings(SINGLE_FLIGHT={'TIMEOUT': 0.1})
+    def test_waits_until_the_timeout(self):
+        flight = SingleFlight()
+        leader = threading.Thread(target=flight.do,
+                                  args=['key', self.compute])
+        leader.start()
+        self.started.wait(5)
+        self.assertEqual(flight.do('key', lambda: 'own'), 'own')
+        self.release.set()
+        leader.join()
+        self.assertEqual(self.calls, 1)
+
+    def test_nothing_is_kept(self):
+        flight = SingleFlight()
+        self.release.set()
+        flight.do('key', self.compute)
+        flight.do('key', self.compute)
+        self.assertEqual(self.calls, 2)
+
+    @override_settings(CACHES=CACHES, SINGLE_FLIGHT={
+        'CACHE': 'flights', 'POLL_INTERVAL': 0.01})
+    def test_across_workers(self):
+        workers = [SingleFlight() for _ in range(3)]
+        self.assertEqual(self.run_together(workers), ['tree'] * 3)
+        self.assertEqual(self.calls, 1)
+
+
+class CoalescedViewTests(TestCase):
+    def test_tree_key_follows_the_change_log(self):
+        Category.objects.create(name='Root')
+        url = reverse('category-as-tree')
+        with mock.patch.object(views.flights, 'do',
+                               wraps=views.flights.do) as do:
+            first = self.client.get(url).json()
+            self.client.get(url)
+            Category.objects.create(name='Other')
+            second = self.client.get(url).json()
+            self.client.get(url, {'stream': '1'})
+        keys = [call.args[0] for call in do.call_args_list]
+        self.assertEqual(len(keys), 3)
+        self.assertEqual(keys[0], keys[1])
+        self.assertNotEqual(keys[1], keys[2])
+        self.assertEqual(first['count'], 1)
+        self.assertEqual(second['count'], 2)
@@ -0,0 +1,36 @@
+import os
+import sqlite3
+import tempfile
+
+from django.db import connection
+from django.test import SimpleTestCase, override_settings
+
+from ..sqlite import PROFILES, apply_pragmas, get_pragmas
+
+
+class SqliteProfileTests(SimpleTestCase):
+    databases = {'default'}
+
+    def test_connections_use_the_profile(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA cache_size')
+            self.assertEqual(cursor.fetchone()[0],
+                             PROFILES['performance']['cache_size'])
+            cursor.execute('PRAGMA synchronous')
+            # 1 is NORMAL
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    @override_settings(SQLITE_PROFILE='performance',
+                       SQLITE_PRAGMAS={'cache_size': -1024})
+    def test_pragmas_override_the_profile(self):
+        pragmas = get_pragmas()
+        self.assertEqual(pragmas['cache_size'], -1024)
+        self.assertEqual(pragmas['journal_mode'], 'wal')
+
+    def test_performance_profile_enables_wal(self):
+        with tempfile.TemporaryDirectory() as directory:
+            database = sqlite3.connect(os.path.join(directory, 'db.sqlite3'))
+            apply_pragmas(database, PROFILES['performance'])
+            self.assertEqual(
+                database.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+            database.close()
@@ -0,0 +1,112 @@
+import os
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.urls import reverse
+from PIL import Image
+
+from ..images import pipeline
+from ..models import Category
+from ..storage import serve_immutable
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, IMAGE_PIPELINE={'WORKERS': 0})
+class ContentAddressedStorageTests(TestCase):
+    def tearDown(self):
+        pipeline.drain()
+
+    def create(self, name, content=b'icon'):
+        category = Category(name=name)
+        category.image.save('icon.png', ContentFile(content), save=True)
+        return category
+
+    def test_same_content_is_stored_once(self):
+        a = self.create('A')
+        b = self.create('B')
+        self.assertEqual(a.image.name, b.image.name)
+        self.assertRegex(a.image.name, r'^category_images/[0-9a-f]{2}/'
+                                       r'[0-9a-f]{64}\.png$')
+        self.assertEqual(
+            len(os.listdir(os.path.dirname(a.image.path))), 1)
+
+    def test_different_content_is_stored_separately(self):
+        a = self.create('A', b'first')
+        b = self.create('B', b'second')
+        self.assertNotEqual(a.image.name, b.image.name)
+
+    def test_file_is_deleted_with_its_last_category(self):
+        a = self.create('A')
+        b = self.create('B')
+        name = a.image.name
+        with self.captureOnCommitCallbacks(execute=True):
+            a.delete()
+        self.assertTrue(default_storage.exists(name))
+        with self.captureOnCommitCallbacks(execute=True):
+            b.delete()
+        self.assertFalse(default_storage.exists(name))
+
+    def test_variants_are_deleted_with_the_image(self):
+        a = self.create('A')
+        variant = default_storage.save('category_images/variants/a.webp',
+                                       ContentFile(b'small'))
+        a.image_variants = {'thumbnail': variant}
+        a.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            a.delete()
+        self.assertFalse(default_storage.exists(variant))
+
+    def test_replaced_image_is_released(self):
+        a = self.create('A', b'first')
+        name = a.image.name
+        png = BytesIO()
+        Image.new('RGB', (4, 4)).save(png, 'PNG')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                reverse('category-detail', args=[a.id]),
+                encode_multipart(BOUNDARY, {'image': SimpleUploadedFile(
+                    'new.png', png.getvalue(), content_type='image/png')}),
+                content_type=MULTIPART_CONTENT)
+        self.assertEqual(response.status_code, 200)
+        a.refresh_from_db()
+        self.assertNotEqual(a.image.name, name)
+        self.assertFalse(default_storage.exists(name))
+        self.assertTrue(default_storage.exists(a.image.name))
+
+    def test_admin_bulk_delete_releases_images(self):
+        shared = self.create('Shared', b'shared')
+        self.create('Other', b'shared')
+        own = self.create('Own', b'own')
+        self.client.force_login(
+            User.objects.create_superuser('admin', password='admin'))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('admin:category_category_changelist'),
+                {'action': 'delete_selected', 'post': 'yes',
+                 '_selected_action': [shared.id, own.id]})
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(default_storage.exists(shared.image.name))
+        self.assertFalse(default_storage.exists(own.image.name))
+
+    def test_release_waits_for_the_write_lock(self):
+        a = self.create('A')
+        with mock.patch('category.models.lock_images') as lock_images:
+            Category.release_image(a.image.name)
+        lock_images.assert_called_once()
+        self.assertTrue(default_storage.exists(a.image.name))
+
+    def test_media_is_served_immutable(self):
+        a = self.create('A')
+        request = RequestFactory().get('/media/' + a.image.name)
+        response = serve_immutable(request, a.image.name,
+                                   document_root=MEDIA_ROOT)
+        self.assertEqual(response['Cache-Control'],
+                         'public, max-age=31536000, immutable')
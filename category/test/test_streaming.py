@@ -0,0 +1,79 @@
+import json
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+
+from .. import streaming
+from ..models import Category
+from .query_budget import seed_tree
+
+
+class StreamingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.levels = seed_tree(60, 4)
+        Category.objects.create(name='Ünïcode "quoted"', description='\n')
+
+    def assertSameAsRendered(self, url, params=None):
+        rendered = self.client.get(url, params)
+        streamed = self.client.get(url, {**(params or {}), 'stream': '1'})
+        self.assertFalse(rendered.streaming)
+        self.assertTrue(streamed.streaming)
+        self.assertEqual(streamed['Content-Type'], 'application/json')
+        body = b''.join(streamed.streaming_content)
+        data = json.loads(body)
+        # The links of a streamed page lead to streamed pages.
+        for link in ['next', 'previous']:
+            if isinstance(data, dict) and data.get(link):
+                data[link] = data[link].replace('stream=1', '').rstrip('&?')
+        self.assertEqual(data, rendered.json())
+        return body
+
+    def test_same_output_as_rendered(self):
+        root = self.levels[0][0]
+        for url, params in [
+            (reverse('category-as-tree'), None),
+            (reverse('category-tree-by-depth', args=[1]), None),
+            (reverse('category-tree-by-parent', args=[root.id]), None),
+            (reverse('category-list'), None),
+            (reverse('category-list'), {'page': 2}),
+            (reverse('category-by-parent', args=[root.id]), None),
+            (reverse('category-search'), {'q': 'node'}),
+        ]:
+            with self.subTest(url=url, params=params):
+                self.assertSameAsRendered(url, params)
+
+    def test_without_orjson(self):
+        with mock.patch.object(streaming, 'orjson', None):
+            body = self.assertSameAsRendered(reverse('category-as-tree'))
+        self.assertIn('Ünïcode'.encode(), body)
+
+    def test_deep_tree(self):
+        parent = None
+        for depth in range(400):
+            parent = Category.objects.create(name=f'deep-{depth}',
+                                             parent=parent)
+        root = Category.objects.get(name='deep-0')
+        response = self.client.get(
+            reverse('category-tree-by-parent', args=[root.id]),
+            {'stream': '1'})
+        node = json.loads(b''.join(response.streaming_content))
+        depth = 0
+        while node['children']:
+            node = node['children'][0]
+            depth += 1
+        self.assertEqual(depth, 399)
+
+    def test_chunks_are_buffered(self):
+        chunks = list(streaming.buffered(
+            (b'x' * 10 for _ in range(25)), size=100))
+        self.assertEqual([len(chunk) for chunk in chunks], [100, 100, 50])
+
+    async def test_async_under_asgi(self):
+        url = reverse('category-as-tree')
+        rendered = await self.async_client.get(url)
+        streamed = await self.async_client.get(url, {'stream': '1'})
+        self.assertTrue(streamed.is_async)
+        chunks = [chunk async for chunk in streamed.streaming_content]
+        self.assertEqual(json.loads(b''.join(chunks)), rendered.json())
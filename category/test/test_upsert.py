@@ -0,0 +1,136 @@
+import os
+import shutil
+import tempfile
+import threading
+from collections import Counter
+from io import BytesIO
+from unittest import mock
+
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connections
+from django.test import Client, TestCase, TransactionTestCase, \
+    override_settings
+from django.urls import reverse
+from PIL import Image
+
+from ..models import Category, Change
+
+THREADS = 8
+POSTS_PER_THREAD = 25
+NAMES = 10
+
+
+class UpsertTests(TestCase):
+    def test_insert_if_new(self):
+        category = Category(name='A', description='First')
+        self.assertTrue(category.insert_if_new())
+        self.assertIsNotNone(category.pk)
+        self.assertFalse(Category(name='A',
+                                  description='Second').insert_if_new())
+        self.assertEqual(Category.objects.get(name='A').description,
+                         'First')
+        self.assertEqual(
+            list(Change.objects.values_list('action', 'object_id')),
+            [('create', category.pk)])
+
+    def test_create_then_update(self):
+        url = reverse('category-list')
+        response = self.client.post(url, {'name': 'A', 'description': '1'})
+        self.assertEqual(response.status_code, 201)
+        response = self.client.post(url, {'name': 'A', 'description': '2'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Category.objects.get(name='A').description, '2')
+
+    def test_invalid_data_writes_nothing(self):
+        response = self.client.post(reverse('category-list'),
+                                    {'name': 'A', 'parent': 9999})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Category.objects.exists())
+
+
+def png_upload():
+    buffer = BytesIO()
+    Image.new('RGB', (8, 8), 'red').save(buffer, 'PNG')
+    return SimpleUploadedFile('icon.png', buffer.getvalue(),
+                              content_type='image/png')
+
+
+@override_settings(IMAGE_PIPELINE={'WORKERS': 0})
+class UpsertImageTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=self.media_root))
+
+    def stored_files(self):
+        return [name for _, _, names in os.walk(self.media_root)
+                for name in names]
+
+    def test_failed_update_releases_the_stored_image(self):
+        parent = Category.objects.create(name='A')
+        child = Category.objects.create(name='B', parent=parent)
+        # Making A a child of its own child fails after the insert stored
+        # the image.
+        with self.assertRaises(ValidationError):
+            self.client.post(reverse('category-list'), {
+                'name': 'A', 'parent': child.id, 'image': png_upload()})
+        self.assertEqual(self.stored_files(), [])
+        parent.refresh_from_db()
+        self.assertFalse(parent.image)
+
+    def test_category_deleted_before_the_update(self):
+        insert_if_new = Category.insert_if_new
+        calls = []
+
+        # The first insert runs into a category that is gone by the time
+        # the update looks for it.
+        def conflict_once(category):
+            calls.append(category.name)
+            if len(calls) == 1:
+                return False
+            return insert_if_new(category)
+
+        with mock.patch.object(Category, 'insert_if_new', conflict_once):
+            response = self.client.post(reverse('category-list'), {
+                'name': 'A', 'image': png_upload()})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(calls, ['A', 'A'])
+        self.assertTrue(Category.objects.get(name='A').image)
+
+
+class ConcurrentUpsertTests(TransactionTestCase):
+    # Every thread posts the same few names in a different order. Each name
+    # must be created exactly once and every other post must update it.
+    def test_overlapping_names(self):
+        statuses = Counter()
+        errors = []
+        barrier = threading.Barrier(THREADS)
+
+        def post(worker):
+            client = Client()
+            try:
+                barrier.wait()
+                for i in range(POSTS_PER_THREAD):
+                    name = f'Category {(worker + i) % NAMES}'
+                    response = client.post(reverse('category-list'), {
+                        'name': name, 'description': f'{worker}-{i}'})
+                    statuses[response.status_code] += 1
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=post, args=[worker])
+                   for worker in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(statuses, {201: NAMES,
+                                    200: THREADS * POSTS_PER_THREAD - NAMES})
+        self.assertEqual(Category.objects.count(), NAMES)
+        self.assertEqual(Change.objects.filter(action='create').count(),
+                         NAMES)
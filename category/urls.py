@@ -1,11 +1,27 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import CategoryViewSet, SimilarityViewSet
+from . import async_views
+from .metrics import metrics_view
+from .views import CategoryViewSet, ChangeViewSet, IslandViewSet, \
+    SimilarityViewSet
 
 router = DefaultRouter()
 router.register(r'categories', CategoryViewSet, basename='category')
 router.register(r'similarities', SimilarityViewSet, basename='similarity')
+router.register(r'analytics/islands', IslandViewSet, basename='island')
+router.register(r'changes', ChangeViewSet, basename='change')
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('metrics/', metrics_view, name='metrics'),
+    path('async/categories/', async_views.category_list,
+         name='async-category-list'),
+    path('async/categories/<int:pk>/', async_views.category_detail,
+         name='async-category-detail'),
+    path('async/categories/<int:pk>/similar/', async_views.category_similar,
+         name='async-category-similar'),
+    path('async/categories/by-parent/<int:parent_id>/',
+         async_views.category_by_parent, name='async-category-by-parent'),
+    path('async/categories/tree/', async_views.category_tree,
+         name='async-category-as-tree'),
 ]
@@ -1,18 +1,97 @@
-from django.db.models import Q
-from drf_spectacular.utils import extend_schema, extend_schema_view
-from rest_framework import viewsets, status
+import time
+from collections import defaultdict
+from functools import partial
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.db.models import Count, Q
+from django.shortcuts import get_object_or_404
+from drf_spectacular.utils import (OpenApiParameter, extend_schema,
+                                   extend_schema_view)
+from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import MethodNotAllowed, ValidationError
 from rest_framework.response import Response
 
-from .models import Category, Similarity
+from .analytics import refresher, schedule_if_stale
+from .graph import neighborhood_of, neighbors_of, shortest_path
+from .images import pipeline
+from .models import Category, CategoryAnalytics, Change, Island, \
+    Similarity, changes_committed
+from .routers import ReplicaReadMixin
+from .search import search_categories
+from .singleflight import flights
+from .streaming import list_chunks, paginated_chunks, \
+    streaming_json_response, subtree_chunks, tree_chunks
 from .serializers import CategoryListSerializer, SimilaritySerializer, \
-    CategoryTreeSerializer
+    CategoryTreeSerializer, CategoryAnalyticsSerializer, IslandSerializer, \
+    CategoryMoveSerializer, ChangeSerializer, SimilarSetSerializer, \
+    SimilarSetResultSerializer, CategoryCreateSerializer, \
+    CategoryIdsSerializer, CategoryIdsResultSerializer
+
+
+# Paths longer than this are not looked for unless asked, and never beyond
+# the limit, each hop is another query over a wider frontier.
+PATH_MAX_HOPS = 6
+PATH_MAX_HOPS_LIMIT = 12
+SEARCH_MAX_LENGTH = 100
+NEIGHBORHOOD_HOPS = 2
+NEIGHBORHOOD_HOPS_LIMIT = 4
+NEIGHBORHOOD_LIMIT = 20
+NEIGHBORHOOD_LIMIT_MAX = 100
+# A neighborhood stops growing after this many categories, a hub can have
+# most of the graph within a few hops.
+NEIGHBORHOOD_MAX_VISITED = 10000
+# And a hop loads at most this many similarities, the frontier next to a hub
+# can have far more edges than categories.
+NEIGHBORHOOD_MAX_EDGES = 50000
+STREAM_PARAMETER = OpenApiParameter(
+    'stream', bool,
+    description="Send the JSON while it is encoded, node by node, instead "
+                "of rendering it first.")
+IDS_PARAMETERS = [
+    OpenApiParameter(
+        'ids', str, required=True,
+        description="Comma separated ids, at most "
+                    f"{CategoryIdsSerializer.MAX_LENGTH}."),
+    OpenApiParameter(
+        'include', str,
+        description="Comma separated extras, 'parent' replaces the parent "
+                    "id with the parent and 'children_count' adds the "
+                    "number of children."),
+]
+CHANGES_LIMIT = 100
+CHANGES_LIMIT_MAX = 1000
+CHANGES_MAX_WAIT = 30
+# Commits of other processes don't wake a waiting request, it looks for them
+# this often.
+CHANGES_POLL_INTERVAL = 0.5
+
+
+def split_param(value):
+    return [part.strip() for part in value.split(',') if part.strip()]
+
+
+class IntParamsMixin:
+    def get_int_param(self, name, default, minimum, maximum=None):
+        value = self.request.query_params.get(name, default)
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            raise ValidationError({name: 'A whole number is required.'})
+        if maximum is None and value < minimum:
+            raise ValidationError({name: f'Must be at least {minimum}.'})
+        if maximum is not None and not minimum <= value <= maximum:
+            raise ValidationError(
+                {name: f'Must be between {minimum} and {maximum}.'})
+        return value
 
 
 @extend_schema_view(
     list=extend_schema(
         summary="List all categories",
         description="Retrieves all categories in the system.",
+        parameters=[STREAM_PARAMETER],
         tags=["Category"],
     ),
     create=extend_schema(
@@ -43,29 +122,35 @@ from .serializers import CategoryListSerializer, SimilaritySerializer, \
         description="Deletes the category, connecting its child "
                     "categories to its parent.",
         tags=["Category"],
-    )
+    ),
+    update=extend_schema(exclude=True),
 )
-class CategoryViewSet(viewsets.ModelViewSet):
-    http_method_names = ['get', 'post', 'patch', 'delete']
+class CategoryViewSet(ReplicaReadMixin, IntParamsMixin,
+                      viewsets.ModelViewSet):
+    # PUT is only for replacing the similar categories, categories
+    # themselves are updated with PATCH, see update().
+    http_method_names = ['get', 'post', 'put', 'patch', 'delete']
     # Thought about using prefetch_related('children') here, however it
     # behaves weirdly when deleting an element from a tree due to caching.
     queryset = Category.objects.all()
     serializer_class = CategoryListSerializer
+    children_by_parent = None
 
     @extend_schema(
         summary="Get categories by depth",
         description="Returns a list of categories at a specific tree depth.",
+        parameters=[STREAM_PARAMETER],
         tags=["Category"],
     )
     @action(detail=False, url_path='by-depth/(?P<depth>[0-9]+)')
     def by_depth(self, request, depth=None):
-        depth = int(depth)
-        categories = [cat for cat in self.queryset if cat.get_depth() == depth]
+        categories = self.get_queryset().at_depth(int(depth)).order_by('id')
         return self.paginated_response(categories)
 
     @extend_schema(
         summary="Get categories by parent",
         description="Returns a list of child categories of a specific parent.",
+        parameters=[STREAM_PARAMETER],
         tags=["Category"],
     )
     @action(detail=False, url_path='by-parent/(?P<parent_id>[0-9]+)')
@@ -73,87 +158,435 @@ class CategoryViewSet(viewsets.ModelViewSet):
         categories = self.queryset.filter(parent_id=parent_id)
         return self.paginated_response(categories)
 
+    @extend_schema(
+        methods=['GET'],
+        summary="Get categories by id",
+        description="Returns the given categories in the given order, and "
+                    "the ids that don't exist.",
+        parameters=IDS_PARAMETERS,
+        responses=CategoryIdsResultSerializer,
+        tags=["Category"],
+    )
+    @extend_schema(
+        methods=['POST'],
+        summary="Get categories by id",
+        description="Same as `GET`, for lists too long for a URL.",
+        request=CategoryIdsSerializer,
+        responses=CategoryIdsResultSerializer,
+        tags=["Category"],
+    )
+    @action(detail=False, methods=['get', 'post'], url_path='by-ids')
+    def by_ids(self, request):
+        if request.method == 'POST':
+            return self.multi_get(request.data)
+        return self.multi_get({
+            'ids': split_param(request.query_params.get('ids', '')),
+            'include': split_param(request.query_params.get('include', '')),
+        })
+
+    @extend_schema(
+        summary="Search categories",
+        description="Returns the categories whose name or description "
+                    "contain the words of the query, names starting with it "
+                    "first. Falls back to similar words when nothing "
+                    "matches exactly.",
+        parameters=[OpenApiParameter('q', str, required=True),
+                    STREAM_PARAMETER],
+        tags=["Category"],
+    )
+    @action(detail=False, url_path='search')
+    def search(self, request):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            raise ValidationError({'q': 'This field is required.'})
+        if len(query) > SEARCH_MAX_LENGTH:
+            raise ValidationError(
+                {'q': f'At most {SEARCH_MAX_LENGTH} characters.'})
+        return self.paginated_response(search_categories(query))
+
     @extend_schema(
         summary="Get categories as a tree",
         description="Returns a tree of all categories.",
+        parameters=[STREAM_PARAMETER],
         tags=["Category"],
     )
     @action(detail=False, url_path='tree')
     def as_tree(self, request):
         self.serializer_class = CategoryTreeSerializer
-        categories = Category.objects.filter(parent__isnull=True)
-        return self.paginated_response(categories)
+        categories = Category.objects.filter(parent__isnull=True).order_by(
+            'id')
+        return self.paginated_response(categories, tree=True)
 
     @extend_schema(
         summary="Get category tree by depth",
         description="Returns a list of categories and their children "
                     "from a specific tree depth.",
+        parameters=[STREAM_PARAMETER],
         tags=["Category"],
     )
     @action(detail=False, url_path='tree/(?P<depth>[0-9]+)')
     def tree_by_depth(self, request, depth=None):
         self.serializer_class = CategoryTreeSerializer
         depth = int(depth) if depth is not None else 0
-        categories = [cat for cat in self.queryset if cat.get_depth() == depth]
-        return self.paginated_response(categories)
+        categories = self.get_queryset().at_depth(depth).order_by('id')
+        return self.paginated_response(categories, tree=True)
 
     @extend_schema(
         summary="Get category tree by category",
         description="Returns a category and it's children in a tree structure",
+        parameters=[STREAM_PARAMETER],
         tags=["Category"],
     )
     @action(detail=False, url_path='tree/by-category/(?P<pk>[0-9]+)')
     def tree_by_parent(self, request, pk=None):
         self.serializer_class = CategoryTreeSerializer
         category = self.get_object()
-        return Response(self.get_serializer(category).data)
+        if self.wants_stream():
+            self.prefetch_subtrees([category])
+            return streaming_json_response(request, subtree_chunks(
+                category, self.children_by_parent, self.stream_serializer()))
+
+        def build():
+            self.prefetch_subtrees([category])
+            return self.get_serializer(category).data
+        return Response(self.single_flight(build))
 
     @extend_schema(
         summary="List similar categories",
         description="Returns a list of categories that are similar "
                     "to the given category.",
+        parameters=[STREAM_PARAMETER],
         tags=["Category"],
     )
     @action(detail=True, methods=["get"], url_path="similar")
     def similar(self, request, pk=None):
         category = self.get_object()
+        # Similarities are stored once with category_a < category_b, so the
+        # neighbours are the other side of the rows on either column.
+        categories = Category.objects.filter(
+            Q(id__in=Similarity.objects.filter(
+                category_a=category).values('category_b_id')) |
+            Q(id__in=Similarity.objects.filter(
+                category_b=category).values('category_a_id'))
+        ).order_by('id')
+        return self.paginated_response(categories)
 
-        similar_ids = Similarity.objects.filter(
-            Q(category_a=category) | Q(category_b=category)
-        ).values_list('category_a_id', flat=True).union(
-            Similarity.objects.filter(
-                Q(category_a=category) | Q(category_b=category)
-            ).values_list('category_b_id', flat=True)
-        )
+    @extend_schema(
+        summary="Replace the similar categories",
+        description="Makes the given categories the whole set of categories "
+                    "similar to this one, in one transaction. Only the "
+                    "difference to the current set is written. Returns the "
+                    "ids of the categories added and removed.",
+        request=SimilarSetSerializer,
+        responses=SimilarSetResultSerializer,
+        tags=["Category"],
+    )
+    @similar.mapping.put
+    def replace_similar(self, request, pk=None):
+        category = self.get_object()
+        serializer = SimilarSetSerializer(data=request.data,
+                                          context={'category': category})
+        serializer.is_valid(raise_exception=True)
+        added, removed = category.set_similar(
+            serializer.validated_data['similar'])
+        return Response({'added': added, 'removed': removed})
 
-        similar_ids = set(similar_ids) - {category.id}
+    @extend_schema(
+        summary="Move a category",
+        description="Moves the category and everything below it under a new "
+                    "parent, or makes it a root when parent is null.",
+        request=CategoryMoveSerializer,
+        tags=["Category"],
+    )
+    @action(detail=True, methods=['post'], url_path='move')
+    def move(self, request, pk=None):
+        category = self.get_object()
+        serializer = CategoryMoveSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            category.move_to(serializer.validated_data['parent'])
+        except DjangoValidationError as error:
+            raise ValidationError({'parent': error.messages})
+        return Response(self.get_serializer(category).data)
 
-        categories = Category.objects.filter(id__in=similar_ids)
-        return self.paginated_response(categories)
+    @extend_schema(
+        summary="Shortest path to a category",
+        description="Returns the shortest chain of similar categories "
+                    "leading from the category to the target category.",
+        parameters=[OpenApiParameter(
+            'max_hops', int,
+            description=f"Longest path to look for (default: "
+                        f"{PATH_MAX_HOPS}, at most {PATH_MAX_HOPS_LIMIT})")],
+        tags=["Category"],
+    )
+    @action(detail=True, url_path='path-to/(?P<target>[0-9]+)')
+    def path_to(self, request, pk=None, target=None):
+        category = self.get_object()
+        target = get_object_or_404(Category, pk=target)
+        max_hops = self.get_int_param('max_hops', PATH_MAX_HOPS, 1,
+                                      PATH_MAX_HOPS_LIMIT)
+        path = shortest_path(category.id, target.id, neighbors_of, max_hops)
+        if path is None:
+            return Response(
+                {'detail': f'No path found within {max_hops} hops.'},
+                status=status.HTTP_404_NOT_FOUND)
+
+        categories = Category.objects.in_bulk(path)
+        serializer = self.get_serializer(
+            [categories[category_id] for category_id in path], many=True)
+        return Response({'hops': len(path) - 1, 'path': serializer.data})
+
+    @extend_schema(
+        summary="Get the neighborhood of a category",
+        description="Returns the categories within a number of similarity "
+                    "hops, closest first and then by the number of paths "
+                    "connecting them.",
+        parameters=[
+            OpenApiParameter(
+                'hops', int, description=f"Hops to look at (default: "
+                f"{NEIGHBORHOOD_HOPS}, at most {NEIGHBORHOOD_HOPS_LIMIT})"),
+            OpenApiParameter(
+                'limit', int, description=f"Categories to return "
+                f"(default: {NEIGHBORHOOD_LIMIT}, at most "
+                f"{NEIGHBORHOOD_LIMIT_MAX})"),
+        ],
+        tags=["Category"],
+    )
+    @action(detail=True, url_path='neighborhood')
+    def neighborhood(self, request, pk=None):
+        category = self.get_object()
+        hops = self.get_int_param('hops', NEIGHBORHOOD_HOPS, 1,
+                                  NEIGHBORHOOD_HOPS_LIMIT)
+        limit = self.get_int_param('limit', NEIGHBORHOOD_LIMIT, 1,
+                                   NEIGHBORHOOD_LIMIT_MAX)
+        distances, paths, truncated = neighborhood_of(
+            category.id, neighbors_of, hops, NEIGHBORHOOD_MAX_VISITED,
+            NEIGHBORHOOD_MAX_EDGES)
+
+        ranked = sorted(distances, key=lambda category_id: (
+            distances[category_id], -paths[category_id], category_id))[:limit]
+        categories = Category.objects.in_bulk(ranked)
+        results = self.get_serializer(
+            [categories[category_id] for category_id in ranked],
+            many=True).data
+        for data in results:
+            data['hops'] = distances[data['id']]
+            data['paths'] = paths[data['id']]
+        return Response({
+            'count': len(distances),
+            'truncated': truncated,
+            'results': results,
+        })
+
+    @extend_schema(
+        summary="Get the analytics of a category",
+        description="Returns the island of the category in the similarity "
+                    "graph and the bounds of its eccentricity.",
+        tags=["Analytics"],
+    )
+    @action(detail=True, url_path='analytics')
+    def analytics(self, request, pk=None):
+        category = self.get_object()
+        analytics = CategoryAnalytics.objects.select_related(
+            'island').filter(category=category).first()
+        # Analytics are refreshed in the background, see analytics.py.
+        if analytics is None or analytics.island.stale:
+            refresher.schedule()
+        if analytics is None:
+            return Response(
+                {'detail': 'The analytics of this category are not '
+                           'computed yet.'},
+                status=status.HTTP_404_NOT_FOUND)
+        return Response(CategoryAnalyticsSerializer(analytics).data)
 
-    def paginated_response(self, categories):
+    def paginated_response(self, categories, tree=False):
+        if tree and not self.wants_stream():
+            return Response(self.single_flight(
+                lambda: self.build_response(categories, tree).data))
+        return self.build_response(categories, tree)
+
+    def build_response(self, categories, tree):
         page = self.paginate_queryset(categories)
         if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
+            categories = page
+        if tree:
+            categories = list(categories)
+            self.prefetch_subtrees(categories)
+        if self.wants_stream():
+            return self.streaming_response(list(categories), tree,
+                                           page is not None)
         serializer = self.get_serializer(categories, many=True)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
         return Response(serializer.data)
 
+    # When the tree changed every client asks for it again at the same
+    # moment. Requests for the same tree are built once and share the data,
+    # see singleflight.py. Streamed responses are built as they are sent.
+    def single_flight(self, build):
+        key = ('tree', self.request.build_absolute_uri(), Change.last_seq())
+        return flights.do(key, build)
+
+    # ?stream=1 sends the response as it is encoded, see streaming.py. Every
+    # query has run by then, only serializing is left.
+    def wants_stream(self):
+        return self.request.query_params.get('stream') in ('1', 'true')
+
+    def stream_serializer(self):
+        return CategoryListSerializer(
+            context=self.get_serializer_context()).to_representation
+
+    def streaming_response(self, categories, tree, paginated):
+        if tree:
+            chunks = tree_chunks(categories, self.children_by_parent,
+                                 self.stream_serializer())
+        else:
+            chunks = list_chunks(categories, self.stream_serializer())
+        if paginated:
+            chunks = paginated_chunks(
+                self.paginator.page.paginator.count,
+                self.paginator.get_next_link(),
+                self.paginator.get_previous_link(), chunks)
+        return streaming_json_response(self.request, chunks)
+
+    # Loads every descendant of the given categories in one query, so
+    # rendering a tree costs the same number of queries at any size.
+    def prefetch_subtrees(self, categories):
+        children_by_parent = defaultdict(list)
+        descendants = Category.objects.descendants_of(
+            category.id for category in categories).order_by('id')
+        for child in descendants.iterator(chunk_size=2000):
+            children_by_parent[child.parent_id].append(child)
+        self.children_by_parent = children_by_parent
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.children_by_parent is not None:
+            context['children_by_parent'] = self.children_by_parent
+        return context
+
+    def list(self, request, *args, **kwargs):
+        return self.paginated_response(
+            self.filter_queryset(self.get_queryset()))
+
+    # Fetches many categories in one request and one query, in the order
+    # they were asked for, instead of a request per id. The extras are
+    # filled in with one more query each for all of them.
+    def multi_get(self, data):
+        serializer = CategoryIdsSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(serializer.validated_data['ids']))
+        include = serializer.validated_data['include']
+
+        categories = self.get_queryset().in_bulk(ids)
+        found = [categories[category_id] for category_id in ids
+                 if category_id in categories]
+        results = self.get_serializer(found, many=True).data
+        if 'parent' in include:
+            # Parents that were asked for themselves are loaded already.
+            parent_ids = {category.parent_id for category in found} - {None}
+            parents = {**categories, **self.get_queryset().in_bulk(
+                parent_ids - categories.keys())}
+            parent_data = {parent_id: self.get_serializer(parent).data
+                           for parent_id, parent in parents.items()
+                           if parent_id in parent_ids}
+            for data, category in zip(results, found):
+                data['parent'] = parent_data.get(category.parent_id)
+        if 'children_count' in include:
+            counts = dict(self.get_queryset().filter(
+                parent_id__in=categories).values('parent_id').annotate(
+                count=Count('id')).values_list('parent_id', 'count'))
+            for data in results:
+                data['children_count'] = counts.get(data['id'], 0)
+        return Response({
+            'results': results,
+            'missing': [category_id for category_id in ids
+                        if category_id not in categories],
+        })
+
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        self.process_image(serializer)
+
+    def update(self, request, *args, **kwargs):
+        if not kwargs.get('partial'):
+            raise MethodNotAllowed(request.method)
+        return super().update(request, *args, **kwargs)
+
+    def perform_update(self, serializer):
+        # Variants of a replaced image are stale until the pipeline made
+        # new ones.
+        if 'image' in serializer.validated_data:
+            category = serializer.instance
+            old_image = category.image.name
+            old_variants = list(category.image_variants.values())
+            serializer.save(image_variants={})
+            if old_image and old_image != category.image.name:
+                transaction.on_commit(partial(
+                    Category.release_image, old_image, old_variants))
+        else:
+            serializer.save()
+        self.process_image(serializer)
+
+    @staticmethod
+    def process_image(serializer):
+        category = serializer.instance
+        if 'image' in serializer.validated_data and category.image:
+            transaction.on_commit(partial(pipeline.submit, category.pk,
+                                          category.image.name))
+
+    # Inserts the category, or updates the one with the same name. The
+    # insert decides which, so concurrent requests with the same name
+    # create it once and update it otherwise.
     def create(self, request, *args, **kwargs):
         name = request.data.get('name')
         if not name:
             return Response({'detail': 'Name is required.'},
                             status=status.HTTP_400_BAD_REQUEST)
 
+        serializer = CategoryCreateSerializer(
+            data=request.data, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        # A category deleted between the insert and the update is simply
+        # inserted again.
+        response = None
+        while response is None:
+            response = self.insert_or_update(serializer)
+        return response
+
+    def insert_or_update(self, serializer):
+        request = self.request
+        category = Category(**serializer.validated_data)
         try:
-            existing = Category.objects.get(name=name)
-            serializer = self.get_serializer(existing, data=request.data,
+            with transaction.atomic():
+                if category.insert_if_new():
+                    serializer.instance = category
+                    self.process_image(serializer)
+                    return Response(serializer.data,
+                                    status=status.HTTP_201_CREATED,
+                                    headers=self.get_success_headers(
+                                        serializer.data))
+
+                # The insert already stored an uploaded image, which leaves
+                # the upload read to the end. Storing it again for the update
+                # finds the same file, see storage.ContentAddressedStorage.
+                for upload in request.FILES.values():
+                    upload.seek(0)
+                existing = Category.objects.filter(
+                    name=category.name).first()
+                if existing is None:
+                    return None
+                update = self.get_serializer(existing, data=request.data,
                                              partial=True)
-            serializer.is_valid(raise_exception=True)
-            self.perform_update(serializer)
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        except Category.DoesNotExist:
-            return super().create(request, *args, **kwargs)
+                update.is_valid(raise_exception=True)
+                self.perform_update(update)
+        except BaseException:
+            # Nothing points at the image the insert stored, unless another
+            # category has the same one.
+            if category.image and category.image._committed:
+                Category.release_image(category.image.name)
+            raise
+        return Response(update.data, status=status.HTTP_200_OK)
 
 
 @extend_schema_view(
@@ -186,7 +619,109 @@ class CategoryViewSet(viewsets.ModelViewSet):
         tags=["Similarity"]
     )
 )
-class SimilarityViewSet(viewsets.ModelViewSet):
+class SimilarityViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     http_method_names = ['get', 'post', 'patch', 'delete']
     queryset = Similarity.objects.all()
     serializer_class = SimilaritySerializer
+
+
+@extend_schema_view(
+    list=extend_schema(
+        summary="List islands",
+        description="Returns the islands of the similarity graph, largest "
+                    "first.",
+        tags=["Analytics"],
+    ),
+    retrieve=extend_schema(
+        summary="Get an island",
+        description="Returns the size and the longest rabbit hole of an "
+                    "island.",
+        tags=["Analytics"],
+    ),
+)
+class IslandViewSet(ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = Island.objects.order_by('-size', 'id')
+    serializer_class = IslandSerializer
+
+    # Islands touched by similarity changes are served marked stale until
+    # the background refresh recomputed them.
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        schedule_if_stale()
+
+    @extend_schema(
+        summary="Get the similarity graph summary",
+        description="Returns the number of islands, the largest island and "
+                    "the longest rabbit hole.",
+        tags=["Analytics"],
+    )
+    @action(detail=False, url_path='summary')
+    def summary(self, request):
+        islands = Island.objects.all()
+        largest = islands.order_by('-size', 'id').first()
+        longest = islands.order_by('-diameter', 'id').first()
+        return Response({
+            'islands': islands.count(),
+            'largest_island': largest and self.get_serializer(largest).data,
+            'longest_rabbit_hole': longest and self.get_serializer(
+                longest).data,
+        })
+
+
+@extend_schema_view(
+    list=extend_schema(
+        summary="List changes",
+        description="Returns the category and similarity writes committed "
+                    "after the sequence number `since`, oldest first. With "
+                    "`wait` the request waits up to that many seconds for "
+                    "a change when there is none yet. Pass `next_since` as "
+                    "`since` of the next request. A 410 means the log was "
+                    "reset and everything has to be fetched again.",
+        parameters=[
+            OpenApiParameter('since', int, description='Last seen sequence '
+                             'number, 0 for the whole log.'),
+            OpenApiParameter('limit', int, description='At most this many '
+                             f'changes (default {CHANGES_LIMIT}, at most '
+                             f'{CHANGES_LIMIT_MAX}).'),
+            OpenApiParameter('wait', int, description='Seconds to wait for '
+                             f'a change (at most {CHANGES_MAX_WAIT}).'),
+        ],
+        tags=["Changes"],
+    ),
+)
+class ChangeViewSet(IntParamsMixin, viewsets.GenericViewSet):
+    queryset = Change.objects.order_by('seq')
+    serializer_class = ChangeSerializer
+    pagination_class = None
+
+    def list(self, request):
+        since = self.get_int_param('since', 0, 0)
+        limit = self.get_int_param('limit', CHANGES_LIMIT, 1,
+                                   CHANGES_LIMIT_MAX)
+        wait = self.get_int_param('wait', 0, 0, CHANGES_MAX_WAIT)
+
+        changes = self.changes_after(since, limit)
+        if not changes and since:
+            # Flushing the database starts the sequence over.
+            if since > Change.last_seq():
+                return Response(
+                    {'detail': 'The change log was reset.'},
+                    status=status.HTTP_410_GONE)
+        deadline = time.monotonic() + wait
+        while not changes and time.monotonic() < deadline:
+            with changes_committed:
+                changes_committed.wait(min(deadline - time.monotonic(),
+                                           CHANGES_POLL_INTERVAL))
+            changes = self.changes_after(since, limit)
+
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+        return Response({
+            'next_since': changes[-1].seq if changes else since,
+            'has_more': has_more,
+            'results': self.get_serializer(changes, many=True).data,
+        })
+
+    # One more than asked for, to know whether there are more.
+    def changes_after(self, since, limit):
+        return list(self.get_queryset().filter(seq__gt=since)[:limit + 1])
@@ -6,6 +6,10 @@ import sys
 
 def main():
     """Run administrative tasks."""
+    # The tests have settings of their own, see CategoryTree/test_settings.py.
+    if sys.argv[1:2] == ['test']:
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE',
+                              'CategoryTree.test_settings')
     os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'CategoryTree.settings')
     try:
         from django.core.management import execute_from_command_line